@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Servidor HTTP local com mídia sintética para os benchmarks.
+Serve playlists e vídeos em JSON e arquivos WAV gerados em memória, com
+suporte a Range e limite opcional de banda por conexão.
+
+Rotas:
+    /playlist/<nome>-<itens>-<segundos>.json   Lista da playlist
+    /video/<nome>-<indice>-<segundos>.json     Metadados de um vídeo
+    /media/<nome>-<indice>-<segundos>.wav      Áudio sintético
+    /thumb/<nome>-<indice>.png                 Miniatura sintética (1280x720)
+"""
+
+import io
+import re
+import json
+import math
+import time
+import wave
+import zlib
+import struct
+import threading
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SAMPLE_RATE = 22050
+THUMB_SIZE = (1280, 720)
+
+_RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)")
+_PLAYLIST_RE = re.compile(r"^/playlist/(?P<name>[\w]+)-(?P<items>\d+)-(?P<seconds>\d+)\.json$")
+_VIDEO_RE = re.compile(r"^/video/(?P<name>[\w]+)-(?P<index>\d+)-(?P<seconds>\d+)\.json$")
+_MEDIA_RE = re.compile(r"^/media/(?P<name>[\w]+)-(?P<index>\d+)-(?P<seconds>\d+)\.wav$")
+_THUMB_RE = re.compile(r"^/thumb/(?P<name>[\w]+)-(?P<index>\d+)\.png$")
+
+
+@lru_cache(maxsize=32)
+def synthetic_wav(seconds, index=0):
+    """Gera um WAV mono 16 bits com um tom senoidal (diferente por índice)."""
+    frequency = 220.0 + (index % 24) * 20.0
+    frame = struct.Struct("<h")
+    samples = bytearray()
+    period = SAMPLE_RATE / frequency
+    one_cycle = b"".join(
+        frame.pack(int(8000 * math.sin(2 * math.pi * i / period))) for i in range(int(period))
+    )
+    total = SAMPLE_RATE * seconds * 2
+    while len(samples) < total:
+        samples += one_cycle
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(SAMPLE_RATE)
+        w.writeframes(bytes(samples[:total]))
+    return buffer.getvalue()
+
+
+@lru_cache(maxsize=32)
+def synthetic_png(index=0, size=THUMB_SIZE):
+    """Gera um PNG RGB com faixas horizontais (cor diferente por índice)."""
+    width, height = size
+    color = bytes(((index * 47) % 256, (index * 91) % 256, (index * 13) % 256))
+    rows = b"".join(
+        b"\x00" + (color if (y // 40) % 2 else b"\xff\xff\xff") * width for y in range(height)
+    )
+
+    def chunk(kind, data):
+        return (struct.pack(">I", len(data)) + kind + data
+                + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header)
+            + chunk(b"IDAT", zlib.compress(rows)) + chunk(b"IEND", b""))
+
+
+class FakeMediaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "FakeMedia/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        with self.server.stats_lock:
+            self.server.stats["requests"] += 1
+
+        match = _PLAYLIST_RE.match(path)
+        if match:
+            name, items, seconds = match["name"], int(match["items"]), match["seconds"]
+            base = self._base_url()
+            return self._send_json({
+                "id": f"{name}-{items}-{seconds}",
+                "title": f"Benchmark {name} ({items} itens)",
+                "entries": [
+                    {"id": f"{name}-{i}-{seconds}", "title": f"Faixa {i:05d}",
+                     "url": f"{base}/video/{name}-{i}-{seconds}"}
+                    for i in range(1, items + 1)
+                ],
+            })
+
+        match = _VIDEO_RE.match(path)
+        if match:
+            name, index, seconds = match["name"], int(match["index"]), int(match["seconds"])
+            video_id = f"{name}-{index}-{seconds}"
+            width, height = THUMB_SIZE
+            return self._send_json({
+                "id": video_id,
+                "title": f"Faixa {index:05d}",
+                "uploader": f"Artista {name}",
+                "duration": seconds,
+                "thumbnails": [{"url": f"{self._base_url()}/thumb/{name}-{index}.png",
+                                "width": width, "height": height}],
+                "formats": [{
+                    "format_id": "wav",
+                    "url": f"{self._base_url()}/media/{video_id}.wav",
+                    "ext": "wav",
+                    "acodec": "pcm_s16le",
+                    "vcodec": "none",
+                    "abr": SAMPLE_RATE * 16 / 1000,
+                    "filesize": len(synthetic_wav(seconds, index)),
+                }],
+            })
+
+        match = _MEDIA_RE.match(path)
+        if match:
+            return self._send_media(synthetic_wav(int(match["seconds"]), int(match["index"])))
+
+        match = _THUMB_RE.match(path)
+        if match:
+            return self._send_media(synthetic_png(int(match["index"])), "image/png")
+
+        self.send_error(404)
+
+    def _send_media(self, data, content_type="audio/wav"):
+        size = len(data)
+        start, end = 0, size - 1
+        range_header = self.headers.get("Range")
+        match = _RANGE_RE.match(range_header or "")
+        if match and (match[1] or match[2]):
+            if match[1]:
+                start = int(match[1])
+                end = int(match[2]) if match[2] else size - 1
+            else:
+                start = max(0, size - int(match[2]))
+            end = min(end, size - 1)
+            if start > end:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        if self.command == "HEAD":
+            return
+
+        chunk = 64 * 1024
+        rate = self.server.rate_limit
+        view = memoryview(data)[start:end + 1]
+        sent_at = time.perf_counter()
+        for offset in range(0, len(view), chunk):
+            piece = view[offset:offset + chunk]
+            try:
+                self.wfile.write(piece)
+            except (BrokenPipeError, ConnectionResetError):
+                return
+            with self.server.stats_lock:
+                self.server.stats["bytes_sent"] += len(piece)
+            if rate:
+                # Limite de banda por conexão, para simular a rede real
+                expected = (offset + len(piece)) / rate
+                delay = expected - (time.perf_counter() - sent_at)
+                if delay > 0:
+                    time.sleep(delay)
+
+
+class FakeMediaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, rate_limit=None):
+        super().__init__((host, port), FakeMediaHandler)
+        self.rate_limit = rate_limit
+        self.stats_lock = threading.Lock()
+        self.stats = {"requests": 0, "bytes_sent": 0}
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def playlist_url(self, items, seconds, name="bench"):
+        return f"{self.base_url}/playlist/{name}-{items}-{seconds}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Servidor local de mídia sintética")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rate", type=int, default=None, help="Limite em bytes/s por conexão")
+    args = parser.parse_args()
+
+    server = FakeMediaServer(port=args.port, rate_limit=args.rate)
+    print(f"Servindo em {server.base_url} (ex.: {server.playlist_url(10, 30)})")
+    server.serve_forever()
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+Benchmarks offline de ponta a ponta do YouTube Downloader.
+Sobe o servidor de mídia sintética, registra o extrator falso do yt-dlp e
+executa `download_playlist_as_mp3` (CLI) e `download_process` (GUI, sem
+janela visível), medindo itens/s, MB/s, tempo de conversão por minuto de
+áudio e pico de memória. Os resultados vão para JSON para comparação
+entre commits.
+
+Com --postprocess, compara também o tempo por arquivo do acabamento (tags,
+capa e loudnorm) em uma passada única contra os pós-processadores do
+yt-dlp empilhados (FFmpegExtractAudio + loudnorm + FFmpegMetadata +
+EmbedThumbnail), cada um reescrevendo o arquivo.
+
+Uso:
+    python benchmarks/run_benchmarks.py --items 50 --seconds 30 --jobs 1,4
+    python benchmarks/run_benchmarks.py --postprocess --items 10
+    python benchmarks/run_benchmarks.py --gui --output results.json
+    python benchmarks/run_benchmarks.py --compare baseline.json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(BENCH_DIR)
+SRC_DIR = os.path.join(PROJECT_ROOT, "src")
+
+# Comparação: métricas em que "maior é melhor"
+HIGHER_IS_BETTER = {"items_per_sec", "mb_per_sec"}
+COMPARED_METRICS = ("items_per_sec", "mb_per_sec", "transcode_sec_per_audio_min", "peak_rss_mb",
+                    "single_pass_sec_per_file")
+
+
+def peak_rss_mb():
+    """Retorna o pico de memória (processo, filhos) em MB."""
+    try:
+        import resource
+    except ImportError:
+        return None, None
+    # ru_maxrss é em KB no Linux e em bytes no macOS
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / divisor
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / divisor
+    return round(own, 1), round(children, 1)
+
+
+def folder_totals(folder):
+    """Conta os MP3 gerados e o total de bytes em uma pasta."""
+    count = size = 0
+    for root, _, files in os.walk(folder):
+        for name in files:
+            if name.endswith(".mp3"):
+                count += 1
+                size += os.path.getsize(os.path.join(root, name))
+    return count, size
+
+
+def run_cli(url, scenario, workdir):
+    import playlist_para_mp3
+    from segmented_download import SegmentedDownloader
+    from run_metrics import RunMetrics
+
+    # O servidor local não é uma URL do YouTube
+    playlist_para_mp3.is_valid_youtube_url = lambda url: True
+    segmented = None
+    if scenario.get("segments"):
+        segmented = SegmentedDownloader(connections=scenario["segments"],
+                                        segment_size=scenario["segment_size"], threshold=0)
+    metrics = RunMetrics()
+    os.chdir(workdir)
+    start = time.perf_counter()
+    stats = playlist_para_mp3.download_playlist_as_mp3(
+        url,
+        jobs=scenario["jobs"],
+        transcode_workers=scenario.get("transcode_workers"),
+        use_index=False,
+        cache=None,
+        segmented=segmented,
+        metrics=metrics,
+    )
+    wall = time.perf_counter() - start
+    if stats is not None:
+        stats['phases'] = metrics.close()['phases']
+    return wall, stats
+
+
+def run_gui(url, scenario, workdir):
+    import tkinter as tk
+    import youtube_mp3_gui
+
+    # Sem diálogos modais: o benchmark não tem ninguém para clicar em OK
+    youtube_mp3_gui.messagebox.showinfo = lambda *a, **k: None
+    youtube_mp3_gui.messagebox.showerror = lambda *a, **k: None
+    youtube_mp3_gui.messagebox.showwarning = lambda *a, **k: None
+    try:
+        app = youtube_mp3_gui.YoutubeDownloaderApp()
+    except tk.TclError as e:
+        raise RuntimeError(f"GUI indisponível (sem display?): {e}")
+    app.withdraw()
+    app.folder_path.set(workdir)
+
+    start = time.perf_counter()
+    worker = threading.Thread(target=app.download_process, args=(url, scenario["jobs"]), daemon=True)
+    worker.start()
+    while worker.is_alive():
+        app.update()
+        time.sleep(0.01)
+    wall = time.perf_counter() - start
+    app.update()
+    app.log_buffer.close()
+    app.destroy()
+    return wall, None
+
+
+def run_postprocess(url, workdir):
+    """Mede o pós-processamento por arquivo: pós-processadores empilhados x passada única.
+
+    Cada item é baixado duas vezes do servidor local; só o tempo dos
+    pós-processadores (hooks do yt-dlp) entra na conta. A capa do modo
+    empilhado é baixada antes (writethumbnail), fora da medição.
+    """
+    import statistics
+    from yt_dlp import YoutubeDL
+    from yt_dlp.postprocessor import (FFmpegPostProcessor, FFmpegExtractAudioPP, FFmpegMetadataPP,
+                                      EmbedThumbnailPP)
+    from yt_dlp.utils import prepend_extension
+    from output_profile import OutputProfile
+    from audio_finish import AudioFinish, SinglePassPP, LOUDNORM_FILTER, DEFAULT_SAMPLE_RATE
+
+    class LoudnormPP(FFmpegPostProcessor):
+        """Normalização como etapa própria, do jeito que se empilharia no yt-dlp."""
+
+        def run(self, info):
+            path = info["filepath"]
+            tmp = prepend_extension(path, "temp")
+            self.run_ffmpeg(path, tmp, ["-af", LOUDNORM_FILTER, "-ar", str(info.get("asr") or DEFAULT_SAMPLE_RATE),
+                                        "-c:a", "libmp3lame", "-b:a", "192k"])
+            os.replace(tmp, path)
+            return [], info
+
+    profile = OutputProfile()
+    finish = AudioFinish(loudnorm=True)
+    with YoutubeDL({"extract_flat": True, "quiet": True}) as ydl:
+        entries = list(ydl.extract_info(url, download=False)["entries"])
+
+    def measure(name, add_pps, **params):
+        timings = []
+
+        def hook(d):
+            if d["status"] == "started":
+                timings.append(-time.perf_counter())
+            elif d["status"] == "finished":
+                timings[-1] += time.perf_counter()
+
+        per_file = []
+        for index, entry in enumerate(entries, start=1):
+            opts = {"format": "bestaudio/best", "quiet": True, "noprogress": True,
+                    "outtmpl": os.path.join(workdir, name, f"{index} - %(title)s.%(ext)s"),
+                    "postprocessor_hooks": [hook], **params}
+            timings.clear()
+            with YoutubeDL(opts) as ydl:
+                for pp in add_pps(ydl, index):
+                    ydl.add_post_processor(pp, when="post_process")
+                ydl.download([entry["url"]])
+            per_file.append(sum(timings))
+        return per_file
+
+    def stacked(ydl, index):
+        return [
+            FFmpegExtractAudioPP(ydl, preferredcodec="mp3", preferredquality="192"),
+            LoudnormPP(ydl),
+            FFmpegMetadataPP(ydl, add_metadata=True),
+            EmbedThumbnailPP(ydl),
+        ]
+
+    def single(ydl, index):
+        return [SinglePassPP(ydl, profile, finish, "Benchmark", index)]
+
+    stacked_times = measure("stacked", stacked, writethumbnail=True)
+    single_times = measure("single", single)
+    stacked_med, single_med = statistics.median(stacked_times), statistics.median(single_times)
+    return {
+        "items": len(single_times),
+        "stacked_sec_per_file": round(stacked_med, 3),
+        "single_pass_sec_per_file": round(single_med, 3),
+        "speedup": round(stacked_med / single_med, 2) if single_med else None,
+    }
+
+
+def run_scenario(scenario):
+    """Executa um cenário isolado (neste processo) e retorna as métricas."""
+    sys.path.insert(0, SRC_DIR)
+    # Registra o extrator falso como plugin do yt-dlp
+    sys.path.insert(0, BENCH_DIR)
+    from fake_media_server import FakeMediaServer
+
+    server = FakeMediaServer(rate_limit=scenario.get("rate")).start()
+    url = server.playlist_url(scenario["items"], scenario["seconds"])
+    workdir = tempfile.mkdtemp(prefix="ytbench-")
+    if scenario["frontend"] == "postprocess":
+        try:
+            return run_postprocess(url, workdir)
+        finally:
+            server.stop()
+            shutil.rmtree(workdir, ignore_errors=True)
+    try:
+        runner = run_gui if scenario["frontend"] == "gui" else run_cli
+        wall, stats = runner(url, scenario, workdir)
+        count, size = folder_totals(workdir)
+    finally:
+        server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    audio_minutes = count * scenario["seconds"] / 60
+    transcode = None
+    if stats and stats.get("pipeline") and audio_minutes:
+        transcode = stats["pipeline"]["encode_busy"] / audio_minutes
+    own_rss, children_rss = peak_rss_mb()
+    return {
+        "items": count,
+        "wall_sec": round(wall, 3),
+        "items_per_sec": round(count / wall, 3) if wall else 0.0,
+        "mb_per_sec": round(server.stats["bytes_sent"] / (1024 * 1024) / wall, 3) if wall else 0.0,
+        "mp3_mb": round(size / (1024 * 1024), 2),
+        "transcode_sec_per_audio_min": round(transcode, 3) if transcode is not None else None,
+        "peak_rss_mb": own_rss,
+        "peak_children_rss_mb": children_rss,
+        "http_requests": server.stats["requests"],
+        # Percentis por fase (metadados, 1º byte, download, conversão, finalização)
+        "phases": {
+            phase: {"p50": h["p50"], "p95": h["p95"], "max": h["max"]}
+            for phase, h in ((stats or {}).get("phases") or {}).items()
+        },
+    }
+
+
+def run_isolated(scenario):
+    """Roda um cenário em um subprocesso para medir o pico de memória isolado."""
+    cmd = [sys.executable, os.path.abspath(__file__), "--scenario", json.dumps(scenario)]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    for line in reversed(result.stdout.splitlines()):
+        if line.startswith("RESULT "):
+            return json.loads(line[len("RESULT "):])
+    error = (result.stderr.strip().splitlines() or ["erro desconhecido"])[-1]
+    return {"error": error}
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline_path):
+    """Exibe a variação das métricas em relação a um resultado anterior."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    previous = {s["name"]: s for s in baseline.get("scenarios", [])}
+    print(f"\nComparação com {baseline_path} (commit {baseline.get('commit')}):")
+    for scenario in current["scenarios"]:
+        old = previous.get(scenario["name"])
+        if not old or "error" in old or "error" in scenario:
+            continue
+        for metric in COMPARED_METRICS:
+            new_value, old_value = scenario.get(metric), old.get(metric)
+            if not new_value or not old_value:
+                continue
+            delta = (new_value - old_value) / old_value
+            better = delta > 0 if metric in HIGHER_IS_BETTER else delta < 0
+            mark = "✅" if better or abs(delta) < 0.02 else "⚠️ "
+            print(f"  {mark} {scenario['name']:<12} {metric:<28} {old_value:>10} -> {new_value:<10} ({delta:+.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks offline do YouTube Downloader")
+    parser.add_argument("--items", type=int, default=20, help="Itens por playlist (padrão: 20)")
+    parser.add_argument("--seconds", type=int, default=30, help="Duração de cada faixa em segundos (padrão: 30)")
+    parser.add_argument("--jobs", default="1,4", help="Lista de valores de --jobs (padrão: 1,4)")
+    parser.add_argument("--transcode-workers", type=int, default=None, help="Processos de conversão")
+    parser.add_argument("--rate", type=int, default=None, help="Limite de banda por conexão em bytes/s")
+    parser.add_argument("--segments", type=int, default=0, help="Conexões do download segmentado (CLI)")
+    parser.add_argument("--segment-size", type=int, default=1024 * 1024, help="Tamanho do segmento em bytes")
+    parser.add_argument("--gui", action="store_true", help="Inclui o download_process da GUI (requer display)")
+    parser.add_argument("--postprocess", action="store_true",
+                        help="Compara o acabamento em passada única com os pós-processadores empilhados")
+    parser.add_argument("--output", default=None, help="Arquivo JSON de saída")
+    parser.add_argument("--compare", default=None, help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--scenario", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scenario:
+        print("RESULT " + json.dumps(run_scenario(json.loads(args.scenario))))
+        return 0
+
+    if shutil.which("ffmpeg") is None:
+        print("❌ FFmpeg não encontrado no PATH; necessário para os benchmarks.")
+        return 1
+
+    frontends = ["cli"] + (["gui"] if args.gui else [])
+    results = {
+        "commit": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {"items": args.items, "seconds": args.seconds, "rate": args.rate,
+                   "transcode_workers": args.transcode_workers, "segments": args.segments,
+                   "segment_size": args.segment_size},
+        "scenarios": [],
+    }
+
+    for frontend in frontends:
+        for jobs in (int(j) for j in args.jobs.split(",")):
+            scenario = {
+                "frontend": frontend, "jobs": jobs, "items": args.items, "seconds": args.seconds,
+                "rate": args.rate, "transcode_workers": args.transcode_workers,
+                "segments": args.segments, "segment_size": args.segment_size,
+            }
+            name = f"{frontend}-j{jobs}"
+            print(f"[*] {name}: {args.items} itens x {args.seconds}s...")
+            metrics = run_isolated(scenario)
+            metrics["name"] = name
+            results["scenarios"].append(metrics)
+            if "error" in metrics:
+                print(f"    ❌ {metrics['error']}")
+            else:
+                print(f"    {metrics['items_per_sec']:.2f} itens/s | {metrics['mb_per_sec']:.2f} MB/s | "
+                      f"conversão {metrics['transcode_sec_per_audio_min']} s/min de áudio | "
+                      f"pico {metrics['peak_rss_mb']} MB (+{metrics['peak_children_rss_mb']} MB filhos)")
+
+    if args.postprocess:
+        print(f"[*] postprocess: {args.items} itens x {args.seconds}s (empilhado x passada única)...")
+        metrics = run_isolated({"frontend": "postprocess", "items": args.items, "seconds": args.seconds,
+                                "rate": args.rate})
+        metrics["name"] = "postprocess"
+        results["scenarios"].append(metrics)
+        if "error" in metrics:
+            print(f"    ❌ {metrics['error']}")
+        else:
+            print(f"    empilhado {metrics['stacked_sec_per_file']}s/arquivo | "
+                  f"passada única {metrics['single_pass_sec_per_file']}s/arquivo | "
+                  f"{metrics['speedup']}x")
+
+    output = args.output or os.path.join(BENCH_DIR, "results", f"{results['timestamp'].replace(':', '')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"\n📄 Resultados salvos em: {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,39 @@
+"""
+Extratores do yt-dlp para o servidor de mídia sintética dos benchmarks.
+Carregados como plugin quando a pasta `benchmarks/` está no sys.path.
+"""
+
+from yt_dlp.extractor.common import InfoExtractor
+
+_HOST = r"https?://(?:127\.0\.0\.1|localhost):\d+"
+
+
+class FakeMediaVideoIE(InfoExtractor):
+    IE_NAME = "fakemedia"
+    _VALID_URL = _HOST + r"/video/(?P<id>[\w-]+)$"
+
+    def _real_extract(self, url):
+        video_id = self._match_id(url)
+        data = self._download_json(url + ".json", video_id)
+        return {
+            "id": data["id"],
+            "title": data["title"],
+            "uploader": data.get("uploader"),
+            "duration": data.get("duration"),
+            "thumbnails": data.get("thumbnails"),
+            "formats": data["formats"],
+        }
+
+
+class FakeMediaPlaylistIE(InfoExtractor):
+    IE_NAME = "fakemedia:playlist"
+    _VALID_URL = _HOST + r"/playlist/(?P<id>[\w-]+)$"
+
+    def _real_extract(self, url):
+        playlist_id = self._match_id(url)
+        data = self._download_json(url + ".json", playlist_id)
+        entries = [
+            self.url_result(entry["url"], FakeMediaVideoIE, entry["id"], entry["title"])
+            for entry in data["entries"]
+        ]
+        return self.playlist_result(entries, data["id"], data["title"])
@@ -1,30 +1,16 @@
 #!/usr/bin/env python3
-"""Script para limpar pastas de playlists baixadas."""
+"""Script para limpar pastas de playlists baixadas.
+
+Atalho para src/retention.py: sem argumentos remove todas as playlists
+ociosas da pasta atual e de ~/Downloads; com --budget mantém as usadas mais recentemente.
+"""
 
 import os
-import shutil
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
 
-def clean():
-    """Remove pastas de playlists, mantendo .git e src."""
-    
-    excluded_dirs = {'.git', 'src', 'assets', '.vscode', '.idea', 'dist', 'build', '__pycache__', 'images'}
-    
-    print("[*] Limpando pastas de playlists...")
-    
-    removed_count = 0
-    for item in os.listdir('.'):
-        if os.path.isdir(item) and item not in excluded_dirs:
-            try:
-                shutil.rmtree(item)
-                print(f"    Removido: {item}")
-                removed_count += 1
-            except Exception as e:
-                print(f"    Erro ao remover {item}: {e}")
-    
-    if removed_count == 0:
-        print("[!] Nenhuma pasta para limpar.")
-    else:
-        print(f"[✓] Limpeza concluída! ({removed_count} pasta(s) removida(s))")
+from retention import main
 
 if __name__ == "__main__":
-    clean()
+    sys.exit(main())
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Controle adaptativo de concorrência e de taxa do YouTube Downloader.
+O AdaptiveConcurrency ajusta o número de downloads simultâneos no estilo
+AIMD: cresce de um em um enquanto a vazão melhora e cai pela metade diante
+de HTTP 429/403, timeouts ou aumento de latência. O HostRateLimiter limita
+quantos itens por segundo são iniciados em cada host (token bucket).
+"""
+
+import re
+import time
+import random
+import threading
+from urllib.parse import urlsplit
+
+# Fator de redução multiplicativa e acréscimo aditivo
+DECREASE_FACTOR = 0.5
+INCREASE_STEP = 1
+# A vazão precisa melhorar ao menos 5% para a concorrência crescer
+THROUGHPUT_GAIN = 0.05
+# Latência mediana acima de 2x a melhor já vista (e ao menos 1 s maior)
+# indica saturação; abaixo disso a variação é ruído
+LATENCY_FACTOR = 2.0
+LATENCY_MIN_INCREASE = 1.0
+# Intervalo mínimo entre duas reduções seguidas, em segundos
+DECREASE_COOLDOWN = 5.0
+
+_ERROR_PATTERNS = (
+    ("throttled", re.compile(r"HTTP Error 429|Too Many Requests|rate.?limit", re.IGNORECASE)),
+    ("forbidden", re.compile(r"HTTP Error 403|Forbidden", re.IGNORECASE)),
+    ("timeout", re.compile(r"timed? ?out", re.IGNORECASE)),
+)
+
+# Rodadas extras para itens com erro temporário, ao final da execução
+RETRY_ROUNDS = 3
+RETRY_BACKOFF = 5.0
+RETRY_MAX_DELAY = 120.0
+
+ERROR_REASONS = {
+    "throttled": "HTTP 429 (limite de requisições)",
+    "forbidden": "HTTP 403 (acesso bloqueado)",
+    "timeout": "timeout de rede",
+}
+
+
+def classify_error(message):
+    """Classifica uma mensagem de erro do yt-dlp: 'throttled', 'forbidden', 'timeout' ou None."""
+    if not message:
+        return None
+    for kind, pattern in _ERROR_PATTERNS:
+        if pattern.search(message):
+            return kind
+    return None
+
+
+def backoff_delay(attempt, base=RETRY_BACKOFF, cap=RETRY_MAX_DELAY):
+    """Espera exponencial com jitter para a tentativa `attempt` (1, 2, ...).
+
+    Metade da espera é fixa e a outra metade é sorteada, para que vários
+    clientes bloqueados ao mesmo tempo não voltem todos juntos.
+    """
+    delay = min(cap, base * 2 ** (attempt - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def url_host(url):
+    """Host de uma URL (IDs soltos do YouTube contam como youtube.com)."""
+    host = urlsplit(url).hostname if "://" in (url or "") else None
+    return host or "www.youtube.com"
+
+
+class TokenBucket:
+    """Token bucket: `rate` fichas por segundo, acumulando até `burst`."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or max(1.0, rate))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Consome uma ficha, aguardando se necessário; retorna o tempo esperado."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class HostRateLimiter:
+    """Um TokenBucket por host, criado sob demanda."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.waited = 0.0
+
+    def acquire(self, url):
+        host = url_host(url)
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(self.rate, self.burst)
+        waited = bucket.acquire()
+        with self._lock:
+            self.waited += waited
+        return waited
+
+
+class AdaptiveConcurrency:
+    """Limite de concorrência ajustado por vazão, latência e erros (AIMD).
+
+    Os workers chamam `acquire()`/`release()` em volta de cada download e
+    `record()` com o resultado. A cada janela de `limit` itens concluídos a
+    vazão e a latência mediana são avaliadas; erros de bloqueio reduzem o
+    limite imediatamente. Cada mudança é registrada em `history` e no log.
+    `on_change(limit, kind)` recebe o limite inicial (kind None) e cada
+    mudança, com o motivo em uma palavra (ex.: para métricas).
+    """
+
+    def __init__(self, initial=2, minimum=1, maximum=8, log=print, on_change=None):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = min(self.maximum, max(self.minimum, initial))
+        self.initial = self.limit
+        self.peak = self.limit
+        self.log = log
+        self.on_change = on_change
+        self.history = []
+        self.errors = {}
+        self._active = 0
+        self._cond = threading.Condition()
+        self._samples = []
+        self._window_start = time.monotonic()
+        self._last_throughput = None
+        self._best_latency = None
+        self._last_decrease = 0.0
+        if on_change is not None:
+            on_change(self.limit, None)
+
+    def acquire(self):
+        with self._cond:
+            while self._active >= self.limit:
+                self._cond.wait()
+            self._active += 1
+
+    def release(self):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    def record(self, latency=None, nbytes=0, error=None):
+        """Registra o resultado de um item; `error` vem de classify_error()."""
+        with self._cond:
+            if error is not None:
+                self.errors[error] = self.errors.get(error, 0) + 1
+                if time.monotonic() - self._last_decrease >= DECREASE_COOLDOWN:
+                    self._decrease(ERROR_REASONS[error], error)
+                self._reset_window()
+                return
+            self._samples.append((latency, nbytes))
+            if len(self._samples) >= self.limit:
+                self._evaluate()
+
+    def _reset_window(self):
+        self._samples = []
+        self._window_start = time.monotonic()
+        # A vazão de referência muda junto com o limite
+        self._last_throughput = None
+
+    def _evaluate(self):
+        elapsed = time.monotonic() - self._window_start
+        throughput = sum(nbytes for _, nbytes in self._samples) / elapsed if elapsed > 0 else 0.0
+        latencies = sorted(latency for latency, _ in self._samples if latency is not None)
+        self._samples = []
+        self._window_start = time.monotonic()
+
+        if latencies:
+            median = latencies[len(latencies) // 2]
+            if self._best_latency is None or median < self._best_latency:
+                self._best_latency = median
+            elif (median > LATENCY_FACTOR * self._best_latency
+                  and median - self._best_latency >= LATENCY_MIN_INCREASE):
+                self._decrease(f"latência mediana {median:.1f}s (base {self._best_latency:.1f}s)", "latency")
+                self._last_throughput = None
+                return
+
+        previous = self._last_throughput
+        self._last_throughput = throughput
+        if previous is None or throughput > previous * (1 + THROUGHPUT_GAIN):
+            if previous is None and self.history:
+                return  # Primeira janela após uma redução: só define a referência
+            mb = throughput / (1024 * 1024)
+            if previous is None:
+                reason = f"vazão inicial de {mb:.2f} MB/s"
+            else:
+                reason = f"vazão subiu de {previous / (1024 * 1024):.2f} para {mb:.2f} MB/s"
+            self._change(self.limit + INCREASE_STEP, reason, "throughput")
+
+    def _decrease(self, reason, kind):
+        self._last_decrease = time.monotonic()
+        self._change(int(self.limit * DECREASE_FACTOR), reason, kind)
+
+    def _change(self, new_limit, reason, kind):
+        new_limit = min(self.maximum, max(self.minimum, new_limit))
+        if new_limit == self.limit:
+            return
+        old, self.limit = self.limit, new_limit
+        self.peak = max(self.peak, new_limit)
+        self.history.append({"time": time.time(), "from": old, "to": new_limit, "reason": reason, "kind": kind})
+        self._cond.notify_all()
+        self.log(f"🎚️  Concorrência {old} → {new_limit}: {reason}")
+        if self.on_change is not None:
+            self.on_change(new_limit, kind)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "initial": self.initial,
+                "final": self.limit,
+                "peak": self.peak,
+                "maximum": self.maximum,
+                "changes": list(self.history),
+                "errors": dict(self.errors),
+            }
+
+
+def format_concurrency_stats(stats):
+    """Formata o resumo do controle adaptativo."""
+    text = (f"🎚️  Concorrência adaptativa: {stats['initial']} → {stats['final']} "
+            f"(pico {stats['peak']}/{stats['maximum']}, {len(stats['changes'])} ajuste(s))")
+    if stats["errors"]:
+        text += " | " + ", ".join(f"{count}x {ERROR_REASONS[kind]}" for kind, count in stats["errors"].items())
+    return text
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Caminhos de dados do usuário para o YouTube Downloader.
+Centraliza onde ficam caches, configurações e arquivos gerados fora da
+pasta do projeto.
+"""
+
+import os
+import sys
+
+APP_NAME = "youtube-mp3-downloader"
+# Pasta de destino padrão da GUI (também uma raiz padrão da limpeza por orçamento)
+DEFAULT_OUTPUT_DIR = os.path.join(os.path.expanduser("~"), "Downloads")
+
+
+def user_cache_dir(*parts):
+    """Retorna (e cria) um diretório de cache do usuário para a aplicação."""
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~\\AppData\\Local")
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    path = os.path.join(base, APP_NAME, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def user_config_dir(*parts):
+    """Retorna (e cria) um diretório de configuração do usuário para a aplicação."""
+    if sys.platform == "win32":
+        base = os.environ.get("APPDATA") or os.path.expanduser("~\\AppData\\Roaming")
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Application Support")
+    else:
+        base = os.environ.get("XDG_CONFIG_HOME") or os.path.expanduser("~/.config")
+    path = os.path.join(base, APP_NAME, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
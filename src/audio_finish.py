@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Acabamento do áudio em uma única passada do ffmpeg.
+Tags (título, artista, álbum e faixa), capa reduzida e normalização de
+volume (loudnorm) entram na mesma invocação que converte ou copia o áudio,
+em vez de um pós-processador do yt-dlp por etapa reescrevendo o arquivo.
+"""
+
+import os
+import shutil
+
+from yt_dlp.postprocessor.common import PostProcessor
+from yt_dlp.utils import PostProcessingError
+from yt_dlp.networking.exceptions import RequestError
+
+from transcode_pipeline import encode_audio
+
+# Normalização em uma passada (modo dinâmico do filtro), alvo de streaming
+LOUDNORM_FILTER = "loudnorm=I=-16:TP=-1.5:LRA=11"
+# O loudnorm reamostra para 192 kHz; a saída volta para a taxa de origem
+DEFAULT_SAMPLE_RATE = 48000
+# Lado maior da capa embutida, em pixels
+COVER_SIZE = 500
+# Contêineres em que o ffmpeg grava a capa como imagem anexada
+COVER_EXTS = ("mp3", "m4a")
+
+
+def remove_cover(path):
+    """Apaga a capa temporária baixada por AudioFinish.fetch_cover."""
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+class AudioFinish:
+    """Tags, capa e loudnorm aplicados junto com a conversão.
+
+    `tags` grava título, artista, álbum (título da playlist) e faixa
+    (posição na playlist); `cover` embute a miniatura do vídeo reduzida a
+    `cover_size` pixels (MP3 e M4A); `loudnorm` normaliza o volume, o que
+    obriga a recodificar mesmo quando o áudio poderia ser só copiado.
+    """
+
+    def __init__(self, tags=True, cover=True, loudnorm=False, cover_size=COVER_SIZE):
+        self.tags = tags
+        self.cover = cover
+        self.loudnorm = loudnorm
+        self.cover_size = cover_size
+
+    def __repr__(self):
+        return f"AudioFinish(tags={self.tags}, cover={self.cover}, loudnorm={self.loudnorm})"
+
+    @property
+    def enabled(self):
+        return self.tags or self.cover or self.loudnorm
+
+    @property
+    def needs_transcode(self):
+        # Filtros de áudio não se aplicam a '-c:a copy'
+        return self.loudnorm
+
+    def metadata(self, info, album=None, track=None):
+        """Tags a gravar para o item, a partir do info dict do yt-dlp."""
+        if not self.tags:
+            return {}
+        tags = {
+            "title": info.get("track") or info.get("title"),
+            "artist": info.get("artist") or info.get("creator") or info.get("uploader") or info.get("channel"),
+            "album": album or info.get("album") or info.get("playlist_title"),
+            "track": track or info.get("playlist_index"),
+        }
+        return {key: value for key, value in tags.items() if value}
+
+    def thumbnail_url(self, info):
+        """Menor miniatura que ainda cubra `cover_size` (ou a maior disponível)."""
+        thumbnails = [t for t in info.get("thumbnails") or [] if t.get("url")]
+        large = [t for t in thumbnails if (t.get("width") or 0) >= self.cover_size]
+        if large:
+            return min(large, key=lambda t: t["width"])["url"]
+        if thumbnails:
+            # O yt-dlp ordena da pior para a melhor
+            return thumbnails[-1]["url"]
+        return info.get("thumbnail")
+
+    def fetch_cover(self, info, path, urlopen, ext=None):
+        """Baixa a miniatura para '<path sem extensão>.cover'.
+
+        `urlopen(url)` abre a requisição (ex.: YoutubeDL.urlopen, para usar
+        cookies e proxy). Retorna o caminho da capa ou None: sem capa (ou
+        com falha ao baixá-la) o item segue só com as tags.
+        """
+        if not self.cover or (ext is not None and ext not in COVER_EXTS):
+            return None
+        url = self.thumbnail_url(info)
+        if not url:
+            return None
+        cover = os.path.splitext(path)[0] + ".cover"
+        try:
+            with urlopen(url) as response, open(cover, "wb") as f:
+                shutil.copyfileobj(response, f)
+        except (OSError, ValueError, RequestError):
+            remove_cover(cover)
+            return None
+        return cover
+
+    def ffmpeg_args(self, codec_args, ext, tags=None, cover=None, sample_rate=None):
+        """Monta (entradas extras, argumentos de saída) para uma única passada.
+
+        `codec_args` vêm de OutputProfile.ffmpeg_args; o áudio de entrada é
+        sempre o primeiro '-i'. Sem entradas extras, o chamador mantém '-vn'.
+        """
+        input_args, output_args = [], []
+        if cover and ext in COVER_EXTS:
+            size = self.cover_size
+            input_args = ["-i", cover]
+            output_args += [
+                "-map", "0:a:0", "-map", "1:v:0",
+                "-c:v", "mjpeg", "-disposition:v:0", "attached_pic",
+                "-vf", f"scale='min(iw,{size})':'min(ih,{size})':force_original_aspect_ratio=decrease",
+            ]
+            if ext == "mp3":
+                output_args += ["-metadata:s:v", "title=Album cover", "-metadata:s:v", "comment=Cover (front)"]
+        if self.loudnorm:
+            output_args += ["-af", LOUDNORM_FILTER, "-ar", str(sample_rate or DEFAULT_SAMPLE_RATE)]
+        output_args += codec_args
+        for key, value in (tags or {}).items():
+            output_args += ["-metadata", f"{key}={value}"]
+        if ext == "mp3":
+            # ID3v2.3: a versão que a maioria dos players lê
+            output_args += ["-id3v2_version", "3"]
+        return input_args, output_args
+
+    def prepare(self, info, path, codec_args, ext, urlopen=None, album=None, track=None):
+        """Baixa a capa e monta os argumentos; retorna (entradas, saída, capa)."""
+        cover = self.fetch_cover(info, path, urlopen, ext) if urlopen is not None else None
+        input_args, output_args = self.ffmpeg_args(
+            codec_args, ext, tags=self.metadata(info, album, track), cover=cover,
+            sample_rate=info.get("asr"),
+        )
+        return input_args, output_args, cover
+
+
+class SinglePassPP(PostProcessor):
+    """Pós-processador do yt-dlp que converte, marca e normaliza de uma vez.
+
+    Substitui FFmpegExtractAudio (+ FFmpegMetadata + EmbedThumbnail) quando
+    a conversão roda dentro do yt-dlp (`--transcode-workers 0`).
+    """
+
+    def __init__(self, downloader, profile, finish, album=None, track=None, encoder=None, threads=None,
+                 ffmpeg=None):
+        super().__init__(downloader)
+        self.ffmpeg = ffmpeg
+        self.profile = profile
+        self.finish = finish
+        self.album = album
+        self.track = track
+        self.encoder = encoder
+        self.threads = threads
+
+    def run(self, info):
+        src = info["filepath"]
+        dst, mode = self.profile.output_path(src, info.get("acodec"), transcode=self.finish.needs_transcode)
+        ext = os.path.splitext(dst)[1].lstrip(".")
+        input_args, output_args, cover = self.finish.prepare(
+            info, src, self.profile.ffmpeg_args(mode, self.encoder, self.threads), ext,
+            urlopen=self._downloader.urlopen, album=self.album, track=self.track,
+        )
+        self.to_screen(f'Convertendo em uma passada: "{dst}"')
+        try:
+            encode_audio(src, dst, output_args, input_args, self.ffmpeg)
+        except RuntimeError as e:
+            raise PostProcessingError(str(e))
+        finally:
+            remove_cover(cover)
+        info["filepath"] = dst
+        info["ext"] = ext
+        return [], info
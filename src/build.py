@@ -1,87 +1,206 @@
 #!/usr/bin/env python3
 """
 Script auxiliar para compilar o projeto YouTube Downloader para executável.
-Uso: python src/build.py [--with-ffmpeg] [--optimized]
+Uso: python src/build.py [--with-ffmpeg] [--optimized] [--clean]
+
+O build é incremental: a pasta de trabalho do PyInstaller é mantida entre
+execuções e um fingerprint (requirements, versões dos pacotes instalados e
+hash dos fontes) decide o que refazer. O pip só roda quando o
+requirements.txt ou o Python mudam, e nada é recompilado se nada mudou.
 """
 
 import os
+import re
 import sys
-import subprocess
+import json
+import time
 import shutil
-from pathlib import Path
+import hashlib
+import argparse
+import platform
+import subprocess
+from importlib import metadata
 
-def build_executable(with_ffmpeg=False, optimized=False):
-    """Cria um executável a partir do script GUI."""
-    
-    print("=" * 70)
-    print("YouTube Downloader - Build Executável")
-    print("=" * 70)
-    
-    # Obter diretório de trabalho
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    project_root = os.path.dirname(script_dir)
-    src_dir = script_dir
-    gui_file = os.path.join(src_dir, "youtube_mp3_gui.py")
-    images_dir = os.path.join(project_root, "assets")
-    
-    # Verificar arquivos necessários
-    if not os.path.exists(gui_file):
-        print(f"\n[❌] Erro: arquivo '{gui_file}' não encontrado!")
-        return False
-    
-    if not os.path.exists(images_dir):
-        print(f"[⚠️ ] Aviso: pasta '{images_dir}' não encontrada!")
-    
-    # Validar estrutura
-    print(f"\n[*] Estrutura do projeto:")
-    print(f"    Diretório base: {project_root}")
-    print(f"    Src: {src_dir}")
-    print(f"    Imagens: {images_dir}")
-    
-    # Verificar e baixar/preparar FFmpeg se necessário
-    if with_ffmpeg:
-        ffmpeg_bin = os.path.join(src_dir, "ffmpeg", "bin", "ffmpeg.exe")
-        if not os.path.exists(ffmpeg_bin):
-            print("\n[*] Preparando FFmpeg...")
-            try:
-                ffmpeg_manager = os.path.join(src_dir, "ffmpeg_manager.py")
-                subprocess.run([sys.executable, ffmpeg_manager], check=True)
-            except Exception as e:
-                print(f"[⚠️ ] Aviso ao preparar FFmpeg: {e}")
-                print("     O FFmpeg não será incluído no build.")
-                with_ffmpeg = False
-    
-    # Verificar se PyInstaller está instalado
+from ffmpeg_probe import EXE_SUFFIX, FFMPEG_DIR, FFMPEG_BIN
+
+APP_NAME = "YouTube MP3 Downloader"
+CACHE_FILENAME = ".build_cache.json"
+
+_REQUIREMENT_RE = re.compile(r"^\s*([A-Za-z0-9][A-Za-z0-9._-]*)")
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def tree_fingerprint(root, skip_dirs=()):
+    """Hash do conteúdo (e dos caminhos) de todos os arquivos sob `root`."""
+    digest = hashlib.sha256()
+    if not os.path.isdir(root):
+        return None
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in skip_dirs and d != "__pycache__")
+        for name in sorted(filenames):
+            if name.endswith((".pyc", ".pyo")):
+                continue
+            path = os.path.join(dirpath, name)
+            digest.update(os.path.relpath(path, root).replace(os.sep, "/").encode("utf-8"))
+            digest.update(file_sha256(path).encode("ascii"))
+    return digest.hexdigest()
+
+
+def binaries_fingerprint(root):
+    """Tamanho e mtime dos executáveis do FFmpeg (grandes demais para hash a cada build)."""
+    if not os.path.isdir(root):
+        return None
+    entries = []
+    for dirpath, _, filenames in os.walk(root):
+        for name in sorted(filenames):
+            stat = os.stat(os.path.join(dirpath, name))
+            entries.append(f"{os.path.relpath(os.path.join(dirpath, name), root)}:{stat.st_size}:{stat.st_mtime_ns}")
+    return hashlib.sha256("\n".join(sorted(entries)).encode("utf-8")).hexdigest()
+
+
+def installed_packages():
+    """Versões de todos os pacotes instalados no Python do build."""
+    packages = {}
+    for dist in metadata.distributions():
+        name = dist.metadata["Name"]
+        if name:
+            packages[name.lower()] = dist.version
+    return packages
+
+
+def requirements_fingerprint(requirements_path):
+    """Hash do requirements.txt junto com o Python e a plataforma do build."""
+    digest = hashlib.sha256()
+    if os.path.exists(requirements_path):
+        with open(requirements_path, "rb") as f:
+            digest.update(f.read())
+    digest.update(f"{sys.executable}|{platform.python_version()}|{sys.platform}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def missing_requirements(requirements_path, packages):
+    """Nomes do requirements.txt que não estão instalados."""
+    installed = {name.replace("_", "-") for name in packages}
+    missing = []
+    with open(requirements_path, "r", encoding="utf-8") as f:
+        for line in f:
+            match = _REQUIREMENT_RE.match(line.split("#", 1)[0])
+            if match and match[1].lower().replace("_", "-") not in installed:
+                missing.append(match[1])
+    return missing
+
+
+def load_cache(path):
     try:
-        import PyInstaller
-    except ImportError:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(path, cache):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(cache, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+class BuildPhases:
+    """Cronometra as fases do build para o resumo final."""
+
+    def __init__(self):
+        self.phases = []
+
+    def run(self, name, func, *args, **kwargs):
+        """Executa `func`; se ela retornar 'pulado', a fase aparece como pulada."""
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        self.phases.append((name, time.perf_counter() - start, result == "pulado"))
+        return result
+
+    def summary(self):
+        parts = [f"{name} {elapsed:.1f}s" + (" (pulado)" if skipped else "")
+                 for name, elapsed, skipped in self.phases]
+        total = sum(elapsed for _, elapsed, _ in self.phases)
+        return f"⏱️  Fases do build: {' · '.join(parts)} | total {total:.1f}s"
+
+
+def output_path(project_root, optimized):
+    """Executável gerado pelo PyInstaller para o modo escolhido."""
+    if optimized:
+        return os.path.join(project_root, "dist", APP_NAME, APP_NAME + EXE_SUFFIX)
+    return os.path.join(project_root, "dist", APP_NAME + EXE_SUFFIX)
+
+
+def prepare_ffmpeg():
+    """Garante o FFmpeg local (src/ffmpeg/bin) para incluir no build."""
+    if os.path.exists(FFMPEG_BIN):
+        print(f"[✓] FFmpeg local encontrado: {FFMPEG_BIN}")
+        return "pulado"
+    print("\n[*] Preparando FFmpeg...")
+    from ffmpeg_manager import download_ffmpeg
+    return download_ffmpeg()
+
+
+def install_dependencies(project_root, cache):
+    """Roda o pip só quando o requirements.txt (ou o Python) mudou."""
+    requirements = os.path.join(project_root, "requirements.txt")
+    key = requirements_fingerprint(requirements)
+    packages = installed_packages()
+    missing = missing_requirements(requirements, packages) if os.path.exists(requirements) else []
+    if "pyinstaller" not in packages:
+        missing.append("pyinstaller")
+
+    if cache.get("requirements") == key and not missing:
+        print("\n[✓] Dependências inalteradas desde o último build; pip não será executado.")
+        return "pulado"
+
+    if "pyinstaller" in missing:
         print("\n[!] PyInstaller não está instalado.")
         print("[*] Instalando PyInstaller...")
         subprocess.run([sys.executable, "-m", "pip", "install", "pyinstaller"], check=True)
-    
-    # Instalar/atualizar dependências para o projeto
+
     print("\n[*] Garantindo que todas as dependências estão instaladas...")
-    subprocess.run([sys.executable, "-m", "pip", "install", "-r", os.path.join(project_root, "requirements.txt")], check=True)
-    
-    # Limpar builds anteriores
-    for folder in ["build", "dist"]:
-        folder_path = os.path.join(project_root, folder)
-        if os.path.exists(folder_path):
-            print(f"\n[*] Removendo {folder} anterior...")
-            shutil.rmtree(folder_path)
-    
-    spec_file = os.path.join(project_root, "youtube_mp3_gui.spec")
-    if os.path.exists(spec_file):
-        os.remove(spec_file)
-    
-    # Construir comando PyInstaller
+    subprocess.run([sys.executable, "-m", "pip", "install", "-r", requirements], check=True)
+    cache["requirements"] = key
+    return "instalado"
+
+
+def build_fingerprint(src_dir, images_dir, with_ffmpeg, optimized):
+    """Fingerprint dos pacotes instalados e dos fontes que entram no executável."""
+    packages = installed_packages()
+    return {
+        "packages": hashlib.sha256(
+            json.dumps(sorted(packages.items())).encode("utf-8")).hexdigest(),
+        "sources": tree_fingerprint(src_dir, skip_dirs=("ffmpeg",)),
+        "assets": tree_fingerprint(images_dir),
+        "ffmpeg": binaries_fingerprint(FFMPEG_DIR) if with_ffmpeg else None,
+        "options": {"with_ffmpeg": with_ffmpeg, "optimized": optimized,
+                    "python": platform.python_version(), "platform": sys.platform},
+    }
+
+
+def pyinstaller_command(project_root, gui_file, images_dir, with_ffmpeg, optimized, clean):
+    """Linha de comando do PyInstaller; a pasta de trabalho é mantida entre builds."""
+    mode = "onedir" if optimized else "onefile"
+    build_dir = os.path.join(project_root, "build")
     cmd = [
         sys.executable, "-m", "PyInstaller",
-        "--name", "YouTube MP3 Downloader",
+        "--name", APP_NAME,
         "--distpath", os.path.join(project_root, "dist"),
-        "--workpath", os.path.join(project_root, "build"),
+        # Uma pasta de trabalho por modo: alternar entre eles não invalida o cache
+        "--workpath", os.path.join(build_dir, mode),
+        "--specpath", build_dir,
+        "--noconfirm",
         "--windowed",
-        "--onefile",
+        f"--{mode}",
         # Hidden imports para garantir inclusão
         "--hidden-import=PIL",
         "--hidden-import=PIL.Image",
@@ -92,74 +211,158 @@ def build_executable(with_ffmpeg=False, optimized=False):
         "--collect-all=customtkinter",
         "--collect-submodules=yt_dlp",
     ]
-    
+    if clean:
+        # Pacotes mudaram: o cache de análise do PyInstaller não vale mais
+        cmd.append("--clean")
+
     # Adicionar dados (imagens)
     if os.path.exists(images_dir):
-        cmd.append(f"--add-data={images_dir}{os.pathsep}images")
-    
+        cmd.append(f"--add-data={images_dir}{os.pathsep}assets")
+
     # Adicionar FFmpeg se selecionado
-    if with_ffmpeg:
-        ffmpeg_dir = os.path.join(src_dir, "ffmpeg")
-        if os.path.exists(ffmpeg_dir):
-            print(f"\n[*] Incluindo FFmpeg no build...")
-            cmd.append(f"--add-data={ffmpeg_dir}{os.pathsep}ffmpeg")
-    
-    # Modo otimizado (reduz tamanho)
-    if optimized:
-        print("\n[*] Usando modo otimizado (reduz tamanho do executável)...")
-        cmd.remove("--onefile")
-        cmd.append("--onedir")
-        cmd.extend([
-            "--collect-submodules=yt_dlp",
-            "--collect-submodules=customtkinter",
-        ])
-    
+    if with_ffmpeg and os.path.exists(FFMPEG_DIR):
+        cmd.append(f"--add-data={FFMPEG_DIR}{os.pathsep}ffmpeg")
+
     cmd.append(gui_file)
-    
+    return cmd
+
+
+def run_pyinstaller(cmd, project_root, optimized):
+    # Sem extensão (Linux), o arquivo do onefile e a pasta do onedir têm o mesmo nome
+    conflict = os.path.join(project_root, "dist", APP_NAME)
+    if optimized and os.path.isfile(conflict):
+        print(f"\n[*] Removendo executável onefile anterior em {conflict}...")
+        os.remove(conflict)
+    elif not optimized and not EXE_SUFFIX and os.path.isdir(conflict):
+        print(f"\n[*] Removendo pasta onedir anterior em {conflict}...")
+        shutil.rmtree(conflict)
     print(f"\n[*] Buildando...\n")
-    
+    subprocess.run(cmd, check=True, cwd=project_root)
+
+
+def build_executable(with_ffmpeg=False, optimized=False, clean=False):
+    """Cria um executável a partir do script GUI.
+
+    Com `clean`, apaga build/ e dist/ e refaz tudo do zero.
+    """
+
+    print("=" * 70)
+    print("YouTube Downloader - Build Executável")
+    print("=" * 70)
+
+    # Obter diretório de trabalho
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    project_root = os.path.dirname(script_dir)
+    src_dir = script_dir
+    gui_file = os.path.join(src_dir, "youtube_mp3_gui.py")
+    images_dir = os.path.join(project_root, "assets")
+    cache_path = os.path.join(project_root, "build", CACHE_FILENAME)
+    phases = BuildPhases()
+
+    # Verificar arquivos necessários
+    if not os.path.exists(gui_file):
+        print(f"\n[❌] Erro: arquivo '{gui_file}' não encontrado!")
+        return False
+
+    if not os.path.exists(images_dir):
+        print(f"[⚠️ ] Aviso: pasta '{images_dir}' não encontrada!")
+
+    # Validar estrutura
+    print(f"\n[*] Estrutura do projeto:")
+    print(f"    Diretório base: {project_root}")
+    print(f"    Src: {src_dir}")
+    print(f"    Imagens: {images_dir}")
+
+    if clean:
+        for folder in ["build", "dist"]:
+            folder_path = os.path.join(project_root, folder)
+            if os.path.exists(folder_path):
+                print(f"\n[*] Removendo {folder} anterior...")
+                shutil.rmtree(folder_path)
+    cache = load_cache(cache_path)
+
+    # Verificar e baixar/preparar FFmpeg se necessário
+    if with_ffmpeg and not phases.run("ffmpeg", prepare_ffmpeg):
+        print("[⚠️ ] Aviso: FFmpeg não pôde ser preparado.")
+        print("     O FFmpeg não será incluído no build.")
+        with_ffmpeg = False
+
     try:
-        result = subprocess.run(cmd, check=True, cwd=project_root)
-        
-        print("\n" + "=" * 70)
-        print("✅ SUCESSO! Executável criado com sucesso!")
-        print("=" * 70)
-        
-        if optimized:
-            exe_dir = os.path.join(project_root, "dist", "YouTube MP3 Downloader")
-            print(f"\n📦 Pasta: {exe_dir}")
-            print(f"   Execute: {os.path.join(exe_dir, 'YouTube MP3 Downloader.exe')}")
-        else:
-            exe_path = os.path.join(project_root, "dist", "YouTube MP3 Downloader.exe")
-            if os.path.exists(exe_path):
-                size_mb = os.path.getsize(exe_path) / (1024 * 1024)
-                print(f"\n📦 Arquivo: {exe_path}")
-                print(f"📊 Tamanho: {size_mb:.2f} MB")
-        
-        print("\n✨ Você pode distribuir este executável para outros usuários!")
-        if not with_ffmpeg:
-            print("⚠️  Certifique-se de que o FFmpeg está instalado no computador de destino")
-        else:
-            print("✅ FFmpeg foi incluído no build!")
-        
-        return True
-        
+        phases.run("dependências", install_dependencies, project_root, cache)
     except subprocess.CalledProcessError as e:
-        print(f"\n❌ Erro ao compilar: {e}")
-        return False
-    except Exception as e:
-        print(f"\n❌ Erro inesperado: {e}")
+        print(f"\n❌ Erro ao instalar dependências: {e}")
         return False
+    save_cache(cache_path, cache)
+
+    mode = "onedir" if optimized else "onefile"
+    fingerprint = phases.run("fingerprint", build_fingerprint, src_dir, images_dir, with_ffmpeg, optimized)
+    previous = cache.get("builds", {}).get(mode) or {}
+    exe_path = output_path(project_root, optimized)
+
+    if previous == fingerprint and os.path.isfile(exe_path):
+        print("\n[✓] Nada mudou desde o último build; executável reaproveitado.")
+        phases.phases.append(("pyinstaller", 0.0, True))
+    else:
+        changed = [key for key in fingerprint if previous.get(key) != fingerprint[key]]
+        if previous and changed:
+            print(f"\n[*] Mudanças desde o último build: {', '.join(changed)}")
+        elif previous:
+            print("\n[*] Executável anterior não encontrado; refazendo com a pasta de trabalho em cache.")
+        if optimized:
+            print("\n[*] Usando modo otimizado (reduz tamanho do executável)...")
+        if with_ffmpeg:
+            print(f"\n[*] Incluindo FFmpeg no build...")
+        cmd = pyinstaller_command(project_root, gui_file, images_dir, with_ffmpeg, optimized,
+                                  clean=bool(previous) and "packages" in changed)
+        try:
+            phases.run("pyinstaller", run_pyinstaller, cmd, project_root, optimized)
+        except subprocess.CalledProcessError as e:
+            print(f"\n❌ Erro ao compilar: {e}")
+            print(phases.summary())
+            return False
+        except Exception as e:
+            print(f"\n❌ Erro inesperado: {e}")
+            print(phases.summary())
+            return False
+        cache.setdefault("builds", {})[mode] = fingerprint
+        save_cache(cache_path, cache)
+
+    print("\n" + "=" * 70)
+    print("✅ SUCESSO! Executável criado com sucesso!")
+    print("=" * 70)
+
+    if optimized:
+        print(f"\n📦 Pasta: {os.path.dirname(exe_path)}")
+        print(f"   Execute: {exe_path}")
+    elif os.path.exists(exe_path):
+        size_mb = os.path.getsize(exe_path) / (1024 * 1024)
+        print(f"\n📦 Arquivo: {exe_path}")
+        print(f"📊 Tamanho: {size_mb:.2f} MB")
+    print(phases.summary())
+
+    print("\n✨ Você pode distribuir este executável para outros usuários!")
+    if not with_ffmpeg:
+        print("⚠️  Certifique-se de que o FFmpeg está instalado no computador de destino")
+    else:
+        print("✅ FFmpeg foi incluído no build!")
+
+    return True
 
 
 if __name__ == "__main__":
-    with_ffmpeg = "--with-ffmpeg" in sys.argv or "-f" in sys.argv
-    optimized = "--optimized" in sys.argv or "-o" in sys.argv
-    
+    parser = argparse.ArgumentParser(description="Compila o YouTube Downloader com o PyInstaller.")
+    parser.add_argument("-f", "--with-ffmpeg", action="store_true", help="Inclui o FFmpeg no executável")
+    parser.add_argument("-o", "--optimized", action="store_true",
+                        help="Gera uma pasta (onedir) em vez de um único arquivo")
+    parser.add_argument("--clean", action="store_true",
+                        help="Apaga build/ e dist/ e refaz tudo, ignorando o cache")
+    args = parser.parse_args()
+
     print("\nOpções detectadas:")
-    print(f"  Incluir FFmpeg: {with_ffmpeg}")
-    print(f"  Modo otimizado: {optimized}")
+    print(f"  Incluir FFmpeg: {args.with_ffmpeg}")
+    print(f"  Modo otimizado: {args.optimized}")
+    print(f"  Build limpo: {args.clean}")
     print()
-    
-    success = build_executable(with_ffmpeg=with_ffmpeg, optimized=optimized)
+
+    success = build_executable(with_ffmpeg=args.with_ffmpeg, optimized=args.optimized, clean=args.clean)
     sys.exit(0 if success else 1)
@@ -0,0 +1,1038 @@
+#!/usr/bin/env python3
+"""
+Núcleo de download do YouTube Downloader.
+Enumera playlists página a página (iter_playlist) e baixa as entradas com
+download_entries: pool de downloads, conversão em paralelo, índice da
+pasta, diário de falhas e estado de cada item. Usado pelo motor asyncio
+(download_engine), pela CLI, pelo modo lote e pelos workers distribuídos.
+"""
+
+import os
+import re
+import copy
+import sys
+import time
+import itertools
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from yt_dlp import YoutubeDL
+from yt_dlp.utils import DownloadError, DownloadCancelled, PagedList
+from yt_dlp.networking import Request
+from yt_dlp.networking.exceptions import RequestError
+from transcode_pipeline import TranscodePipeline, format_pipeline_stats
+from download_index import DownloadIndex, format_plan_summary
+from progress import ProgressTracker
+from segmented_download import RangeNotSupported
+from stream_transcode import StreamTranscoder, StreamUnsupported
+from audio_finish import SinglePassPP, remove_cover
+from output_profile import OutputProfile
+from adaptive_concurrency import (AdaptiveConcurrency, HostRateLimiter, classify_error,
+                                  format_concurrency_stats, backoff_delay, RETRY_ROUNDS)
+from run_metrics import ItemTrace
+from ffmpeg_probe import resolve_ffmpeg, format_capabilities
+from failure_journal import (FailureJournal, classify_outcome, format_journal_summary,
+                             OK, SKIPPED_PRIVATE, TRANSIENT_ERROR, PERMANENT_ERROR)
+
+# Entradas por página ao enumerar playlists e canais (a página do YouTube tem 100)
+PAGE_SIZE = 100
+# Páginas buscadas à frente dos downloads
+PREFETCH_PAGES = 2
+# Playlists maiores não vão para o cache de metadados, para a memória não crescer
+CACHE_MAX_ENTRIES = 5000
+# Largura da numeração enquanto o total da playlist é desconhecido
+LAZY_WIDTH = 3
+# Redirecionamentos seguidos ao abrir uma URL (ex.: canal -> aba de vídeos)
+MAX_REDIRECTS = 5
+# Estados de cada item informados a `on_item` (veja download_entries)
+ITEM_QUEUED = 'queued'
+ITEM_INDEXED = 'indexed'
+ITEM_DOWNLOADING = 'downloading'
+ITEM_CONVERTING = 'converting'
+ITEM_DONE = 'done'
+ITEM_FAILED = 'failed'
+ITEM_SKIPPED = 'skipped'
+ITEM_RETRY = 'retry'
+ITEM_CANCELLED = 'cancelled'
+# Intervalo mínimo entre atualizações de progresso de um mesmo item
+ITEM_PROGRESS_INTERVAL = 0.5
+
+def sanitize_filename(name):
+    """Remove caracteres inválidos para nomes de arquivos."""
+    return re.sub(r'[\\/*?:"<>|]', "", name)
+
+def resolve_playlist(playlist_url, cache=None):
+    """Extrai a lista plana da playlist e retorna (titulo, entradas).
+
+    Com um MetadataCache, a extração é reaproveitada enquanto for válida.
+    Para playlists grandes, prefira iter_playlist(), que não monta a lista.
+    """
+    title, _, entries = iter_playlist(playlist_url, cache=cache)
+    return title, list(entries)
+
+def iter_playlist(playlist_url, cache=None):
+    """Abre a playlist sem enumerá-la; retorna (titulo, total, entradas).
+
+    `entradas` é um gerador que busca as páginas da playlist (ou canal)
+    conforme é consumido, e `total` é None quando o extrator não informa a
+    contagem de antemão. Com um MetadataCache, playlists de até
+    CACHE_MAX_ENTRIES itens são gravadas ao fim da enumeração e reaproveitadas.
+    """
+    if cache is not None:
+        cached = cache.get('playlist', playlist_url)
+        if cached is not None:
+            return cached['title'], len(cached['entries']), iter(cached['entries'])
+
+    ydl = YoutubeDL({
+        'extract_flat': True,
+        'quiet': True,
+        'nocheckcertificate': True,
+    })
+    try:
+        # process=False mantém as 'entries' como gerador (página a página)
+        info = ydl.extract_info(playlist_url, download=False, process=False)
+        for _ in range(MAX_REDIRECTS):
+            if not info or info.get('_type') not in ('url', 'url_transparent'):
+                break
+            info = ydl.extract_info(info['url'], download=False, process=False, ie_key=info.get('ie_key'))
+    except Exception:
+        ydl.close()
+        raise
+    if not info:
+        ydl.close()
+        return None, 0, iter(())
+
+    title = info.get('title', 'Musicas_Youtube')
+    if info.get('entries') is None:
+        # URL de um vídeo único: tratar como playlist de um item
+        ydl.close()
+        return title, 1, iter([{'id': info.get('id'), 'title': info.get('title'), 'url': playlist_url}])
+
+    raw_entries = info['entries']
+    total = info.get('playlist_count')
+    if total is None and isinstance(raw_entries, (list, tuple)):
+        total = len(raw_entries)
+
+    def generate():
+        collected = [] if cache is not None else None
+        try:
+            for entry in _iter_paged(raw_entries):
+                if not entry:
+                    continue
+                entry = ydl.sanitize_info(entry)
+                if collected is not None:
+                    collected.append(entry)
+                    if len(collected) > CACHE_MAX_ENTRIES:
+                        collected = None  # Grande demais para o cache
+                yield entry
+            if collected is not None:
+                cache.put('playlist', playlist_url, {'title': title, 'entries': collected})
+        finally:
+            ydl.close()
+
+    return title, total, generate()
+
+def _iter_paged(entries):
+    """Itera as entradas do yt-dlp (lista, gerador, LazyList ou PagedList)."""
+    if isinstance(entries, PagedList):
+        start = 0
+        while True:
+            page = entries.getslice(start, start + PAGE_SIZE)
+            if not page:
+                return
+            yield from page
+            start += PAGE_SIZE
+    else:
+        yield from entries
+
+def _pages(iterable, size=PAGE_SIZE):
+    """Agrupa um iterável em listas de até `size` itens."""
+    iterator = iter(iterable)
+    while True:
+        page = list(itertools.islice(iterator, size))
+        if not page:
+            return
+        yield page
+
+def prefetch_pages(pages, ahead=PREFETCH_PAGES):
+    """Consome `pages` em uma thread, até `ahead` páginas à frente.
+
+    A próxima página da playlist é buscada enquanto a atual ainda está
+    baixando. Erros da enumeração são repassados a quem consome.
+    """
+    buffer = queue.Queue(maxsize=ahead)
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def feed():
+        try:
+            for page in pages:
+                if not put(page):
+                    return
+            put(done)
+        except Exception as e:
+            put(e)
+        finally:
+            # Encerra o gerador (e o YoutubeDL da enumeração) nesta thread
+            close = getattr(pages, 'close', None)
+            if close is not None:
+                close()
+
+    threading.Thread(target=feed, daemon=True).start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+def extract_and_download(ydl, url, cache=None, segmented=None, timings=None, stream=None):
+    """Baixa um vídeo reaproveitando as informações em cache, se houver.
+
+    Se as informações em cache estiverem vencidas (URL de mídia expirada),
+    a entrada é invalidada e o vídeo é extraído novamente uma única vez.
+    Com um SegmentedDownloader, arquivos grandes são baixados em faixas.
+    Com `stream` (veja streamed_fetch), o áudio vai direto da rede para o
+    ffmpeg quando o formato permite.
+    Se `timings` (dict) for informado, recebe a duração da extração em
+    'metadata' e o instante de início do download em 'download_start'.
+    """
+    timings = timings if timings is not None else {}
+    started = time.perf_counter()
+    info = cache.get('video', url) if cache is not None else None
+    from_cache = info is not None
+    if not from_cache:
+        info = ydl.extract_info(url, download=False)
+        if not info:
+            timings['metadata'] = timings.get('metadata', 0.0) + time.perf_counter() - started
+            return None
+        info = ydl.sanitize_info(info, remove_private_keys=True)
+        if cache is not None:
+            cache.put('video', url, info)
+    timings['metadata'] = timings.get('metadata', 0.0) + time.perf_counter() - started
+    timings['download_start'] = time.perf_counter()
+
+    try:
+        result = None
+        if segmented is not None:
+            result = segmented_fetch(ydl, info, segmented)
+        if result is None and stream is not None:
+            result = streamed_fetch(ydl, info, *stream)
+        if result is None:
+            result = ydl.process_ie_result(info, download=True)
+    except DownloadError:
+        result = None
+    if from_cache and not _downloaded_file(result):
+        cache.invalidate('video', url)
+        return extract_and_download(ydl, url, segmented=segmented, timings=timings, stream=stream)
+    return result
+
+def segmented_fetch(ydl, info, downloader):
+    """Baixa o formato escolhido com o SegmentedDownloader, se elegível.
+
+    Retorna None quando o formato não se beneficia (pequeno, não HTTP,
+    formatos combinados) ou o servidor não aceita Range; nesse caso o
+    chamador segue com o download normal do yt-dlp.
+    """
+    selected = ydl.process_ie_result(copy.deepcopy(info), download=False)
+    size = selected.get('filesize') or selected.get('filesize_approx')
+    if (selected.get('requested_formats') or selected.get('protocol') not in ('http', 'https')
+            or not downloader.should_segment(size)):
+        return None
+
+    filename = ydl.prepare_filename(selected)
+    os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+    hooks = ydl.params.get('progress_hooks') or []
+
+    def progress(done, total, speed):
+        for hook in hooks:
+            hook({'status': 'downloading', 'filename': filename, 'info_dict': selected,
+                  'downloaded_bytes': done, 'total_bytes': total, 'speed': speed})
+
+    try:
+        downloader.download(selected['url'], filename, headers=selected.get('http_headers'), progress=progress)
+    except RangeNotSupported:
+        return None
+    except OSError as e:
+        raise DownloadError(str(e))
+
+    size = os.path.getsize(filename)
+    for hook in hooks:
+        hook({'status': 'finished', 'filename': filename, 'info_dict': selected,
+              'downloaded_bytes': size, 'total_bytes': size})
+    # Roda os pós-processadores configurados (ex.: FFmpegExtractAudio)
+    selected = ydl.post_process(filename, selected)
+    selected['requested_downloads'] = [{'filepath': selected.get('filepath', filename)}]
+    return selected
+
+def streamed_fetch(ydl, info, transcoder, profile, encoder=None, threads=None,
+                   finish=None, album=None, track=None):
+    """Baixa o formato escolhido direto para o stdin do ffmpeg, se elegível.
+
+    O arquivo final (já no codec do perfil) é gravado sem o arquivo bruto
+    intermediário; com `finish` (AudioFinish), tags, capa e loudnorm entram
+    na mesma invocação do ffmpeg. Retorna None quando o formato não pode ir por pipe
+    (não HTTP, formatos combinados, MP4 que exige seek) ou o ffmpeg falha
+    antes do fim; nesse caso o chamador segue com o download normal.
+    O resultado traz 'streamed' com os bytes recebidos e os tempos do ffmpeg.
+    """
+    selected = ydl.process_ie_result(copy.deepcopy(info), download=False)
+    if selected.get('requested_formats') or selected.get('protocol') not in ('http', 'https'):
+        return None
+
+    raw_path = ydl.prepare_filename(selected)
+    dst, mode = profile.output_path(raw_path, selected.get('acodec'),
+                                    transcode=finish is not None and finish.needs_transcode)
+    os.makedirs(os.path.dirname(os.path.abspath(dst)), exist_ok=True)
+    input_args, codec_args, cover = None, profile.ffmpeg_args(mode, encoder, threads), None
+    if finish is not None:
+        input_args, codec_args, cover = finish.prepare(
+            selected, dst, codec_args, os.path.splitext(dst)[1].lstrip('.'),
+            urlopen=ydl.urlopen, album=album, track=track,
+        )
+    hooks = ydl.params.get('progress_hooks') or []
+    total = selected.get('filesize')
+
+    def progress(done, size, speed):
+        for hook in hooks:
+            hook({'status': 'downloading', 'filename': dst, 'info_dict': selected,
+                  'downloaded_bytes': done, 'total_bytes': size or total, 'speed': speed})
+
+    try:
+        result = transcoder.transcode(
+            selected['url'], dst, codec_args,
+            ext=selected.get('ext'), headers=selected.get('http_headers'),
+            chunk_size=(selected.get('downloader_options') or {}).get('http_chunk_size'),
+            total=total, progress=progress, input_args=input_args,
+        )
+    except StreamUnsupported as e:
+        ydl.write_debug(f'Streaming indisponível ({e}); usando o download normal')
+        return None
+    except (OSError, RuntimeError, RequestError) as e:
+        ydl.report_warning(f'Falha no streaming ({e}); usando o download normal')
+        return None
+    finally:
+        remove_cover(cover)
+
+    for hook in hooks:
+        hook({'status': 'finished', 'filename': dst, 'info_dict': selected,
+              'downloaded_bytes': result['bytes'], 'total_bytes': result['bytes']})
+    selected['streamed'] = dict(result, mode=mode)
+    selected['requested_downloads'] = [{'filepath': dst}]
+    return selected
+
+def ydl_transcoder(ydl, ffmpeg=None):
+    """StreamTranscoder que abre as requisições pela sessão do yt-dlp."""
+    return StreamTranscoder(urlopen=lambda url, headers: ydl.urlopen(Request(url, headers=headers)),
+                            ffmpeg=ffmpeg)
+
+def _downloaded_file(info):
+    """Retorna o caminho do arquivo baixado, se o download ocorreu."""
+    downloads = (info or {}).get('requested_downloads') or []
+    if downloads and os.path.exists(downloads[0].get('filepath') or ''):
+        return downloads[0]['filepath']
+    return None
+
+def entry_url(entry):
+    """Retorna a URL de download de uma entrada plana da playlist."""
+    return entry.get('url') or entry.get('webpage_url') or entry.get('id')
+
+class ItemLogger:
+    """Repassa as mensagens do yt-dlp e guarda o último erro do item.
+
+    Com `ignoreerrors` o yt-dlp não levanta exceções; o texto do erro é a
+    única forma de distinguir bloqueios (429/403) e timeouts de falhas
+    definitivas.
+    """
+    def __init__(self, logger=None, quiet=False):
+        self.logger = logger
+        self.quiet = quiet
+        self.last_error = None
+
+    def debug(self, msg):
+        if self.logger is not None:
+            self.logger.debug(msg)
+        elif not self.quiet and not msg.startswith('[debug] '):
+            print(msg)
+
+    def warning(self, msg):
+        if self.logger is not None:
+            self.logger.warning(msg)
+        else:
+            print(f"WARNING: {msg}", file=sys.stderr)
+
+    def error(self, msg):
+        self.last_error = msg
+        if self.logger is not None:
+            self.logger.error(msg)
+        else:
+            print(msg, file=sys.stderr)
+
+def build_ydl_opts(outtmpl, logger=None, quiet=False, inline_transcode=True, profile=None, ffmpeg=None):
+    """Monta as opções do yt-dlp para baixar e converter um item.
+
+    Com `inline_transcode=False` o yt-dlp só baixa o áudio bruto e a
+    conversão fica a cargo do TranscodePipeline. O seletor de formato
+    do perfil favorece fontes que podem ser apenas copiadas. `ffmpeg` é o
+    executável resolvido (ex.: o da pasta local, fora do PATH).
+    """
+    profile = profile or OutputProfile()  # Padrão: MP3 192kbps
+    ydl_opts = {
+        'format': profile.format_selector,
+        'outtmpl': outtmpl,
+        'postprocessors': [profile.ydl_postprocessor()] if inline_transcode else [],
+        'quiet': quiet,
+        'noprogress': quiet,
+        'no_warnings': True,
+        'ignoreerrors': True, # Pular vídeos com erro (privados/deletados)
+        'nocheckcertificate': True,
+    }
+    if logger is not None:
+        ydl_opts['logger'] = logger
+    if ffmpeg is not None:
+        ydl_opts['ffmpeg_location'] = ffmpeg
+    return ydl_opts
+
+class DownloadSettings:
+    """Opções de download_entries: como baixar, converter e nomear os itens.
+
+    Por padrão a conversão roda em um TranscodePipeline separado (um
+    processo por núcleo); `transcode_workers=0` converte dentro do próprio
+    yt-dlp. Com `use_index`, só os itens ausentes do índice da pasta são
+    baixados (`verify` confere o SHA-256 dos já baixados); com `cache`, as
+    informações dos vídeos vêm do MetadataCache.
+    `segmented` (um SegmentedDownloader) baixa arquivos grandes em faixas.
+    `profile` (OutputProfile) define o formato de saída; o áudio é só
+    copiado quando a origem já está no codec desejado.
+    `naming='id'` grava '<id>.<ext>' (acervo deduplicado do modo lote).
+    Com `adaptive`, `jobs` passa a ser o teto e a concorrência é ajustada
+    pela vazão, latência e erros (AIMD); `host_rate` limita quantos itens
+    por segundo são iniciados em cada host.
+    Itens com erro temporário voltam para a fila ao final, em até
+    `retry_rounds` rodadas com espera exponencial e jitter.
+    Com `stream`, o áudio vai da rede direto para o ffmpeg de cada worker
+    (sem arquivo bruto); formatos que exigem seek usam o caminho normal.
+    `finish` (AudioFinish) grava tags, capa e loudnorm na mesma passada do
+    ffmpeg que converte o item; `album` é o título da playlist nas tags.
+    """
+
+    def __init__(self, jobs=1, transcode_workers=None, queue_size=None, use_index=True, verify=False,
+                 cache=None, segmented=None, profile=None, naming='playlist', adaptive=False,
+                 host_rate=None, retry_rounds=RETRY_ROUNDS, stream=False, finish=None, album=None):
+        self.jobs = max(1, jobs)
+        self.transcode_workers = transcode_workers
+        self.queue_size = queue_size
+        self.use_index = use_index
+        self.verify = verify
+        self.cache = cache
+        self.segmented = segmented
+        self.profile = profile or OutputProfile()
+        self.naming = naming
+        self.adaptive = adaptive
+        self.host_rate = host_rate
+        self.retry_rounds = retry_rounds
+        self.stream = stream
+        self.finish = finish
+        self.album = album
+
+class ItemAttempt:
+    """Uma tentativa de um item: o que foi baixado e os tempos de cada fase."""
+
+    def __init__(self, run, index, entry, attempt):
+        self.run = run
+        self.index = index
+        self.entry = entry
+        self.attempt = attempt
+        self.info = None
+        self.raw_path = None
+        self.streamed = None
+        self.nbytes = 0
+        self.cover = None
+        self.timings = {}
+        self.trace = ItemTrace(entry.get('id'), index, entry.get('title'), attempt)
+        self._last_notified = 0.0
+
+    def item_hook(self, d):
+        """Progresso do item para `on_item`, com taxa limitada."""
+        if d['status'] != 'downloading':
+            return
+        now = time.monotonic()
+        if now - self._last_notified >= ITEM_PROGRESS_INTERVAL:
+            self._last_notified = now
+            self.run.notify(self.index, self.entry, ITEM_DOWNLOADING, nbytes=d.get('downloaded_bytes') or 0,
+                            total_bytes=d.get('total_bytes') or d.get('total_bytes_estimate'),
+                            speed=d.get('speed'))
+
+    def timing_hook(self, d):
+        if d['status'] == 'downloading':
+            self.timings.setdefault('first_byte_at', time.perf_counter())
+        elif d['status'] == 'finished':
+            self.timings['download_end'] = time.perf_counter()
+
+    def postprocessor_hook(self, d):
+        # Conversão dentro do yt-dlp (--transcode-workers 0)
+        if d['status'] == 'started':
+            self.timings['pp_start'] = time.perf_counter()
+        elif d['status'] == 'finished' and 'pp_start' in self.timings:
+            self.timings['encode'] = (self.timings.get('encode', 0.0)
+                                      + time.perf_counter() - self.timings.pop('pp_start'))
+
+    def finish_trace(self, status, error=None, nbytes=0):
+        metrics = self.run.metrics
+        if metrics is None:
+            return
+        start_at = self.timings.get('download_start')
+        if start_at is not None:
+            if 'first_byte_at' in self.timings:
+                self.trace.set('first_byte', self.timings['first_byte_at'] - start_at)
+            if 'download_end' in self.timings:
+                self.trace.set('download', self.timings['download_end'] - start_at)
+        self.trace.set('metadata', self.timings.get('metadata'))
+        self.trace.set('encode', self.timings.get('encode'))
+        self.trace.set('finalize', self.timings.get('finalize'))
+        metrics.finish_item(self.trace, status, error=error, nbytes=nbytes)
+
+class EntryDownload:
+    """Uma execução de download_entries, dividida em estágios.
+
+    plan_page() compara as entradas com o índice (itens já baixados são
+    pulados), fetch() baixa o áudio bruto de um item, encode() o entrega ao
+    estágio de conversão e finalize() registra o item convertido no índice
+    e no diário. run() encadeia os estágios com um pool limitado de
+    downloads e as rodadas de novas tentativas.
+    """
+
+    def __init__(self, folder_name, settings, log=print, logger=None, progress=None, on_item=None,
+                 cancel=None, slots=None, metrics=None):
+        self.folder_name = folder_name
+        self.settings = settings
+        self.profile = settings.profile
+        self.log = log
+        self.logger = logger
+        self.on_item = on_item
+        self.cancel = cancel
+        self.slots = slots
+        self.metrics = metrics
+        self.progress = progress
+        self.lock = threading.Lock()
+        self.stats = {'ok': 0, 'failed': 0, 'cancelled': 0, 'retried': 0, 'bytes': 0, 'download_busy': 0.0,
+                      'streamed': 0, 'io_avoided': 0}
+        self.plan_summary = {'indexed': 0, 'renamed': 0, 'adopted': 0, 'scheduled': 0}
+        self.enumerated = 0
+        self.index_db = DownloadIndex(folder_name) if settings.use_index else None
+        self.journal = FailureJournal(folder_name)
+        self.width = None
+        self.jobs = settings.jobs
+        self.quiet = False
+        self.tracker = None
+        self.pipeline = None
+        self.ffmpeg = self.encoder = self.threads = None
+        self.controller = self.rate_limiter = None
+
+    def cancelled(self):
+        return self.cancel is not None and self.cancel.is_set()
+
+    def notify(self, index, entry, state, **details):
+        if self.on_item is not None:
+            self.on_item(index, entry, state, **details)
+
+    def journal_record(self, index, entry, status, error=None, info=None):
+        video_id = (info or {}).get('id') or entry.get('id') or entry_url(entry)
+        self.journal.record(video_id, status, playlist_index=index,
+                            title=(info or {}).get('title') or entry.get('title'),
+                            url=entry_url(entry), error=error)
+
+    # Estágio 1: comparar com o índice e pular o que já foi baixado
+
+    def plan_page(self, page):
+        """Compara uma página com o índice; retorna os (posição, entrada) a baixar."""
+        self.enumerated += len(page)
+        if self.index_db is None:
+            self.plan_summary['scheduled'] += len(page)
+            for index, entry in page:
+                self.notify(index, entry, ITEM_QUEUED)
+            return page
+        pending, summary = self.index_db.plan(
+            [entry for _, entry in page], self.width, codec=self.profile.codec,
+            bitrate=self.profile.bitrate, verify=self.settings.verify, ext=self.profile.extension,
+            naming=self.settings.naming, indices=[index for index, _ in page],
+        )
+        for key, value in summary.items():
+            self.plan_summary[key] += value
+        # Itens já no índice não são tentados: o diário não deve apontá-los como falha
+        pending_ids = {entry.get('id') for _, entry in pending}
+        self.journal.mark_ok([e['id'] for _, e in page if e.get('id') and e['id'] not in pending_ids])
+        if self.on_item is not None:
+            pending_indices = {index for index, _ in pending}
+            for index, entry in page:
+                self.notify(index, entry, ITEM_QUEUED if index in pending_indices else ITEM_INDEXED)
+        return pending
+
+    def enumerate_pages(self, pairs):
+        """Planeja e entrega os itens a baixar conforme as páginas chegam."""
+        try:
+            for page in prefetch_pages(_pages(pairs)):
+                pending = self.plan_page(page)
+                self.tracker.add_items(len(pending))
+                yield from pending
+        except Exception as e:
+            self.log(f"❌ Erro ao enumerar a playlist (após {self.enumerated} item(ns)): {e}")
+        self.tracker.set_total(self.plan_summary['scheduled'])
+        self.log(f"🎵 Enumeração concluída: {self.enumerated} item(ns)")
+        if self.index_db is not None:
+            self.log(format_plan_summary(self.plan_summary))
+
+    # Estágio 2: baixar o áudio bruto
+
+    def progress_hook(self, d):
+        if self.cancelled():
+            raise DownloadCancelled('Download cancelado')
+        if d['status'] == 'finished':
+            size = d.get('total_bytes') or d.get('downloaded_bytes') or 0
+            with self.lock:
+                self.stats['bytes'] += size
+
+    def fetch(self, item):
+        """Baixa um item; retorna (desfecho, erro) se falhar, None se cancelado ou o ItemAttempt."""
+        settings, index, entry = self.settings, item.index, item.entry
+        # '%' no nome da pasta seria interpretado pelo template do yt-dlp
+        folder_tmpl = self.folder_name.replace('%', '%%')
+        if settings.naming == 'id':
+            outtmpl = f'{folder_tmpl}/%(id)s.%(ext)s'
+        else:
+            outtmpl = f'{folder_tmpl}/{str(index).zfill(self.width)} - %(title)s.%(ext)s'
+        url = entry_url(entry)
+        # Com o acervo deduplicado (modo lote) o arquivo não pertence a uma só playlist
+        track = index if settings.naming == 'playlist' else None
+        item_logger = ItemLogger(self.logger, self.quiet)
+
+        ydl_opts = build_ydl_opts(
+            outtmpl,
+            logger=item_logger,
+            quiet=self.quiet,
+            inline_transcode=self.pipeline is None and settings.finish is None,
+            profile=self.profile,
+            ffmpeg=self.ffmpeg,
+        )
+        ydl_opts['progress_hooks'] = [self.progress_hook, self.tracker.hook, item.timing_hook]
+        if self.on_item is not None:
+            ydl_opts['progress_hooks'].append(item.item_hook)
+        ydl_opts['postprocessor_hooks'] = [item.postprocessor_hook]
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(url)
+        if self.controller is not None:
+            self.controller.acquire()
+        if self.slots is not None:
+            self.slots.acquire()
+        started = time.perf_counter()
+        try:
+            if self.cancelled():
+                return None
+            self.notify(index, entry, ITEM_DOWNLOADING, nbytes=0)
+            with YoutubeDL(ydl_opts) as ydl:
+                if self.pipeline is None and settings.finish is not None:
+                    # Conversão, tags, capa e loudnorm em um único pós-processador
+                    single_pass = SinglePassPP(ydl, self.profile, settings.finish, settings.album, track,
+                                               self.encoder, self.threads, ffmpeg=self.ffmpeg)
+                    ydl.add_post_processor(single_pass, when='post_process')
+                stream_args = None
+                if settings.stream:
+                    stream_args = (ydl_transcoder(ydl, self.ffmpeg), self.profile, self.encoder, self.threads,
+                                   settings.finish, settings.album, track)
+                # Com ignoreerrors, falhas retornam None; o erro fica no ItemLogger
+                info = extract_and_download(ydl, url, cache=settings.cache, segmented=settings.segmented,
+                                            timings=item.timings, stream=stream_args)
+                if (settings.finish is not None and self.pipeline is not None and _downloaded_file(info)
+                        and not info.get('streamed')):
+                    # A capa é baixada aqui, pela sessão do yt-dlp; a conversão a embute
+                    out_ext = self.profile.plan(info.get('acodec'), settings.finish.needs_transcode)[1]
+                    item.cover = settings.finish.fetch_cover(info, _downloaded_file(info), ydl.urlopen,
+                                                             ext=out_ext)
+        except DownloadCancelled:
+            return None
+        finally:
+            with self.lock:
+                self.stats['download_busy'] += time.perf_counter() - started
+            if self.slots is not None:
+                self.slots.release()
+            if self.controller is not None:
+                self.controller.release()
+
+        item.info = info
+        item.raw_path = _downloaded_file(info)
+        item.streamed = (info or {}).get('streamed')
+        if item.streamed:
+            item.nbytes = item.streamed['bytes']
+        else:
+            item.nbytes = os.path.getsize(item.raw_path) if item.raw_path else 0
+        if self.controller is not None:
+            first_byte_at = item.timings.get('first_byte_at')
+            self.controller.record(
+                latency=first_byte_at - started if first_byte_at else None,
+                nbytes=item.nbytes,
+                error=None if item.raw_path else classify_error(item_logger.last_error),
+            )
+        if item.raw_path is None:
+            status = classify_outcome(item_logger.last_error)
+            error = item_logger.last_error or "Download não concluído"
+            item.finish_trace(status, error)
+            return status, error
+        return item
+
+    # Estágio 3: converter (no pool de conversão, durante o download ou no yt-dlp)
+
+    def encode(self, item):
+        """Entrega o áudio baixado à conversão; finalize() roda quando ela termina."""
+        info = item.info
+        if item.streamed:
+            # Convertido durante o download: o bruto nunca foi gravado nem relido
+            item.timings['encode'] = item.streamed['encode_tail']
+            if self.pipeline is not None:
+                # Sem tempo ocupado: o ffmpeg rodou no worker, não no pool de conversão
+                self.pipeline.record(item.streamed['mode'], item.streamed['cpu'], info.get('duration') or 0.0)
+            with self.lock:
+                self.stats['streamed'] += 1
+                self.stats['io_avoided'] += 2 * item.nbytes
+            self.finalize(item, item.raw_path)
+            return
+
+        if self.pipeline is None:
+            # O FFmpegExtractAudio já deixou o arquivo final no lugar
+            self.finalize(item, item.raw_path)
+            return
+
+        finish = self.settings.finish
+        out_path, mode = self.profile.output_path(item.raw_path, info.get('acodec'),
+                                                  transcode=finish is not None and finish.needs_transcode)
+        duration = info.get('duration') or 0.0
+        if mode == 'copy' and out_path == item.raw_path and finish is None:
+            # Já está no codec e contêiner finais: nada a fazer
+            self.pipeline.record('copy', 0.0, duration)
+            self.finalize(item, item.raw_path)
+            return
+        # Entregar o áudio bruto ao estágio de conversão (ou remux); tags,
+        # capa e loudnorm vão na mesma invocação do ffmpeg
+        codec_args, input_args = self.profile.ffmpeg_args(mode, self.encoder, self.threads), None
+        if finish is not None:
+            track = item.index if self.settings.naming == 'playlist' else None
+            input_args, codec_args = finish.ffmpeg_args(
+                codec_args, os.path.splitext(out_path)[1].lstrip('.'),
+                tags=finish.metadata(info, self.settings.album, track), cover=item.cover,
+                sample_rate=info.get('asr'),
+            )
+        self.notify(item.index, item.entry, ITEM_CONVERTING, nbytes=item.nbytes)
+        self.pipeline.submit(item.raw_path, out_path, callback=lambda path: self.finalize(item, path),
+                             on_error=lambda path, error: self.encode_failed(item, error),
+                             codec_args=codec_args, mode=mode, duration=duration,
+                             timings=item.timings, input_args=input_args)
+
+    # Estágio 4: registrar o item convertido
+
+    def finalize(self, item, path):
+        """Item convertido: índice, diário e métricas. Só aqui ele conta como concluído."""
+        remove_cover(item.cover)
+        finalize_start = time.perf_counter()
+        try:
+            if self.index_db is not None:
+                self.index_db.record(item.info['id'], path, item.info.get('title'),
+                                     codec=self.profile.codec, bitrate=self.profile.bitrate)
+            self.journal_record(item.index, item.entry, OK, info=item.info)
+        except Exception:
+            self.settle(item.index, item.entry, PERMANENT_ERROR)
+            raise
+        item.timings['finalize'] = time.perf_counter() - finalize_start
+        item.finish_trace(OK, nbytes=item.nbytes)
+        self.notify(item.index, item.entry, ITEM_DONE,
+                    nbytes=os.path.getsize(path) if os.path.exists(path) else item.nbytes)
+        self.settle(item.index, item.entry, OK)
+
+    def encode_failed(self, item, error):
+        remove_cover(item.cover)
+        self.journal_record(item.index, item.entry, PERMANENT_ERROR, error=f"Conversão: {error}", info=item.info)
+        item.finish_trace(PERMANENT_ERROR, f"Conversão: {error}", item.nbytes)
+        self.notify(item.index, item.entry, ITEM_FAILED, error=f"Conversão: {error}")
+        self.settle(item.index, item.entry, PERMANENT_ERROR)
+
+    def settle(self, index, entry, status):
+        """Contabiliza o desfecho final de um item (depois da conversão, se houver)."""
+        with self.lock:
+            self.stats['ok' if status == OK else 'failed'] += 1
+            done = self.stats['ok'] + self.stats['failed']
+        self.tracker.item_done()
+        if self.quiet:
+            mark = '✅' if status == OK else ('🔒' if status == SKIPPED_PRIVATE else '⚠️ ')
+            count = self.tracker.total_items if self.tracker.total_known else f"{self.tracker.total_items}+"
+            self.log(f"{mark} [{done}/{count}] {entry.get('title') or entry.get('id')}")
+
+    # Execução: pool de downloads e rodadas de novas tentativas
+
+    def process(self, index, entry, attempt=1):
+        """Baixa e encaminha um item; retorna (desfecho, erro) ou None se cancelado."""
+        item = self.fetch(ItemAttempt(self, index, entry, attempt))
+        if not isinstance(item, ItemAttempt):
+            return item
+        self.encode(item)
+        return OK, None
+
+    def run_round(self, items, final, attempt=1):
+        """Executa uma rodada; retorna os itens com erro temporário (se não for a última)."""
+        retry = []
+
+        def handle(future, index, entry):
+            try:
+                outcome = future.result()
+            except Exception as e:
+                self.log(f"❌ Erro em '{entry.get('title') or entry.get('id')}': {e}")
+                outcome = PERMANENT_ERROR, str(e)
+            if outcome is None:
+                with self.lock:
+                    self.stats['cancelled'] += 1
+                self.tracker.item_done()
+                self.notify(index, entry, ITEM_CANCELLED)
+                return
+            status, error = outcome
+            if status == TRANSIENT_ERROR and not final:
+                # Fica para a próxima rodada; o diário registra a tentativa
+                self.journal_record(index, entry, status, error=error)
+                retry.append((index, entry))
+                self.notify(index, entry, ITEM_RETRY, error=error)
+                return
+            if status != OK:
+                # Itens OK são contabilizados por finalize(), ao fim da conversão
+                self.journal_record(index, entry, status, error=error)
+                self.notify(index, entry, ITEM_SKIPPED if status == SKIPPED_PRIVATE else ITEM_FAILED, error=error)
+                self.settle(index, entry, status)
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            futures = {}
+
+            def collect():
+                finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    handle(future, *futures.pop(future))
+
+            for index, entry in items:
+                # Poucos itens adiantados: gerador e memória avançam junto com os downloads
+                while len(futures) >= self.jobs * 2:
+                    collect()
+                futures[executor.submit(self.process, index, entry, attempt)] = (index, entry)
+            while futures:
+                collect()
+        return retry
+
+    def start_stages(self, has_items):
+        """Sobe o pool de conversão e os limitadores, se houver o que baixar."""
+        settings = self.settings
+        if not has_items:
+            return
+        # Caminho resolvido do ffmpeg, repassado ao yt-dlp e aos estágios de conversão
+        capabilities = resolve_ffmpeg()
+        self.ffmpeg = capabilities.ffmpeg if capabilities is not None else None
+        if settings.transcode_workers != 0:
+            self.pipeline = TranscodePipeline(workers=settings.transcode_workers, queue_size=settings.queue_size,
+                                              log=self.log, ffmpeg=self.ffmpeg).start()
+        if (self.pipeline is not None or settings.stream or settings.finish is not None) and capabilities is not None:
+            # Encoder mais rápido disponível e threads por processo de conversão
+            # (em streaming ou no SinglePassPP, cada download tem o seu ffmpeg)
+            self.encoder = self.profile.choose_encoder(capabilities)
+            per_process = self.jobs if settings.stream or self.pipeline is None else self.pipeline.workers
+            self.threads = capabilities.thread_count(self.encoder, per_process)
+            self.log(format_capabilities(capabilities, self.encoder, self.threads))
+        on_change = self.metrics.record_concurrency if self.metrics is not None else None
+        if settings.adaptive:
+            self.controller = AdaptiveConcurrency(initial=min(self.jobs, 2), maximum=self.jobs, log=self.log,
+                                                  on_change=on_change)
+        elif on_change is not None:
+            on_change(self.jobs)
+        if settings.host_rate:
+            self.rate_limiter = HostRateLimiter(settings.host_rate)
+
+    def run(self, entries, indices=None, width=None):
+        """Executa todos os estágios sobre `entries`; retorna o resumo da execução."""
+        lazy = not isinstance(entries, (list, tuple))
+        pairs = zip(indices if indices is not None else itertools.count(1), entries)
+        guessed_width = width is None and lazy
+        if width is None:
+            if lazy:
+                # Total ainda desconhecido: manter a largura já usada na pasta
+                width = (self.index_db.numbering_width() if self.index_db is not None else None) or LAZY_WIDTH
+            else:
+                width = len(str(len(entries)))
+        self.width = width
+
+        if lazy:
+            scheduled = None
+            total = None
+        else:
+            scheduled = self.plan_page(list(pairs))
+            if self.index_db is not None:
+                self.log(format_plan_summary(self.plan_summary))
+            total = len(scheduled)
+            self.jobs = max(1, min(self.jobs, total or 1))
+        self.tracker = ProgressTracker(total, self.progress)
+        # Com progresso agregado (ou vários workers) a saída do yt-dlp fica silenciosa
+        self.quiet = self.jobs > 1 or self.progress is not None
+        self.start_stages(lazy or bool(scheduled))
+        return self.execute(self.enumerate_pages(pairs) if lazy else scheduled, guessed_width)
+
+    def run_batches(self, batches, width):
+        """Executa os estágios sobre lotes de (posição, entrada) que chegam aos poucos.
+
+        Cada lote só é pedido a `batches` quando o pool de downloads tem
+        vaga, sem leitura antecipada: quem produz os lotes (ex.: os leases
+        do manifesto distribuído) entrega trabalho à medida que ele anda.
+        """
+        self.width = width
+        self.tracker = ProgressTracker(None, self.progress)
+        self.quiet = self.jobs > 1 or self.progress is not None
+        self.start_stages(True)
+        return self.execute(self.feed(batches))
+
+    def feed(self, batches):
+        """Planeja e entrega os itens de cada lote conforme os lotes chegam."""
+        for batch in batches:
+            pending = self.plan_page(batch)
+            self.tracker.add_items(len(pending))
+            yield from pending
+        self.tracker.set_total(self.plan_summary['scheduled'])
+
+    def execute(self, items, guessed_width=False):
+        """Baixa `items` com as rodadas de novas tentativas; retorna o resumo."""
+        stats, retry_rounds = self.stats, self.settings.retry_rounds
+        start = time.perf_counter()
+        pending = self.run_round(items, final=retry_rounds == 0)
+        for attempt in range(1, retry_rounds + 1):
+            if not pending or self.cancelled():
+                break
+            delay = backoff_delay(attempt)
+            self.log(f"🔁 {len(pending)} item(ns) com erro temporário; "
+                     f"nova tentativa {attempt}/{retry_rounds} em {delay:.0f}s")
+            if self.cancel is not None:
+                self.cancel.wait(delay)
+            else:
+                time.sleep(delay)
+            stats['retried'] += len(pending)
+            pending = self.run_round(pending, final=attempt == retry_rounds, attempt=attempt + 1)
+        if pending:
+            # Cancelado durante a espera: os itens restantes ficam como falha no diário
+            with self.lock:
+                stats['failed'] += len(pending)
+            for index, entry in pending:
+                self.notify(index, entry, ITEM_CANCELLED)
+        return self.close(start, guessed_width)
+
+    def close(self, start, guessed_width=False):
+        """Espera a conversão terminar, fecha o índice e o diário e monta o resumo."""
+        stats = self.stats
+        pipeline_stats = self.pipeline.close() if self.pipeline is not None else None
+        if pipeline_stats is not None:
+            stats['pipeline'] = pipeline_stats
+        stats['index'] = self.plan_summary
+        stats['enumerated'] = self.enumerated
+        if self.index_db is not None:
+            final_width = len(str(self.enumerated))
+            if (guessed_width and self.settings.naming == 'playlist' and self.enumerated
+                    and final_width != self.width):
+                renamed = self.index_db.repad(final_width)
+                self.log(f"🔢 Numeração ajustada para {final_width} dígito(s) ({renamed} arquivo(s) renomeado(s))")
+            self.index_db.close()
+        if self.controller is not None:
+            stats['concurrency'] = self.controller.stats()
+        if self.rate_limiter is not None:
+            stats['rate_limit_wait'] = self.rate_limiter.waited
+        stats['journal'] = self.journal.summary()
+        stats['journal_path'] = self.journal.path
+        self.journal.close()
+
+        elapsed = time.perf_counter() - start
+        stats['elapsed'] = elapsed
+        if pipeline_stats is not None:
+            pipeline_stats['download_workers'] = self.jobs
+            pipeline_stats['download_utilization'] = (stats['download_busy'] / (self.jobs * elapsed)
+                                                      if elapsed > 0 else 0.0)
+        stats['items_per_sec'] = stats['ok'] / elapsed if elapsed > 0 else 0.0
+        stats['mb_per_sec'] = stats['bytes'] / (1024 * 1024) / elapsed if elapsed > 0 else 0.0
+        return stats
+
+def download_entries(entries, folder_name, settings=None, indices=None, width=None, log=print, logger=None,
+                     progress=None, on_item=None, cancel=None, slots=None, metrics=None):
+    """Baixa as entradas da playlist usando um pool limitado de workers.
+
+    Cada item é baixado por um YoutubeDL próprio, mantendo o padrão
+    '%(playlist_index)s - %(title)s' nos nomes dos arquivos; `settings`
+    (DownloadSettings) define como baixar e converter. O desfecho de cada
+    item vai para o diário da pasta (FailureJournal).
+    `entries` pode ser um gerador (veja iter_playlist): as páginas são
+    comparadas com o índice e baixadas conforme chegam, e o total aparece
+    quando a enumeração termina. Sem `width`, a numeração segue a já usada
+    na pasta e é ajustada ao fim se o total pedir outra largura.
+    `indices`/`width` informam as posições e a largura da numeração quando
+    `entries` é só uma parte da playlist (ex.: --retry-failed).
+    `progress(snapshot)` recebe o progresso agregado, com taxa limitada.
+    `cancel` (threading.Event) interrompe os downloads em andamento e
+    descarta os pendentes; `slots` (threading.Semaphore) limita os
+    downloads simultâneos somados entre várias execuções (serviço).
+    Com `metrics` (RunMetrics), cada tentativa registra a duração das fases
+    metadados, primeiro byte, download, conversão e finalização.
+    `on_item(posição, entrada, estado, **detalhes)` acompanha cada item
+    (ITEM_QUEUED, ITEM_DOWNLOADING com bytes/velocidade, ITEM_DONE com o
+    tamanho final, ITEM_FAILED com o erro etc.), chamado de várias threads.
+    Retorna um dicionário com o resumo da execução.
+    """
+    run = EntryDownload(folder_name, settings or DownloadSettings(), log=log, logger=logger, progress=progress,
+                        on_item=on_item, cancel=cancel, slots=slots, metrics=metrics)
+    return run.run(entries, indices=indices, width=width)
+
+def format_throughput(stats):
+    """Formata o resumo de vazão de uma execução."""
+    summary = (
+        f"⏱️  {stats['ok']} item(ns) em {stats['elapsed']:.1f}s "
+        f"({stats['items_per_sec']:.2f} itens/s, {stats['mb_per_sec']:.2f} MB/s)"
+        + (f" | {stats['failed']} falha(s)" if stats['failed'] else "")
+        + (f" | {stats['cancelled']} cancelado(s)" if stats.get('cancelled') else "")
+        + (f" | {stats['retried']} nova(s) tentativa(s)" if stats.get('retried') else "")
+    )
+    if stats.get('streamed'):
+        summary += (f"\n🌊 {stats['streamed']} item(ns) convertido(s) durante o download: "
+                    f"{stats['io_avoided'] / (1024 * 1024):.1f} MB de E/S intermediária evitados")
+    if 'concurrency' in stats:
+        summary += "\n" + format_concurrency_stats(stats['concurrency'])
+    journal = stats.get('journal') or {}
+    if any(journal.get(status) for status in (SKIPPED_PRIVATE, TRANSIENT_ERROR, PERMANENT_ERROR)):
+        summary += "\n" + format_journal_summary(journal)
+        if journal.get(TRANSIENT_ERROR) or journal.get(PERMANENT_ERROR):
+            summary += "\n   Use --retry-failed para tentar de novo só os itens com erro."
+    if 'pipeline' in stats:
+        summary += "\n" + format_pipeline_stats(stats['pipeline'])
+    return summary
+
+def failed_entries(folder_name, entries):
+    """Seleciona (posição, entrada) das entradas cuja última tentativa falhou.
+
+    `entries` pode ser um gerador; retorna a seleção e quantas entradas a
+    playlist tem, para a numeração dos arquivos.
+    """
+    journal = FailureJournal(folder_name)
+    try:
+        failed = {row['video_id'] for row in journal.failures()}
+    finally:
+        journal.close()
+    selected = []
+    count = 0
+    for count, entry in enumerate(entries, start=1):
+        if (entry.get('id') or entry_url(entry)) in failed:
+            selected.append((count, entry))
+    return selected, count
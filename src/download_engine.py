@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+"""
+Motor de downloads do YouTube Downloader, com API asyncio.
+Resolve a playlist, cria a pasta de destino e baixa os itens com
+download_entries, publicando eventos tipados (log, progresso, estado de
+cada item e resultado da playlist). A CLI, a GUI e o serviço de downloads
+consomem o mesmo motor:
+
+    async with DownloadEngine() as engine:
+        async for event in engine.download(urls, DownloadOptions(jobs=4)):
+            ...
+
+Com `DownloadOptions(store_dir=...)`, as URLs formam um lote: cada vídeo
+único é baixado uma só vez para o acervo e as pastas das playlists recebem
+links para ele.
+
+O trabalho bloqueante (yt-dlp e ffmpeg) roda em executores do próprio
+motor; o laço de eventos só recebe as notificações.
+"""
+
+import os
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from download_core import (iter_playlist, resolve_playlist, download_entries, failed_entries, sanitize_filename,
+                           DownloadSettings, ITEM_QUEUED, ITEM_INDEXED, ITEM_DOWNLOADING, ITEM_CONVERTING,
+                           ITEM_DONE, ITEM_FAILED, ITEM_SKIPPED, ITEM_RETRY, ITEM_CANCELLED)
+from output_profile import OutputProfile
+from media_store import store_folder, link_playlist
+from download_index import DownloadIndex
+
+# Playlists processadas ao mesmo tempo por um motor (somando todas as chamadas)
+DEFAULT_MAX_PLAYLISTS = 4
+
+# Resultado de uma playlist (PlaylistFinished.status)
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+__all__ = [
+    "DownloadEngine", "DownloadOptions", "run_playlist", "run_batch",
+    "Event", "LogEvent", "ProgressEvent", "PlaylistStarted", "ItemEvent", "PlaylistFinished", "BatchFinished",
+    "DONE", "FAILED", "CANCELLED",
+    "ITEM_QUEUED", "ITEM_INDEXED", "ITEM_DOWNLOADING", "ITEM_CONVERTING",
+    "ITEM_DONE", "ITEM_FAILED", "ITEM_SKIPPED", "ITEM_RETRY", "ITEM_CANCELLED",
+]
+
+
+class Event:
+    """Evento do motor; `url` identifica a playlist que o originou (None no download do acervo)."""
+
+    type = None
+
+    def __init__(self, url):
+        self.url = url
+
+    def __repr__(self):
+        fields = ", ".join(f"{key}={value!r}" for key, value in vars(self).items())
+        return f"{type(self).__name__}({fields})"
+
+
+class LogEvent(Event):
+    """Mensagem de log. `level` é 'info' para as mensagens do motor e
+    'debug', 'warning' ou 'error' para as do yt-dlp."""
+
+    type = "log"
+
+    def __init__(self, url, message, level="info"):
+        super().__init__(url)
+        self.message = message
+        self.level = level
+
+
+class ProgressEvent(Event):
+    """Progresso agregado da playlist (snapshot do ProgressTracker)."""
+
+    type = "progress"
+
+    def __init__(self, url, snapshot):
+        super().__init__(url)
+        self.snapshot = snapshot
+
+
+class PlaylistStarted(Event):
+    """Playlist resolvida; `total` é None enquanto a enumeração não termina."""
+
+    type = "started"
+
+    def __init__(self, url, title, total, folder):
+        super().__init__(url)
+        self.title = title
+        self.total = total
+        self.folder = folder
+
+
+class ItemEvent(Event):
+    """Mudança de estado de um item (ITEM_QUEUED, ITEM_DOWNLOADING, ITEM_DONE...)."""
+
+    type = "item"
+
+    def __init__(self, url, index, video_id, title, state, nbytes=None, total_bytes=None,
+                 speed=None, error=None):
+        super().__init__(url)
+        self.index = index
+        self.video_id = video_id
+        self.title = title
+        self.state = state
+        self.nbytes = nbytes
+        self.total_bytes = total_bytes
+        self.speed = speed
+        self.error = error
+
+
+class PlaylistFinished(Event):
+    """Fim da playlist: `status` é DONE, FAILED ou CANCELLED; `stats` vem de download_entries."""
+
+    type = "finished"
+
+    def __init__(self, url, status, stats=None, error=None, folder=None):
+        super().__init__(url)
+        self.status = status
+        self.stats = stats
+        self.error = error
+        self.folder = folder
+
+
+class BatchFinished(Event):
+    """Fim de um lote: `summary` traz a deduplicação e, em 'download', os stats do acervo."""
+
+    type = "batch"
+
+    def __init__(self, status, summary, error=None, folder=None):
+        super().__init__(None)
+        self.status = status
+        self.summary = summary
+        self.error = error
+        self.folder = folder
+
+
+class DownloadOptions:
+    """Opções de uma chamada ao motor.
+
+    `output_dir` recebe uma pasta por playlist; `jobs` limita os vídeos
+    simultâneos de cada playlist e `max_playlists` quantas playlists da
+    chamada rodam ao mesmo tempo. Com `store_dir`, as URLs são baixadas
+    como um lote deduplicado nesse acervo (veja run_batch). Os demais
+    campos vão para o DownloadSettings de cada playlist (veja a
+    documentação dele).
+    """
+
+    def __init__(self, output_dir=".", jobs=1, max_playlists=1, profile=None, finish=None, cache=None,
+                 use_index=True, verify=False, transcode_workers=None, queue_size=None, segmented=None,
+                 adaptive=False, host_rate=None, stream=False, metrics=None, retry_failed=False, store_dir=None):
+        self.output_dir = output_dir
+        self.jobs = max(1, jobs)
+        self.max_playlists = max(1, max_playlists)
+        self.profile = profile or OutputProfile()
+        self.finish = finish
+        self.cache = cache
+        self.use_index = use_index
+        self.verify = verify
+        self.transcode_workers = transcode_workers
+        self.queue_size = queue_size
+        self.segmented = segmented
+        self.adaptive = adaptive
+        self.host_rate = host_rate
+        self.stream = stream
+        self.metrics = metrics
+        self.retry_failed = retry_failed
+        self.store_dir = store_dir
+
+    def settings(self, album=None, naming='playlist'):
+        """DownloadSettings de uma playlist (`album` é o título dela nas tags)."""
+        return DownloadSettings(
+            jobs=self.jobs, transcode_workers=self.transcode_workers, queue_size=self.queue_size,
+            use_index=self.use_index, verify=self.verify, cache=self.cache, segmented=self.segmented,
+            profile=self.profile, adaptive=self.adaptive, host_rate=self.host_rate, stream=self.stream,
+            finish=self.finish, album=album, naming=naming,
+        )
+
+
+class EventLogger:
+    """Logger do yt-dlp que transforma as mensagens em LogEvent."""
+
+    def __init__(self, url, emit):
+        self.url = url
+        self.emit = emit
+
+    def debug(self, msg):
+        if not msg.startswith("[debug] "):
+            self.emit(LogEvent(self.url, msg, "debug"))
+
+    def warning(self, msg):
+        self.emit(LogEvent(self.url, msg, "warning"))
+
+    def error(self, msg):
+        self.emit(LogEvent(self.url, msg, "error"))
+
+
+def run_playlist(url, options, emit, cancel=None, slots=None):
+    """Baixa uma playlist de forma bloqueante, publicando os eventos em `emit(event)`.
+
+    Núcleo comum da API asyncio e do serviço de downloads. `cancel`
+    (threading.Event) interrompe os downloads; `slots` (threading.Semaphore)
+    limita os vídeos simultâneos somados entre várias playlists.
+    Retorna o PlaylistFinished, que também é publicado.
+    """
+    def log(message):
+        emit(LogEvent(url, message))
+
+    def on_item(index, entry, state, nbytes=None, total_bytes=None, speed=None, error=None):
+        emit(ItemEvent(url, index, entry.get("id"), entry.get("title"), state,
+                       nbytes=nbytes, total_bytes=total_bytes, speed=speed, error=error))
+
+    if cancel is not None and cancel.is_set():
+        # Cancelada enquanto aguardava vaga no executor
+        return _finish(emit, url, CANCELLED)
+    status, stats, error, folder = FAILED, None, None, None
+    try:
+        log("Iniciando análise e download...")
+        # Entradas página a página: o download começa antes do fim da enumeração
+        title, total, entries = iter_playlist(url, cache=options.cache)
+        if title is None:
+            raise RuntimeError("Não foi possível obter informações da playlist.")
+        folder = os.path.join(options.output_dir, sanitize_filename(title))
+        os.makedirs(folder, exist_ok=True)
+
+        indices = None
+        if options.retry_failed:
+            selected, total = failed_entries(folder, entries)
+            if not selected:
+                log("✅ Nenhuma falha registrada no diário desta playlist.")
+                return _finish(emit, url, DONE, folder=folder)
+            log(f"🔁 Reprocessando {len(selected)} item(ns) com erro no diário")
+            indices = [index for index, _ in selected]
+            entries = [entry for _, entry in selected]
+        emit(PlaylistStarted(url, title, total, folder))
+
+        stats = download_entries(
+            entries, folder, options.settings(album=title), indices=indices,
+            width=len(str(total)) if total else None, log=log, logger=EventLogger(url, emit),
+            progress=lambda snapshot: emit(ProgressEvent(url, snapshot)), on_item=on_item,
+            cancel=cancel, slots=slots, metrics=options.metrics,
+        )
+        status = CANCELLED if cancel is not None and cancel.is_set() else DONE
+    except Exception as e:
+        error = str(e)
+        log(f"❌ Erro ao processar a playlist: {error}")
+    return _finish(emit, url, status, stats, error, folder)
+
+
+def run_batch(urls, options, emit, cancel=None, slots=None):
+    """Baixa várias playlists como um lote deduplicado, publicando os eventos em `emit(event)`.
+
+    Todas as playlists são resolvidas antes; cada vídeo único é baixado uma
+    só vez para o acervo (`options.store_dir`, arquivos '<id>.<ext>') e as
+    pastas das playlists recebem hardlinks/reflinks para ele. Com
+    `retry_failed`, só os vídeos com erro no diário do acervo são baixados.
+    Os eventos do download do acervo têm `url` None; cada playlist recebe
+    PlaylistStarted e PlaylistFinished (com o resultado dos links em
+    `stats`). Retorna o BatchFinished, que também é publicado.
+    """
+    def log(message, url=None):
+        emit(LogEvent(url, message))
+
+    def on_item(index, entry, state, nbytes=None, total_bytes=None, speed=None, error=None):
+        emit(ItemEvent(None, index, entry.get("id"), entry.get("title"), state,
+                       nbytes=nbytes, total_bytes=total_bytes, speed=speed, error=error))
+
+    playlists = []
+    for url in urls:
+        if cancel is not None and cancel.is_set():
+            break
+        log(f"🔍 Analisando playlist: {url}", url)
+        try:
+            title, entries = resolve_playlist(url, cache=options.cache)
+            if title is None:
+                raise RuntimeError("Não foi possível obter informações da playlist.")
+        except Exception as e:
+            log(f"❌ Erro ao acessar playlist: {e}", url)
+            _finish(emit, url, FAILED, error=str(e))
+            continue
+        folder = os.path.join(options.output_dir, sanitize_filename(title))
+        emit(PlaylistStarted(url, title, len(entries), folder))
+        playlists.append((url, folder, entries))
+
+    # Vídeos únicos, na ordem em que aparecem pela primeira vez
+    unique = {}
+    references = 0
+    for _, _, entries in playlists:
+        for entry in entries:
+            if entry.get("id"):
+                references += 1
+                unique.setdefault(entry["id"], entry)
+
+    store = store_folder(options.store_dir, options.profile)
+    downloads = list(unique.values())
+    if options.retry_failed:
+        downloads = [entry for _, entry in failed_entries(store, downloads)[0]]
+        log(f"🔁 Reprocessando {len(downloads)} vídeo(s) com erro no diário do acervo")
+    log(f"📚 {len(playlists)} playlist(s), {references} item(ns), {len(unique)} vídeo(s) único(s)")
+    log(f"🗄️  Acervo: '{store}'")
+
+    status, stats, error = FAILED, None, None
+    try:
+        stats = download_entries(
+            downloads, store, options.settings(naming='id'), log=log, logger=EventLogger(None, emit),
+            progress=lambda snapshot: emit(ProgressEvent(None, snapshot)), on_item=on_item,
+            cancel=cancel, slots=slots, metrics=options.metrics,
+        )
+        status = CANCELLED if cancel is not None and cancel.is_set() else DONE
+    except Exception as e:
+        error = str(e)
+        log(f"❌ Ocorreu um erro durante o download: {error}")
+
+    summary = {"playlists": len(playlists), "references": references, "unique": len(unique),
+               "linked": 0, "missing": 0, "bytes_saved": 0, "methods": {}, "download": stats,
+               "dedup_ratio": references / len(unique) if unique else 1.0}
+    store_index = DownloadIndex(store)
+    seen = set()
+    try:
+        for url, folder, entries in playlists:
+            if status == CANCELLED:
+                _finish(emit, url, CANCELLED, folder=folder)
+                continue
+            os.makedirs(folder, exist_ok=True)
+            result = link_playlist(store_index, store, folder, entries, seen)
+            for key in ("linked", "missing", "bytes_saved"):
+                summary[key] += result[key]
+            for method, count in result["methods"].items():
+                summary["methods"][method] = summary["methods"].get(method, 0) + count
+            _finish(emit, url, DONE, result, folder=folder)
+    finally:
+        store_index.close()
+    event = BatchFinished(status, summary, error, store)
+    emit(event)
+    return event
+
+
+def _finish(emit, url, status, stats=None, error=None, folder=None):
+    event = PlaylistFinished(url, status, stats, error, folder)
+    emit(event)
+    return event
+
+
+class DownloadEngine:
+    """Executa chamadas de download em executores próprios, com API asyncio.
+
+    `max_playlists` limita as playlists em andamento somando todas as
+    chamadas; `max_downloads` (opcional) limita os vídeos simultâneos no
+    total, além do `jobs` de cada chamada.
+    """
+
+    def __init__(self, max_playlists=DEFAULT_MAX_PLAYLISTS, max_downloads=None):
+        self.max_playlists = max(1, max_playlists)
+        self.slots = threading.Semaphore(max_downloads) if max_downloads else None
+        self._executor = ThreadPoolExecutor(max_workers=self.max_playlists,
+                                            thread_name_prefix="download-engine")
+        self._cancels = set()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.cancel()
+        self.close()
+
+    def cancel(self):
+        """Cancela todas as chamadas em andamento (seguro a partir de qualquer thread)."""
+        for cancel in list(self._cancels):
+            cancel.set()
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+    async def download(self, urls, options=None):
+        """Baixa as playlists de `urls`, gerando os eventos conforme acontecem.
+
+        Interromper a iteração (break, aclose() ou cancelamento da tarefa)
+        cancela os downloads da chamada e espera os workers terminarem.
+        """
+        if isinstance(urls, str):
+            urls = [urls]
+        if not urls:
+            return
+        options = options or DownloadOptions()
+        loop = asyncio.get_running_loop()
+        events = asyncio.Queue()
+        cancel = threading.Event()
+        self._cancels.add(cancel)
+        playlists = asyncio.Semaphore(options.max_playlists)
+
+        def emit(event):
+            loop.call_soon_threadsafe(events.put_nowait, event)
+
+        async def run(url):
+            async with playlists:
+                if cancel.is_set():
+                    events.put_nowait(PlaylistFinished(url, CANCELLED))
+                    return
+                await loop.run_in_executor(self._executor, run_playlist, url, options, emit,
+                                           cancel, self.slots)
+
+        async def run_store():
+            async with playlists:
+                await loop.run_in_executor(self._executor, run_batch, urls, options, emit,
+                                           cancel, self.slots)
+
+        if options.store_dir is not None:
+            # Lote: um único download para o acervo, depois os links de cada playlist
+            tasks = [asyncio.ensure_future(run_store())]
+        else:
+            tasks = [asyncio.ensure_future(run(url)) for url in urls]
+        # Os eventos de cada worker chegam antes da conclusão dele: o None fecha a fila
+        asyncio.ensure_future(asyncio.wait(tasks)).add_done_callback(lambda _: events.put_nowait(None))
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                yield event
+        finally:
+            if not all(task.done() for task in tasks):
+                cancel.set()
+                await asyncio.wait(tasks)
+            self._cancels.discard(cancel)
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Índice persistente de downloads do YouTube Downloader.
+Cada pasta de destino guarda um SQLite com o que já foi baixado, indexado
+pelo ID do vídeo, para que uma nova sincronização baixe só o que falta.
+"""
+
+import os
+import re
+import hashlib
+import itertools
+import sqlite3
+import threading
+import time
+
+from yt_dlp.utils import sanitize_filename as ytdlp_sanitize_filename
+
+INDEX_FILENAME = ".download_index.sqlite"
+
+# Arquivos no padrão '<posição> - <título>.<ext>'
+_NUMBERED_RE = re.compile(r"^(\d+) - ")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    video_id TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    title TEXT,
+    size INTEGER NOT NULL,
+    codec TEXT,
+    bitrate TEXT,
+    sha256 TEXT,
+    updated REAL NOT NULL
+)
+"""
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Calcula o SHA-256 de um arquivo em blocos."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def expected_filename(playlist_index, title, ext="mp3"):
+    """Nome que o yt-dlp daria ao item com o template da playlist."""
+    return f"{playlist_index} - {ytdlp_sanitize_filename(title)}.{ext}"
+
+
+class DownloadIndex:
+    """Índice SQLite dos itens já baixados em uma pasta de destino."""
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.path = os.path.join(folder, INDEX_FILENAME)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def get(self, video_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT path, title, size, codec, bitrate, sha256 FROM items WHERE video_id = ?",
+                (video_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ("path", "title", "size", "codec", "bitrate", "sha256")
+        return dict(zip(keys, row))
+
+    def record(self, video_id, path, title=None, codec="mp3", bitrate="192", sha256=None):
+        """Registra (ou atualiza) um item já convertido no índice.
+
+        `sha256` pode ser informado quando já é conhecido (ex.: link de um
+        arquivo do acervo), evitando reler o arquivo.
+        """
+        rel_path = os.path.relpath(path, self.folder)
+        size = os.path.getsize(path)
+        sha256 = sha256 or file_sha256(path)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (video_id, rel_path, title, size, codec, bitrate, sha256, time.time()),
+            )
+            self._conn.commit()
+
+    def forget(self, video_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM items WHERE video_id = ?", (video_id,))
+            self._conn.commit()
+
+    def _is_intact(self, row, verify):
+        full_path = os.path.join(self.folder, row["path"])
+        if not os.path.isfile(full_path) or os.path.getsize(full_path) != row["size"]:
+            return False
+        return not verify or file_sha256(full_path) == row["sha256"]
+
+    def plan(self, entries, width, codec="mp3", bitrate="192", verify=False, ext="mp3", naming="playlist",
+             indices=None):
+        """Compara as entradas da playlist com o índice.
+
+        Retorna a lista de (posição, entrada) que precisam ser baixadas e um
+        resumo com quantos itens foram reaproveitados ou renomeados. Itens
+        que mudaram de posição ou título são apenas renomeados no disco.
+        Sem `ext` (perfil "best"), o nome esperado não é conhecido de antemão.
+        Com `naming="id"` (acervo deduplicado) os arquivos se chamam
+        '<id>.<ext>' e nunca são renomeados. `indices` informa as posições
+        na playlist quando `entries` é só uma parte dela.
+        """
+        pending = []
+        summary = {"indexed": 0, "renamed": 0, "adopted": 0, "scheduled": 0}
+
+        renames = []
+        candidates = []
+        for index, entry in zip(indices or range(1, len(entries) + 1), entries):
+            video_id = entry.get("id")
+            title = entry.get("title")
+            if not video_id:
+                candidates.append((index, entry, None))
+                continue
+
+            wanted = None
+            if naming == "id":
+                wanted = f"{video_id}.{ext}" if ext else None
+            elif title and ext:
+                wanted = expected_filename(str(index).zfill(width), title, ext)
+
+            row = self.get(video_id)
+            if row and row["codec"] == codec and row["bitrate"] == bitrate and self._is_intact(row, verify):
+                summary["indexed"] += 1
+                if naming == "id":
+                    continue
+                if title and row["path"] != wanted:
+                    # Perfil "best": manter a extensão já existente
+                    wanted = wanted or expected_filename(str(index).zfill(width), title,
+                                                         os.path.splitext(row["path"])[1].lstrip("."))
+                if wanted and row["path"] != wanted:
+                    renames.append((video_id, row["path"], wanted, title))
+                continue
+
+            candidates.append((index, entry, wanted if row is None else None))
+
+        # Renomear antes de adotar: o arquivo no nome esperado pode ser de outro item
+        summary["renamed"] = self._rename_all(renames)
+        for index, entry, wanted in candidates:
+            # Arquivo baixado antes do índice existir: adotar sem baixar de novo
+            if wanted and os.path.isfile(os.path.join(self.folder, wanted)) and not self._owner(wanted):
+                self.record(entry["id"], os.path.join(self.folder, wanted), entry.get("title"), codec, bitrate)
+                summary["adopted"] += 1
+                continue
+            pending.append((index, entry))
+
+        summary["scheduled"] = len(pending)
+        return pending, summary
+
+    def numbering_width(self):
+        """Largura da numeração dos arquivos já indexados ('007 - ...' -> 3), ou None."""
+        with self._lock:
+            rows = self._conn.execute("SELECT path FROM items").fetchall()
+        matches = [_NUMBERED_RE.match(path) for (path,) in rows]
+        widths = [len(match[1]) for match in matches if match]
+        return max(set(widths), key=widths.count) if widths else None
+
+    def repad(self, width):
+        """Ajusta a numeração de todos os arquivos indexados para `width` dígitos.
+
+        Usado quando o tamanho da playlist só é conhecido ao fim da
+        enumeração. Retorna quantos arquivos foram renomeados.
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT video_id, path FROM items").fetchall()
+        renames = []
+        for video_id, path in rows:
+            match = _NUMBERED_RE.match(path)
+            if not match:
+                continue
+            wanted = str(int(match[1])).zfill(width) + path[match.end(1):]
+            if wanted != path and os.path.isfile(os.path.join(self.folder, path)):
+                renames.append((video_id, path, wanted, None))
+        return self._rename_all(renames)
+
+    def _owner(self, path):
+        """ID do item indexado com o arquivo `path`, ou None."""
+        with self._lock:
+            row = self._conn.execute("SELECT video_id FROM items WHERE path = ?", (path,)).fetchone()
+        return row[0] if row else None
+
+    def _set_path(self, video_id, path, title=None):
+        with self._lock:
+            if title is None:
+                self._conn.execute("UPDATE items SET path = ? WHERE video_id = ?", (path, video_id))
+            else:
+                self._conn.execute("UPDATE items SET path = ?, title = ? WHERE video_id = ?",
+                                   (path, title, video_id))
+            self._conn.commit()
+
+    def _rename_all(self, renames):
+        """Renomeia arquivos indexados sem sobrescrever nenhum arquivo.
+
+        `renames` traz (id, caminho atual, caminho desejado, título). Todos
+        passam antes por um nome temporário, então itens que trocaram de
+        posição (inclusive com o mesmo título) não se sobrescrevem. Se o
+        destino estiver ocupado por um arquivo de fora da lista, o item
+        volta ao nome antigo (ou a '<nome> (2).<ext>'). Retorna quantos
+        arquivos ficaram com o nome desejado.
+        """
+        staged = []
+        for n, (video_id, path, wanted, title) in enumerate(renames):
+            tmp = f".renaming-{n}-{video_id}"
+            os.replace(os.path.join(self.folder, path), os.path.join(self.folder, tmp))
+            self._set_path(video_id, tmp)
+            staged.append((video_id, tmp, path, wanted, title))
+
+        renamed = 0
+        for video_id, tmp, path, wanted, title in staged:
+            target = wanted
+            if os.path.exists(os.path.join(self.folder, target)):
+                target = path
+                if os.path.exists(os.path.join(self.folder, target)):
+                    target = _free_name(self.folder, path)
+            # os.rename/replace sobrescrevem; o destino foi conferido acima
+            os.replace(os.path.join(self.folder, tmp), os.path.join(self.folder, target))
+            self._set_path(video_id, target, title if target == wanted else None)
+            renamed += target == wanted
+        return renamed
+
+
+def _free_name(folder, name):
+    """Primeiro '<nome> (n).<ext>' que ainda não existe em `folder`."""
+    root, ext = os.path.splitext(name)
+    for n in itertools.count(2):
+        candidate = f"{root} ({n}){ext}"
+        if not os.path.exists(os.path.join(folder, candidate)):
+            return candidate
+
+
+def format_plan_summary(summary):
+    """Formata o resultado da comparação com o índice."""
+    text = f"🗂️  Índice: {summary['indexed']} já baixado(s), {summary['scheduled']} a baixar"
+    if summary["renamed"]:
+        text += f", {summary['renamed']} renomeado(s)"
+    if summary["adopted"]:
+        text += f", {summary['adopted']} adotado(s) do disco"
+    return text
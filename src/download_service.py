@@ -0,0 +1,551 @@
+#!/usr/bin/env python3
+"""
+Serviço de downloads em segundo plano do YouTube Downloader.
+Mantém uma fila persistente (SQLite) de playlists a baixar, executa os
+trabalhos em um único processo com limites globais de concorrência e
+expõe uma API HTTP/JSON local para enviar, listar, cancelar e acompanhar
+o progresso dos trabalhos, além de GET /metrics no formato Prometheus.
+A CLI (`--service`) e a GUI atuam como clientes finos via service_client.
+Toda rota, exceto /health, exige o token da instalação (gravado na pasta
+de configuração do usuário) no cabeçalho 'Authorization: Bearer'.
+
+Uso:
+    python src/download_service.py --port 8765 --max-jobs 2 --max-downloads 8
+"""
+
+import os
+import re
+import hmac
+import json
+import time
+import sqlite3
+import ipaddress
+import argparse
+import threading
+import multiprocessing
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from app_paths import user_cache_dir
+from metadata_cache import MetadataCache
+from run_metrics import RunMetrics
+from output_profile import OutputProfile, DEFAULT_CODEC, DEFAULT_BITRATE
+from service_client import DEFAULT_HOST, DEFAULT_PORT, HEARTBEAT_SEC, FINAL_STATUSES, ensure_token
+
+QUEUE_FILENAME = "jobs.sqlite"
+TRACE_FILENAME = "trace.jsonl"
+DEFAULT_MAX_JOBS = 2
+DEFAULT_MAX_DOWNLOADS = 8
+# Linhas de log mantidas em memória por trabalho para novos assinantes
+JOB_LOG_LINES = 500
+# Tempo máximo para os trabalhos cancelados terminarem ao encerrar o serviço
+STOP_TIMEOUT = 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    output_dir TEXT NOT NULL,
+    options TEXT NOT NULL,
+    status TEXT NOT NULL,
+    folder TEXT,
+    stats TEXT,
+    error TEXT,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL
+)
+"""
+
+_JOB_RE = re.compile(r"^/jobs/(\d+)(/cancel|/events)?$")
+
+
+class JobQueue:
+    """Fila persistente de trabalhos em SQLite."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            self._conn.commit()
+            return cursor
+
+    @staticmethod
+    def _to_dict(row):
+        job = dict(row)
+        job["options"] = json.loads(job["options"])
+        job["stats"] = json.loads(job["stats"]) if job["stats"] else None
+        return job
+
+    def add(self, url, output_dir, options):
+        cursor = self._execute(
+            "INSERT INTO jobs (url, output_dir, options, status, created) VALUES (?, ?, ?, 'queued', ?)",
+            (url, output_dir, json.dumps(options), time.time()),
+        )
+        return cursor.lastrowid
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list(self, limit=100):
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def claim_next(self):
+        """Marca o trabalho mais antigo da fila como 'running' e o retorna."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE jobs SET status = 'running', started = ? WHERE id = ?",
+                               (time.time(), row["id"]))
+            self._conn.commit()
+        return self.get(row["id"])
+
+    def update(self, job_id, **fields):
+        if "stats" in fields:
+            fields["stats"] = json.dumps(fields["stats"]) if fields["stats"] is not None else None
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        self._execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def cancel_queued(self, job_id):
+        """Cancela um trabalho que ainda não começou; retorna True se cancelou."""
+        cursor = self._execute(
+            "UPDATE jobs SET status = 'cancelled', finished = ? WHERE id = ? AND status = 'queued'",
+            (time.time(), job_id),
+        )
+        return cursor.rowcount > 0
+
+    def requeue_interrupted(self):
+        """Devolve à fila os trabalhos interrompidos por um encerramento do serviço."""
+        return self._execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'").rowcount
+
+
+class JobState:
+    """Estado em memória de um trabalho: log recente, progresso e cancelamento."""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.cancel = threading.Event()
+        self.changed = threading.Condition()
+        self.lines = deque(maxlen=JOB_LOG_LINES)
+        self.seq = 0
+        self.snapshot = None
+        self.version = 0
+        self.finished = False
+
+    def log(self, message):
+        with self.changed:
+            self.seq += 1
+            self.lines.append((self.seq, message))
+            self.changed.notify_all()
+
+    def progress(self, snapshot):
+        with self.changed:
+            self.snapshot = snapshot
+            self.version += 1
+            self.changed.notify_all()
+
+    def finish(self):
+        with self.changed:
+            self.finished = True
+            self.changed.notify_all()
+
+
+class DownloadService:
+    """Executa os trabalhos da fila com limites globais de concorrência.
+
+    `max_jobs` playlists rodam ao mesmo tempo e, somando todas elas, no
+    máximo `max_downloads` vídeos são baixados simultaneamente.
+    """
+
+    def __init__(self, queue_path=None, max_jobs=DEFAULT_MAX_JOBS,
+                 max_downloads=DEFAULT_MAX_DOWNLOADS, cache=None, log=print):
+        queue_path = queue_path or os.path.join(user_cache_dir("service"), QUEUE_FILENAME)
+        self.queue = JobQueue(queue_path)
+        self.max_jobs = max(1, max_jobs)
+        self.slots = threading.Semaphore(max(1, max_downloads))
+        self.cache = cache
+        self.log = log
+        # Métricas de todos os trabalhos desde que o serviço subiu
+        self.metrics = RunMetrics(trace_path=os.path.join(os.path.dirname(queue_path), TRACE_FILENAME))
+        self._job_slots = threading.Semaphore(self.max_jobs)
+        self._states = {}
+        self._states_lock = threading.Lock()
+        self._threads = set()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._dispatcher = None
+
+    def start(self):
+        requeued = self.queue.requeue_interrupted()
+        if requeued:
+            self.log(f"🔁 {requeued} trabalho(s) interrompido(s) voltaram para a fila")
+        self._dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        self._dispatcher.start()
+        return self
+
+    def stop(self, timeout=STOP_TIMEOUT):
+        """Interrompe o despacho, cancela os trabalhos em andamento e espera por eles.
+
+        Os trabalhos cancelados assim voltam para a fila na próxima execução.
+        As métricas só são fechadas depois que os trabalhos terminam.
+        """
+        self._stop.set()
+        self._wake.set()
+        if self._dispatcher is not None:
+            self._dispatcher.join()
+        with self._states_lock:
+            states = list(self._states.values())
+            threads = list(self._threads)
+        for state in states:
+            state.cancel.set()
+        deadline = time.monotonic() + timeout
+        for thread in threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        if any(thread.is_alive() for thread in threads):
+            self.log("⚠️  Trabalhos ainda em andamento após o cancelamento; métricas fechadas assim mesmo")
+        self.metrics.close()
+
+    def submit(self, url, output_dir, jobs=1, codec=DEFAULT_CODEC, bitrate=DEFAULT_BITRATE):
+        OutputProfile(codec, bitrate)  # Valida o perfil antes de enfileirar
+        if not os.path.isabs(output_dir):
+            raise ValueError("output_dir deve ser um caminho absoluto")
+        options = {"jobs": max(1, int(jobs)), "codec": codec, "bitrate": str(bitrate)}
+        job_id = self.queue.add(url, output_dir, options)
+        self.log(f"📥 Trabalho {job_id} enfileirado: {url}")
+        self._wake.set()
+        return job_id
+
+    def state(self, job_id):
+        with self._states_lock:
+            return self._states.get(job_id)
+
+    def job(self, job_id):
+        """Trabalho persistido, com o progresso atual se estiver rodando."""
+        job = self.queue.get(job_id)
+        state = self.state(job_id)
+        if job is not None and state is not None:
+            job["progress"] = state.snapshot
+        return job
+
+    def cancel(self, job_id):
+        """Cancela um trabalho na fila ou em andamento; retorna o trabalho."""
+        if not self.queue.cancel_queued(job_id):
+            state = self.state(job_id)
+            if state is not None:
+                state.cancel.set()
+                state.log("⏹️  Cancelamento solicitado")
+        return self.queue.get(job_id)
+
+    def _dispatch(self):
+        while not self._stop.is_set():
+            if not self._job_slots.acquire(timeout=1):
+                continue
+            job = None if self._stop.is_set() else self.queue.claim_next()
+            if job is None:
+                self._job_slots.release()
+                self._wake.wait(timeout=1)
+                self._wake.clear()
+                continue
+            state = JobState(job["id"])
+            thread = threading.Thread(target=self._run, args=(job, state), daemon=True)
+            with self._states_lock:
+                self._states[job["id"]] = state
+                self._threads.add(thread)
+            thread.start()
+
+    def _run(self, job, state):
+        # Importado aqui para o serviço subir rápido e o cliente não depender do yt-dlp
+        from download_engine import run_playlist, DownloadOptions, FAILED
+        from download_core import format_throughput
+        from audio_finish import AudioFinish
+
+        job_id, options = job["id"], job["options"]
+        self.log(f"▶️  Trabalho {job_id} iniciado: {job['url']}")
+
+        def emit(event):
+            if event.type == "log":
+                if event.level == "info":
+                    state.log(event.message)
+                elif event.level != "debug":
+                    state.log(f"{'AVISO' if event.level == 'warning' else 'ERRO'}: {event.message}")
+            elif event.type == "progress":
+                state.progress(event.snapshot)
+            elif event.type == "started":
+                self.queue.update(job_id, folder=event.folder)
+                total = event.total if event.total is not None else "?"
+                state.log(f"{total} item(ns) em '{event.title}' ({options['jobs']} simultâneo(s))")
+            elif event.type == "finished" and event.stats:
+                state.log(format_throughput(event.stats))
+
+        status, stats, error = "failed", None, None
+        try:
+            finished = run_playlist(
+                job["url"],
+                DownloadOptions(output_dir=job["output_dir"], jobs=options["jobs"], cache=self.cache,
+                                profile=OutputProfile(options["codec"], options["bitrate"]),
+                                metrics=self.metrics, finish=AudioFinish()),
+                emit, cancel=state.cancel, slots=self.slots,
+            )
+            stats, error = finished.stats, finished.error
+            if finished.status == FAILED:
+                status = "failed"
+            elif self._stop.is_set():
+                status = "queued"  # Encerramento do serviço: retomar depois
+            else:
+                status = finished.status
+        except Exception as e:
+            error = str(e)
+            state.log(f"ERRO FATAL: {error}")
+        finally:
+            self.queue.update(job_id, status=status, stats=stats, error=error,
+                              finished=None if status == "queued" else time.time())
+            state.finish()
+            with self._states_lock:
+                self._states.pop(job_id, None)
+                self._threads.discard(threading.current_thread())
+            self._job_slots.release()
+            self._wake.set()
+            self.log(f"🏁 Trabalho {job_id}: {status}")
+
+
+def is_loopback(host):
+    """True se `host` (endereço ou nome, sem porta) é local."""
+    host = host.strip("[]").lower()
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def _host_name(header):
+    """Nome do cabeçalho Host sem a porta ('[::1]:8765' -> '::1')."""
+    if header.startswith("["):
+        return header[1:header.find("]")] if "]" in header else header
+    return header.rsplit(":", 1)[0] if header.count(":") == 1 else header
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """Rotas da API JSON; `self.server.service` é o DownloadService.
+
+    `self.server.token` é o token exigido (None desativa a verificação) e,
+    com o servidor em um endereço local, o cabeçalho Host também precisa
+    ser local (barra páginas web usando DNS rebinding).
+    """
+
+    def log_message(self, format, *args):
+        pass  # Sem log de acesso no console do serviço
+
+    def _authorized(self):
+        """Confere Host e token; responde com o erro e retorna False se recusado."""
+        if self.server.loopback and not is_loopback(_host_name(self.headers.get("Host", ""))):
+            self._send_json({"error": "Host não permitido"}, 403)
+            return False
+        if self.path == "/health" or self.server.token is None:
+            return True
+        expected = f"Bearer {self.server.token}".encode("utf-8")
+        if not hmac.compare_digest(self.headers.get("Authorization", "").encode("utf-8"), expected):
+            self._send_json({"error": "Token ausente ou inválido"}, 401)
+            return False
+        return True
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        """Corpo JSON da requisição; levanta ValueError com outro Content-Type."""
+        content_type = self.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        if content_type != "application/json":
+            raise ValueError("Content-Type deve ser application/json")
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length).decode("utf-8"))
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        service = self.server.service
+        if self.path == "/health":
+            return self._send_json({"ok": True})
+        if self.path == "/metrics":
+            body = service.metrics.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if self.path == "/jobs":
+            return self._send_json({"jobs": service.queue.list()})
+        match = _JOB_RE.match(self.path)
+        if not match or match[2] == "/cancel":
+            return self._send_json({"error": "Rota não encontrada"}, 404)
+        job = service.job(int(match[1]))
+        if job is None:
+            return self._send_json({"error": "Trabalho não encontrado"}, 404)
+        if match[2] == "/events":
+            return self._stream_events(job)
+        return self._send_json(job)
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        service = self.server.service
+        try:
+            payload = self._read_json()
+        except ValueError as e:
+            return self._send_json({"error": f"Requisição inválida: {e}"}, 415 if "Content-Type" in str(e) else 400)
+        if self.path == "/jobs":
+            try:
+                job_id = service.submit(
+                    payload["url"], payload["output_dir"], jobs=payload.get("jobs", 1),
+                    codec=payload.get("codec", DEFAULT_CODEC), bitrate=payload.get("bitrate", DEFAULT_BITRATE),
+                )
+            except (KeyError, ValueError, TypeError) as e:
+                return self._send_json({"error": f"Requisição inválida: {e}"}, 400)
+            return self._send_json({"id": job_id}, 201)
+        match = _JOB_RE.match(self.path)
+        if not match or match[2] != "/cancel":
+            return self._send_json({"error": "Rota não encontrada"}, 404)
+        return self._cancel(int(match[1]))
+
+    def do_DELETE(self):
+        if not self._authorized():
+            return
+        match = _JOB_RE.match(self.path)
+        if not match or match[2]:
+            return self._send_json({"error": "Rota não encontrada"}, 404)
+        return self._cancel(int(match[1]))
+
+    def _cancel(self, job_id):
+        job = self.server.service.cancel(job_id)
+        if job is None:
+            return self._send_json({"error": "Trabalho não encontrado"}, 404)
+        return self._send_json(job)
+
+    def _stream_events(self, job):
+        """Envia eventos em JSON, um por linha, até o trabalho terminar."""
+        service = self.server.service
+        job_id = job["id"]
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        def send(event):
+            self.wfile.write((json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+        seq = version = 0
+        last_sent = time.monotonic()
+        try:
+            while True:
+                job = service.queue.get(job_id)
+                state = service.state(job_id)
+                if state is None:
+                    if job["status"] in FINAL_STATUSES:
+                        break
+                    # Ainda na fila (ou começando): aguardar
+                    if time.monotonic() - last_sent >= HEARTBEAT_SEC:
+                        send({"type": "heartbeat", "status": job["status"]})
+                        last_sent = time.monotonic()
+                    time.sleep(0.2)
+                    continue
+                with state.changed:
+                    if state.seq == seq and state.version == version and not state.finished:
+                        state.changed.wait(timeout=HEARTBEAT_SEC)
+                    lines = [line for line in state.lines if line[0] > seq]
+                    snapshot, new_version, finished = state.snapshot, state.version, state.finished
+                for seq, message in lines:
+                    send({"type": "log", "message": message})
+                if new_version != version and snapshot is not None:
+                    send({"type": "progress", "snapshot": snapshot})
+                    version = new_version
+                elif not lines and not finished:
+                    send({"type": "heartbeat", "status": "running"})
+                last_sent = time.monotonic()
+                if finished:
+                    # Aguarda o estado final ser persistido por _run()
+                    while service.state(job_id) is state:
+                        time.sleep(0.05)
+            job = service.queue.get(job_id)
+            send({"type": "status", "status": job["status"], "folder": job["folder"],
+                  "stats": job["stats"], "error": job["error"]})
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Cliente deixou de acompanhar; o trabalho continua
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, token=None, **service_options):
+    """Sobe o serviço e atende a API até Ctrl+C.
+
+    Sem `token` a API fica aberta, o que só é aceito em endereços locais.
+    """
+    if token is None and not is_loopback(host):
+        raise ValueError(f"O endereço {host} não é local: o serviço exige o token de acesso")
+    server = ThreadingHTTPServer((host, port), ServiceHandler)
+    server.daemon_threads = True
+    server.token = token
+    server.loopback = is_loopback(host)
+    service = DownloadService(**service_options).start()
+    server.service = service
+    print(f"🛰️  Serviço de downloads em http://{host}:{server.server_address[1]}")
+    print(f"🗃️  Fila: {service.queue.path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n⏹️  Encerrando; trabalhos em andamento serão retomados na próxima execução.")
+    finally:
+        service.stop()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    # Necessário para o pool de conversão em executáveis (PyInstaller)
+    multiprocessing.freeze_support()
+
+    parser = argparse.ArgumentParser(description="Serviço de downloads em segundo plano com API HTTP local.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"Endereço de escuta (padrão: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Porta da API (padrão: {DEFAULT_PORT})")
+    parser.add_argument("--max-jobs", type=int, default=DEFAULT_MAX_JOBS,
+                        help=f"Playlists processadas ao mesmo tempo (padrão: {DEFAULT_MAX_JOBS})")
+    parser.add_argument("--max-downloads", type=int, default=DEFAULT_MAX_DOWNLOADS,
+                        help=f"Downloads simultâneos somando todas as playlists (padrão: {DEFAULT_MAX_DOWNLOADS})")
+    parser.add_argument("--queue", default=None, help="Arquivo SQLite da fila (padrão: pasta de cache do usuário)")
+    parser.add_argument("--no-cache", action="store_true", help="Desativa o cache de metadados em disco")
+    parser.add_argument("--no-token", action="store_true",
+                        help="Não exige o token de acesso (só com --host local)")
+    args = parser.parse_args()
+
+    try:
+        serve(
+            args.host, args.port, token=None if args.no_token else ensure_token(),
+            queue_path=args.queue, max_jobs=args.max_jobs, max_downloads=args.max_downloads,
+            cache=None if args.no_cache else MetadataCache(),
+        )
+    except ValueError as e:
+        parser.error(str(e))
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Diário de resultados por playlist do YouTube Downloader.
+Registra o desfecho de cada item (ok, privado/indisponível, erro
+temporário ou erro permanente) em um SQLite na pasta de destino, para que
+as falhas fiquem visíveis e `--retry-failed` processe só o que falhou.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from adaptive_concurrency import classify_error
+
+JOURNAL_FILENAME = ".download_journal.sqlite"
+
+OK = "ok"
+SKIPPED_PRIVATE = "skipped-private"
+TRANSIENT_ERROR = "transient-error"
+PERMANENT_ERROR = "permanent-error"
+FAILURE_STATUSES = (TRANSIENT_ERROR, PERMANENT_ERROR)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outcomes (
+    video_id TEXT PRIMARY KEY,
+    playlist_index INTEGER,
+    title TEXT,
+    url TEXT,
+    status TEXT NOT NULL,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    updated REAL NOT NULL
+)
+"""
+
+# Vídeos que nunca vão baixar sem ação do usuário (privados, removidos...)
+_UNAVAILABLE_RE = re.compile(
+    r"Private video|Video unavailable|This video is not available|has been removed|"
+    r"account .*terminated|copyright|members[- ]only|Join this channel|confirm your age",
+    re.IGNORECASE,
+)
+# Falhas de rede ou do servidor que costumam passar sozinhas
+_TRANSIENT_RE = re.compile(
+    r"HTTP Error 5\d\d|Connection (?:reset|refused|aborted)|Temporary failure|"
+    r"Remote end closed|IncompleteRead|Network is unreachable|giving up after",
+    re.IGNORECASE,
+)
+
+
+def classify_outcome(message):
+    """Classifica a mensagem de erro do yt-dlp em um dos desfechos de falha."""
+    if message and _UNAVAILABLE_RE.search(message):
+        return SKIPPED_PRIVATE
+    if classify_error(message) or (message and _TRANSIENT_RE.search(message)):
+        return TRANSIENT_ERROR
+    return PERMANENT_ERROR
+
+
+class FailureJournal:
+    """Diário SQLite com o último desfecho de cada item de uma pasta."""
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.path = os.path.join(folder, JOURNAL_FILENAME)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def record(self, video_id, status, playlist_index=None, title=None, url=None, error=None):
+        """Registra o desfecho de uma tentativa (incrementa o contador de tentativas)."""
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO outcomes (video_id, playlist_index, title, url, status, error, attempts, updated)
+                VALUES (?, ?, ?, ?, ?, ?, 1, ?)
+                ON CONFLICT(video_id) DO UPDATE SET
+                    playlist_index = COALESCE(excluded.playlist_index, playlist_index),
+                    title = COALESCE(excluded.title, title),
+                    url = COALESCE(excluded.url, url),
+                    status = excluded.status,
+                    error = excluded.error,
+                    attempts = attempts + 1,
+                    updated = excluded.updated
+                """,
+                (video_id, playlist_index, title, url, status, error, time.time()),
+            )
+            self._conn.commit()
+
+    def mark_ok(self, video_ids):
+        """Marca como 'ok' itens que já estão no disco sem nova tentativa."""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE outcomes SET status = ?, error = NULL, updated = ? WHERE video_id = ? AND status != ?",
+                [(OK, time.time(), video_id, OK) for video_id in video_ids],
+            )
+            self._conn.commit()
+
+    def get(self, video_id):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM outcomes WHERE video_id = ?", (video_id,)).fetchone()
+        return dict(row) if row else None
+
+    def failures(self, statuses=FAILURE_STATUSES):
+        """Itens cujo último desfecho está em `statuses`, na ordem da playlist."""
+        marks = ", ".join("?" for _ in statuses)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM outcomes WHERE status IN ({marks}) ORDER BY playlist_index, video_id",
+                tuple(statuses),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def summary(self):
+        """Quantidade de itens por desfecho."""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM outcomes GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+
+def format_journal_summary(counts):
+    """Formata a contagem de desfechos do diário."""
+    labels = (
+        (OK, "ok"),
+        (SKIPPED_PRIVATE, "privado(s)/indisponível(is)"),
+        (TRANSIENT_ERROR, "erro(s) temporário(s)"),
+        (PERMANENT_ERROR, "erro(s) permanente(s)"),
+    )
+    return "📒 Diário: " + ", ".join(f"{counts.get(key, 0)} {label}" for key, label in labels)
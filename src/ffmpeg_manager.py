@@ -2,18 +2,45 @@
 """
 Gerenciador de FFmpeg para YouTube Downloader.
 Baixa e extrai FFmpeg automaticamente se não estiver instalado.
+
+O download é feito em blocos, retomado com HTTP Range (e If-Range com o
+ETag salvo) se a conexão cair e conferido com o SHA-256 publicado junto
+dos builds. Do arquivo só são extraídos os executáveis necessários
+(ffmpeg e ffprobe).
 """
 
 import os
 import sys
+import time
 import shutil
-import urllib.request
+import hashlib
+import tarfile
 import zipfile
-from pathlib import Path
+import platform
+import urllib.error
+import urllib.request
+
+from ffmpeg_probe import EXE_SUFFIX, FFMPEG_DIR, FFMPEG_BIN, FFMPEG_BIN_DIR, resolve_ffmpeg, format_capabilities
+
+FFMPEG_RELEASE_URL = "https://github.com/BtbN/FFmpeg-Builds/releases/download/latest"
+FFMPEG_CHECKSUMS_URL = f"{FFMPEG_RELEASE_URL}/checksums.sha256"
 
-FFMPEG_DOWNLOAD_URL = "https://github.com/BtbN/FFmpeg-Builds/releases/download/latest/ffmpeg-master-latest-win64-gpl.zip"
-FFMPEG_DIR = os.path.join(os.path.dirname(__file__), "ffmpeg")
-FFMPEG_BIN = os.path.join(FFMPEG_DIR, "bin", "ffmpeg.exe")
+# Plataforma -> arquivo publicado nos builds do BtbN
+FFMPEG_ARCHIVES = {
+    "win64": "ffmpeg-master-latest-win64-gpl.zip",
+    "linux64": "ffmpeg-master-latest-linux64-gpl.tar.xz",
+    "linuxarm64": "ffmpeg-master-latest-linuxarm64-gpl.tar.xz",
+}
+
+# Mantido por compatibilidade: URL do build para Windows
+FFMPEG_DOWNLOAD_URL = f"{FFMPEG_RELEASE_URL}/{FFMPEG_ARCHIVES['win64']}"
+
+CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_RETRIES = 5
+
+
+class ChecksumMismatch(Exception):
+    """O arquivo baixado não confere com o SHA-256 esperado."""
 
 
 def is_ffmpeg_installed():
@@ -26,77 +53,231 @@ def is_ffmpeg_local():
     return os.path.exists(FFMPEG_BIN)
 
 
-def download_ffmpeg():
-    """Baixa FFmpeg da fonte pública."""
+def detect_platform():
+    """Retorna a chave de FFMPEG_ARCHIVES para este sistema (ou None)."""
+    machine = platform.machine().lower()
+    if sys.platform == "win32" and machine in ("amd64", "x86_64"):
+        return "win64"
+    if sys.platform.startswith("linux"):
+        if machine in ("x86_64", "amd64"):
+            return "linux64"
+        if machine in ("aarch64", "arm64"):
+            return "linuxarm64"
+    return None
+
+
+def fetch_checksum(checksums_url, filename):
+    """Busca o SHA-256 de `filename` em uma lista no formato do sha256sum."""
+    with urllib.request.urlopen(checksums_url, timeout=30) as response:
+        for line in response.read().decode("utf-8").splitlines():
+            parts = line.split()
+            if len(parts) == 2 and parts[1].lstrip("*") == filename:
+                return parts[0].lower()
+    return None
+
+
+def _sha256_of(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest
+
+
+def _validator(response):
+    """ETag forte (ou Last-Modified) da resposta, usado no If-Range ao retomar."""
+    etag = response.headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return response.headers.get("Last-Modified")
+
+
+def download_file(url, dest, sha256=None, retries=DOWNLOAD_RETRIES, progress=None):
+    """Baixa `url` para `dest` em blocos, retomando de onde parou.
+
+    Os bytes vão para '<dest>.part'; se a conexão cair (ou uma execução
+    anterior tiver sido interrompida), o download continua com um pedido
+    Range a partir do tamanho já gravado. O ETag da primeira resposta fica
+    em '<dest>.part.etag' e vai no If-Range, para o servidor mandar o
+    arquivo inteiro se ele tiver mudado. Sem ETag nem `sha256` não há como
+    saber se o .part é do mesmo arquivo, e ele é descartado. O hash é
+    calculado durante o download e, com `sha256`, conferido antes de
+    renomear o arquivo. `progress(baixado, total)` é chamado a cada bloco.
+    """
+    part = dest + ".part"
+    validator_path = part + ".etag"
+    validator = None
+    if os.path.exists(validator_path):
+        with open(validator_path, encoding="utf-8") as f:
+            validator = f.read().strip() or None
+    if os.path.exists(part) and not (validator or sha256):
+        os.remove(part)
+    digest = _sha256_of(part) if os.path.exists(part) else hashlib.sha256()
+    offset = os.path.getsize(part) if os.path.exists(part) else 0
+
+    for attempt in range(retries + 1):
+        if offset and not (validator or sha256):
+            # Retomar sem ETag nem checksum poderia emendar dois arquivos diferentes
+            offset, digest = 0, hashlib.sha256()
+        request = urllib.request.Request(url)
+        if offset:
+            request.add_header("Range", f"bytes={offset}-")
+            if validator:
+                request.add_header("If-Range", validator)
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                if offset and response.status != 206:
+                    # Servidor ignorou o Range (ou o arquivo mudou): recomeçar do zero
+                    offset, digest = 0, hashlib.sha256()
+                if not offset:
+                    validator = _validator(response)
+                    if validator:
+                        with open(validator_path, "w", encoding="utf-8") as f:
+                            f.write(validator)
+                    elif os.path.exists(validator_path):
+                        os.remove(validator_path)
+                length = response.headers.get("Content-Length")
+                total = offset + int(length) if length else None
+                with open(part, "ab" if offset else "wb") as f:
+                    while True:
+                        chunk = response.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        f.write(chunk)
+                        digest.update(chunk)
+                        offset += len(chunk)
+                        if progress is not None:
+                            progress(offset, total)
+                if total is not None and offset < total:
+                    raise ConnectionError(f"conexão encerrada em {offset}/{total} bytes")
+            break
+        except urllib.error.HTTPError as e:
+            if e.code == 416 and offset:
+                # Range além do fim: o .part já está completo
+                break
+            if attempt == retries or e.code < 500:
+                raise
+        except (urllib.error.URLError, ConnectionError, TimeoutError, OSError):
+            if attempt == retries:
+                raise
+        delay = min(2 ** attempt, 30)
+        print(f"\n[!] Conexão interrompida em {offset} bytes; retomando em {delay}s...")
+        time.sleep(delay)
+
+    if os.path.exists(validator_path):
+        os.remove(validator_path)
+    if sha256 and digest.hexdigest() != sha256.lower():
+        os.remove(part)
+        raise ChecksumMismatch(f"SHA-256 não confere: esperado {sha256}, obtido {digest.hexdigest()}")
+    os.replace(part, dest)
+    return dest
+
+
+def _install_member(source, name, bin_dir):
+    """Copia um executável do arquivo para `bin_dir` de forma atômica."""
+    target = os.path.join(bin_dir, name)
+    with open(target + ".part", "wb") as out:
+        shutil.copyfileobj(source, out, CHUNK_SIZE)
+    os.chmod(target + ".part", 0o755)
+    os.replace(target + ".part", target)
+    return target
+
+
+def extract_binaries(archive_path, bin_dir, names=None):
+    """Extrai do arquivo (.zip ou .tar.xz) só os executáveis em `names`.
+
+    O .zip é lido pelo diretório central e o .tar.xz em uma única passada
+    sequencial; nada além dos executáveis é gravado no disco.
+    """
+    names = set(names or ("ffmpeg" + EXE_SUFFIX, "ffprobe" + EXE_SUFFIX))
+    os.makedirs(bin_dir, exist_ok=True)
+    installed = []
+    if zipfile.is_zipfile(archive_path):
+        with zipfile.ZipFile(archive_path) as zf:
+            for member in zf.infolist():
+                name = os.path.basename(member.filename)
+                if name in names and not member.is_dir():
+                    with zf.open(member) as source:
+                        installed.append(_install_member(source, name, bin_dir))
+    else:
+        with tarfile.open(archive_path, "r|*") as tf:
+            for member in tf:
+                name = os.path.basename(member.name)
+                if name in names and member.isfile():
+                    installed.append(_install_member(tf.extractfile(member), name, bin_dir))
+    missing = names - {os.path.basename(path) for path in installed}
+    if missing:
+        raise FileNotFoundError(f"Não encontrado no arquivo: {', '.join(sorted(missing))}")
+    return installed
+
+
+def _print_progress(done, total):
+    if total:
+        sys.stdout.write(f"\r    {done / (1024 * 1024):.1f}/{total / (1024 * 1024):.1f} MB ({done / total:.0%})")
+        sys.stdout.flush()
+
+
+def download_ffmpeg(target=None, url=None, sha256=None, checksums_url=FFMPEG_CHECKSUMS_URL,
+                    dest_dir=FFMPEG_DIR):
+    """Baixa FFmpeg da fonte pública.
+
+    `target` é uma chave de FFMPEG_ARCHIVES (padrão: a plataforma atual).
+    `url`, `sha256` e `checksums_url` permitem apontar para outro servidor
+    (ex.: um servidor HTTP local com um arquivo de teste).
+    """
+    target = target or detect_platform()
+    if url is None:
+        if target not in FFMPEG_ARCHIVES:
+            print(f"[❌] Plataforma sem build automático: {sys.platform}/{platform.machine()}")
+            return False
+        url = f"{FFMPEG_RELEASE_URL}/{FFMPEG_ARCHIVES[target]}"
+    filename = url.rsplit("/", 1)[-1]
+
     print("[*] Baixando FFmpeg...")
-    print(f"    URL: {FFMPEG_DOWNLOAD_URL}")
-    
-    zip_path = os.path.join(FFMPEG_DIR, "ffmpeg.zip")
-    
+    print(f"    URL: {url}")
+    os.makedirs(dest_dir, exist_ok=True)
+    archive_path = os.path.join(dest_dir, filename)
+
     try:
-        # Criar diretório se não existir
-        os.makedirs(FFMPEG_DIR, exist_ok=True)
-        
-        # Baixar arquivo
-        urllib.request.urlretrieve(FFMPEG_DOWNLOAD_URL, zip_path)
-        print("[✓] Download concluído!")
-        
-        # Extrair
-        print("[*] Extraindo FFmpeg...")
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            zip_ref.extractall(FFMPEG_DIR)
-        print("[✓] Extração concluída!")
-        
-        # Reorganizar estrutura (FFmpeg coloca em pasta aninhada)
-        for root, dirs, files in os.walk(FFMPEG_DIR):
-            for file in files:
-                if file in ["ffmpeg.exe", "ffprobe.exe"]:
-                    src = os.path.join(root, file)
-                    bin_dir = os.path.join(FFMPEG_DIR, "bin")
-                    os.makedirs(bin_dir, exist_ok=True)
-                    dst = os.path.join(bin_dir, file)
-                    shutil.move(src, dst)
-                    print(f"[✓] Movido {file}")
-        
-        # Limpar estrutura desnecessária
-        for item in os.listdir(FFMPEG_DIR):
-            item_path = os.path.join(FFMPEG_DIR, item)
-            if item != "bin" and os.path.isdir(item_path):
-                shutil.rmtree(item_path)
-        
-        # Remover zip
-        if os.path.exists(zip_path):
-            os.remove(zip_path)
-        
+        if sha256 is None and checksums_url:
+            sha256 = fetch_checksum(checksums_url, filename)
+            if sha256 is None:
+                print("[⚠️ ] Checksum não publicado para este arquivo; download não será verificado.")
+
+        download_file(url, archive_path, sha256=sha256, progress=_print_progress)
+        print("\n[✓] Download concluído" + (" e verificado (SHA-256)!" if sha256 else "!"))
+
+        print("[*] Extraindo ffmpeg e ffprobe...")
+        suffix = ".exe" if filename.endswith(".zip") else ""
+        for path in extract_binaries(archive_path, os.path.join(dest_dir, "bin"),
+                                     ("ffmpeg" + suffix, "ffprobe" + suffix)):
+            print(f"[✓] {os.path.basename(path)}")
+        os.remove(archive_path)
+
         print("[✓] FFmpeg instalado com sucesso!")
         return True
-        
+
     except Exception as e:
-        print(f"[❌] Erro ao baixar FFmpeg: {e}")
+        # O .part fica no disco para a próxima tentativa continuar de onde parou
+        print(f"\n[❌] Erro ao baixar FFmpeg: {e}")
         return False
 
 
 def ensure_ffmpeg():
-    """Garante que FFmpeg está disponível."""
-    # Verificar FFmpeg no PATH
-    if is_ffmpeg_installed():
-        print("[✓] FFmpeg encontrado no PATH")
-        return True
-    
-    # Verificar FFmpeg local
-    if is_ffmpeg_local():
-        print("[✓] FFmpeg local encontrado")
-        # Adicionar ao PATH
-        bin_dir = os.path.join(FFMPEG_DIR, "bin")
-        os.environ['PATH'] = bin_dir + os.pathsep + os.environ.get('PATH', '')
+    """Garante que FFmpeg está disponível (no PATH ou na pasta local)."""
+    capabilities = resolve_ffmpeg()
+    if capabilities is not None:
+        origin = "local" if capabilities.ffmpeg.startswith(FFMPEG_BIN_DIR) else "no PATH"
+        print(f"[✓] FFmpeg encontrado {origin}")
+        print(f"    {format_capabilities(capabilities)}")
         return True
-    
+
     # Oferecer download
     print("\n[!] FFmpeg não encontrado!")
     print("[*] Você pode:")
     print("    1. Baixá-lo automaticamente (requer internet)")
     print("    2. Instalar manualmente de https://ffmpeg.org/download.html")
-    
+
     return False
 
 
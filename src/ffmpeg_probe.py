@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Localização e recursos do FFmpeg para o YouTube Downloader.
+Encontra ffmpeg/ffprobe uma única vez por processo (PATH ou a pasta local
+do build com FFmpeg incluído), consulta a versão, os encoders de áudio e o
+suporte a threads, e guarda o resultado em disco pelo caminho e mtime do
+executável, para que as próximas execuções não precisem consultar de novo.
+"""
+
+import os
+import sys
+import json
+import shutil
+import threading
+import subprocess
+
+from app_paths import user_cache_dir
+
+EXE_SUFFIX = ".exe" if sys.platform == "win32" else ""
+# Pasta do FFmpeg baixado pelo ffmpeg_manager (e incluída no build)
+FFMPEG_DIR = os.path.join(os.path.dirname(__file__), "ffmpeg")
+FFMPEG_BIN_DIR = os.path.join(FFMPEG_DIR, "bin")
+FFMPEG_BIN = os.path.join(FFMPEG_BIN_DIR, "ffmpeg" + EXE_SUFFIX)
+
+CACHE_FILENAME = "capabilities.json"
+PROBE_TIMEOUT = 15
+
+_resolved = None
+_resolve_lock = threading.Lock()
+
+
+class FFmpegCapabilities:
+    """O que o ffmpeg encontrado oferece: versão, encoders e threads.
+
+    `encoders` mapeia o nome de cada encoder de áudio para o tipo de
+    paralelismo que ele suporta ('frame', 'slice' ou None).
+    """
+
+    def __init__(self, ffmpeg, ffprobe=None, version=None, encoders=None, threads=True):
+        self.ffmpeg = ffmpeg
+        self.ffprobe = ffprobe
+        self.version = version
+        self.encoders = dict(encoders or {})
+        self.threads = threads
+
+    def __repr__(self):
+        return f"FFmpegCapabilities({self.ffmpeg!r}, version={self.version!r})"
+
+    def has_encoder(self, name):
+        return name in self.encoders
+
+    def pick_encoder(self, candidates):
+        """Primeiro encoder disponível da lista de preferência (ou None)."""
+        return next((name for name in candidates if name in self.encoders), None)
+
+    def thread_count(self, encoder, workers=1):
+        """Threads por processo do ffmpeg para `encoder` com `workers` processos.
+
+        Encoders sem paralelismo interno usam uma thread, para não disputar
+        núcleos com os outros processos de conversão.
+        """
+        if not self.threads or not self.encoders.get(encoder):
+            return 1
+        return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+    def to_dict(self):
+        return {"ffmpeg": self.ffmpeg, "ffprobe": self.ffprobe, "version": self.version,
+                "encoders": self.encoders, "threads": self.threads}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["ffmpeg"], data.get("ffprobe"), data.get("version"),
+                   data.get("encoders"), data.get("threads", True))
+
+
+def locate_ffmpeg():
+    """Retorna (ffmpeg, ffprobe) absolutos, do PATH ou da pasta local; ou (None, None).
+
+    O PATH do processo não é alterado: quem executa o ffmpeg (yt-dlp,
+    pipeline de conversão, streaming) recebe o caminho resolvido.
+    """
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None and os.path.exists(FFMPEG_BIN):
+        ffmpeg = FFMPEG_BIN
+    if ffmpeg is None:
+        return None, None
+    ffmpeg = os.path.abspath(ffmpeg)
+    sibling = os.path.join(os.path.dirname(ffmpeg), "ffprobe" + EXE_SUFFIX)
+    ffprobe = sibling if os.path.exists(sibling) else shutil.which("ffprobe")
+    return ffmpeg, ffprobe
+
+
+def _run(ffmpeg, *args):
+    result = subprocess.run([ffmpeg, "-hide_banner", *args], capture_output=True, text=True,
+                            timeout=PROBE_TIMEOUT)
+    return result.stdout
+
+
+def parse_encoders(text):
+    """Encoders de áudio da saída de `ffmpeg -encoders` -> tipo de paralelismo."""
+    encoders = {}
+    for line in text.splitlines():
+        parts = line.split()
+        # Linhas de encoder: flags de 6 colunas ('A....D') seguidas do nome
+        if len(parts) < 2 or len(parts[0]) != 6 or parts[0][0] != "A" or parts[1] == "=":
+            continue
+        flags = parts[0]
+        encoders[parts[1]] = "frame" if flags[1] == "F" else "slice" if flags[2] == "S" else None
+    return encoders
+
+
+def probe_ffmpeg(ffmpeg, ffprobe=None):
+    """Consulta versão, encoders de áudio e suporte a threads de um ffmpeg."""
+    version_text = _run(ffmpeg, "-version")
+    first = version_text.splitlines()[0] if version_text else ""
+    version = first.split()[2] if first.startswith("ffmpeg version") and len(first.split()) > 2 else None
+    configuration = next((line for line in version_text.splitlines() if line.startswith("configuration:")), "")
+    return FFmpegCapabilities(
+        ffmpeg, ffprobe, version,
+        encoders=parse_encoders(_run(ffmpeg, "-encoders")),
+        threads="--disable-pthreads" not in configuration or "--enable-w32threads" in configuration,
+    )
+
+
+def _cache_key(ffmpeg):
+    real = os.path.realpath(ffmpeg)
+    st = os.stat(real)
+    return real, st.st_mtime, st.st_size
+
+
+def _load_cache(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1)
+        os.replace(tmp, path)
+    except OSError:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def resolve_ffmpeg(refresh=False, cache_dir=None):
+    """Localiza e consulta o ffmpeg, com cache no processo e em disco.
+
+    A consulta só é refeita quando o executável muda (caminho, mtime ou
+    tamanho) ou com `refresh=True`. Retorna FFmpegCapabilities ou None se
+    o ffmpeg não for encontrado.
+    """
+    global _resolved
+    with _resolve_lock:
+        if _resolved is not None and not refresh:
+            return _resolved
+        ffmpeg, ffprobe = locate_ffmpeg()
+        if ffmpeg is None:
+            return None
+
+        cache_path = os.path.join(cache_dir or user_cache_dir("ffmpeg"), CACHE_FILENAME)
+        cache = _load_cache(cache_path)
+        real, mtime, size = _cache_key(ffmpeg)
+        entry = cache.get(real)
+        if not refresh and entry and entry.get("mtime") == mtime and entry.get("size") == size:
+            capabilities = FFmpegCapabilities.from_dict(entry["capabilities"])
+            capabilities.ffmpeg, capabilities.ffprobe = ffmpeg, ffprobe
+        else:
+            try:
+                capabilities = probe_ffmpeg(ffmpeg, ffprobe)
+            except (OSError, subprocess.SubprocessError):
+                # Executável presente mas que não responde: usar sem recursos
+                # conhecidos (também guardado, para não consultar a cada chamada)
+                capabilities = FFmpegCapabilities(ffmpeg, ffprobe)
+                _resolved = capabilities
+                return capabilities
+            cache[real] = {"mtime": mtime, "size": size, "capabilities": capabilities.to_dict()}
+            _save_cache(cache_path, cache)
+        _resolved = capabilities
+        return capabilities
+
+
+def format_capabilities(capabilities, encoder=None, threads=None):
+    """Resume o ffmpeg em uso (e o encoder escolhido) em uma linha."""
+    text = f"🎞️  FFmpeg {capabilities.version or '?'} ({capabilities.ffmpeg})"
+    if encoder:
+        text += f" | encoder {encoder}"
+        if threads:
+            text += f", {threads} thread(s) por processo"
+    return text
@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+"""
+Fila de trabalhos da interface gráfica.
+Várias playlists podem ser enfileiradas; um único DownloadEngine, rodando
+em uma thread com laço asyncio próprio, executa-as sob um limite comum de
+playlists e de vídeos simultâneos. Cada trabalho guarda o estado das suas
+faixas, exibido por uma tabela virtualizada: só as linhas visíveis existem
+como itens do canvas e a tela é redesenhada em lotes pelo laço da GUI,
+nunca por evento.
+"""
+
+import bisect
+import asyncio
+import threading
+import tkinter as tk
+import customtkinter as ctk
+
+from progress import format_bytes
+
+# Limites compartilhados por todos os trabalhos da fila
+MAX_ACTIVE_JOBS = 2
+MAX_DOWNLOADS = 8
+
+# Estados de um trabalho da fila
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+JOB_LABELS = {
+    JOB_QUEUED: "⏳ na fila",
+    JOB_RUNNING: "⬇️ baixando",
+    JOB_DONE: "✅ concluído",
+    JOB_FAILED: "❌ falhou",
+    JOB_CANCELLED: "⏹️ cancelado",
+}
+
+# Estados das faixas (ITEM_* do motor de downloads)
+ITEM_LABELS = {
+    "queued": "na fila",
+    "indexed": "já baixado",
+    "downloading": "baixando",
+    "converting": "convertendo",
+    "done": "concluído",
+    "failed": "falhou",
+    "skipped": "indisponível",
+    "retry": "nova tentativa",
+    "cancelled": "cancelado",
+}
+
+ROW_HEIGHT = 22
+
+
+class QueuedJob:
+    """Um trabalho da fila e o estado das suas faixas.
+
+    `apply(event)` é chamado pela thread do motor; a interface lê com
+    `rows()` só a faixa de linhas visível e usa `version` para saber se
+    algo mudou desde o último desenho.
+    """
+
+    def __init__(self, job_id, url, options=None):
+        self.id = job_id
+        self.url = url
+        self.options = options
+        self.title = url
+        self.status = JOB_QUEUED
+        self.snapshot = None
+        self.error = None
+        self.folder = None
+        self.future = None
+        self.version = 0
+        self._lock = threading.Lock()
+        # Posição na playlist -> {estado, título, velocidade, tamanho}
+        self._items = {}
+        self._order = []
+
+    def __repr__(self):
+        return f"QueuedJob({self.id}, {self.url!r}, {self.status})"
+
+    @property
+    def finished(self):
+        return self.status in (JOB_DONE, JOB_FAILED, JOB_CANCELLED)
+
+    @property
+    def item_count(self):
+        with self._lock:
+            return len(self._order)
+
+    def set_status(self, status, error=None):
+        with self._lock:
+            self.status = status
+            self.error = error
+            self.version += 1
+
+    def set_progress(self, snapshot):
+        with self._lock:
+            self.snapshot = snapshot
+            if self.status == JOB_QUEUED:
+                self.status = JOB_RUNNING
+            self.version += 1
+
+    def apply(self, event):
+        """Aplica um evento do DownloadEngine ao estado do trabalho."""
+        with self._lock:
+            if self.status == JOB_QUEUED:
+                self.status = JOB_RUNNING
+            if event.type == "item":
+                item = self._items.get(event.index)
+                if item is None:
+                    item = self._items[event.index] = {"title": None, "state": None, "speed": None,
+                                                       "size": None, "total": None}
+                    if self._order and event.index < self._order[-1]:
+                        bisect.insort(self._order, event.index)
+                    else:
+                        self._order.append(event.index)
+                item["title"] = event.title or event.video_id or item["title"]
+                item["state"] = event.state
+                item["speed"] = event.speed
+                if event.nbytes is not None:
+                    item["size"] = event.nbytes
+                if event.total_bytes:
+                    item["total"] = event.total_bytes
+            elif event.type == "progress":
+                self.snapshot = event.snapshot
+            elif event.type == "started":
+                self.title = event.title
+                self.folder = event.folder
+            elif event.type == "finished":
+                self.status = event.status
+                self.error = event.error
+                self.folder = event.folder or self.folder
+            self.version += 1
+
+    def rows(self, start, stop):
+        """Linhas formatadas da tabela de faixas entre `start` e `stop`."""
+        with self._lock:
+            items = [(index, dict(self._items[index])) for index in self._order[start:stop]]
+        rows = []
+        for index, item in items:
+            size = item["size"]
+            if item["state"] == "downloading" and item["total"]:
+                size_text = f"{format_bytes(size or 0)}/{format_bytes(item['total'])}"
+            else:
+                size_text = format_bytes(size) if size else ""
+            rows.append((
+                str(index),
+                item["title"] or "",
+                ITEM_LABELS.get(item["state"], item["state"] or ""),
+                f"{format_bytes(item['speed'])}/s" if item["speed"] else "",
+                size_text,
+            ))
+        return rows
+
+    def summary_row(self):
+        """Linha da tabela de trabalhos."""
+        with self._lock:
+            snapshot = self.snapshot
+            fraction = snapshot["fraction"] if snapshot else 0.0
+            done = f"{snapshot['items_done']}/{snapshot['items_total']}" if snapshot else ""
+            return (str(self.id), self.title, JOB_LABELS.get(self.status, self.status),
+                    f"{fraction * 100:.0f}% {done}".strip())
+
+
+class GuiJobQueue:
+    """Executa os trabalhos da GUI em um DownloadEngine com laço asyncio próprio.
+
+    `on_event(job, event)` e `on_finished(job)` são chamados na thread do
+    motor. O motor (e o yt-dlp) só é importado no primeiro trabalho.
+    """
+
+    def __init__(self, max_active=MAX_ACTIVE_JOBS, max_downloads=MAX_DOWNLOADS,
+                 on_event=None, on_finished=None):
+        self.max_active = max_active
+        self.max_downloads = max_downloads
+        self.on_event = on_event
+        self.on_finished = on_finished
+        self.jobs = []
+        self.version = 0
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._loop = None
+        self._engine = None
+
+    def _ensure_engine(self):
+        with self._lock:
+            if self._loop is None:
+                from download_engine import DownloadEngine
+                self._engine = DownloadEngine(max_playlists=self.max_active, max_downloads=self.max_downloads)
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, daemon=True).start()
+
+    def new_job(self, url, options=None):
+        """Cria e registra um trabalho (ainda não iniciado)."""
+        with self._lock:
+            job = QueuedJob(self._next_id, url, options)
+            self._next_id += 1
+            self.jobs.append(job)
+            self.version += 1
+        return job
+
+    def submit(self, url, options):
+        """Enfileira uma playlist no motor; retorna o QueuedJob."""
+        job = self.new_job(url, options)
+        self._ensure_engine()
+        job.future = asyncio.run_coroutine_threadsafe(self._run(job), self._loop)
+        return job
+
+    async def _run(self, job):
+        try:
+            async for event in self._engine.download(job.url, job.options):
+                job.apply(event)
+                if self.on_event is not None:
+                    self.on_event(job, event)
+        except asyncio.CancelledError:
+            job.set_status(JOB_CANCELLED)
+        except Exception as e:
+            job.set_status(JOB_FAILED, str(e))
+        finally:
+            if job.status in (JOB_QUEUED, JOB_RUNNING):
+                job.set_status(JOB_CANCELLED)
+            with self._lock:
+                self.version += 1
+            if self.on_finished is not None:
+                self.on_finished(job)
+
+    def cancel(self, job):
+        """Cancela um trabalho na fila ou em andamento."""
+        if job.future is not None:
+            # Cancela a tarefa no laço do motor; os workers param antes de ela terminar
+            job.future.cancel()
+
+    @property
+    def active(self):
+        with self._lock:
+            return [job for job in self.jobs if not job.finished]
+
+    def shutdown(self):
+        if self._engine is not None:
+            self._engine.cancel()
+            self._engine.close()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+def _theme_color(widget, widget_name, key):
+    return widget._apply_appearance_mode(ctk.ThemeManager.theme[widget_name][key])
+
+
+class VirtualTable(ctk.CTkFrame):
+    """Tabela em um canvas que desenha apenas as linhas visíveis.
+
+    `columns` é uma lista de (cabeçalho, largura em pixels, alinhamento);
+    uma largura None ocupa o espaço restante. `set_source(count, rows)`
+    informa quantas linhas existem e a função `rows(início, fim)` que as
+    formata; `refresh()` redesenha o pequeno conjunto de itens do canvas
+    reaproveitado entre rolagens, independentemente do total de linhas.
+    """
+
+    def __init__(self, master, columns, height=160, on_select=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.columns = columns
+        self.on_select = on_select
+        self.count = 0
+        self.rows = None
+        self.first = 0
+        self.selected = None
+        self._pool = []
+        self._xs = []
+
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(1, weight=1)
+        self._bg = _theme_color(self, "CTkFrame", "fg_color")
+        self._fg = _theme_color(self, "CTkLabel", "text_color")
+        self._accent = _theme_color(self, "CTkButton", "fg_color")
+        self.header = tk.Canvas(self, height=ROW_HEIGHT, highlightthickness=0, bg=self._bg)
+        self.header.grid(row=0, column=0, sticky="ew")
+        self.canvas = tk.Canvas(self, height=height, highlightthickness=0, bg=self._bg)
+        self.canvas.grid(row=1, column=0, sticky="nsew")
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.grid(row=0, column=1, rowspan=2, sticky="ns")
+
+        self.canvas.bind("<Configure>", self._on_configure)
+        self.canvas.bind("<MouseWheel>", lambda e: self.scroll(-1 if e.delta > 0 else 1, "units"))
+        self.canvas.bind("<Button-4>", lambda e: self.scroll(-1, "units"))
+        self.canvas.bind("<Button-5>", lambda e: self.scroll(1, "units"))
+        self.canvas.bind("<Button-1>", self._on_click)
+
+    @property
+    def visible_rows(self):
+        return len(self._pool)
+
+    def _on_configure(self, event):
+        width = event.width
+        fixed = sum(w for _, w, _ in self.columns if w)
+        flexible = max(60, width - fixed)
+        self._xs = []
+        x = 4
+        for _, w, _ in self.columns:
+            self._xs.append((x, w or flexible))
+            x += w or flexible
+
+        self.header.delete("all")
+        for (title, _, anchor), (x, w) in zip(self.columns, self._xs):
+            self.header.create_text(x if anchor == "w" else x + w - 8, ROW_HEIGHT // 2, text=title,
+                                    anchor=anchor, fill=self._fg, font=("TkDefaultFont", 9, "bold"))
+
+        # Conjunto fixo de itens do canvas: uma linha por altura visível
+        self.canvas.delete("all")
+        self._pool = []
+        for slot in range(event.height // ROW_HEIGHT + 1):
+            y = slot * ROW_HEIGHT
+            rect = self.canvas.create_rectangle(0, y, width, y + ROW_HEIGHT, width=0, fill=self._bg)
+            texts = [
+                self.canvas.create_text(x if anchor == "w" else x + w - 8, y + ROW_HEIGHT // 2, text="",
+                                        anchor=anchor, fill=self._fg)
+                for (_, _, anchor), (x, w) in zip(self.columns, self._xs)
+            ]
+            self._pool.append((rect, texts))
+        self.refresh()
+
+    def set_source(self, count, rows):
+        """Troca o número de linhas e a função que as formata, e redesenha."""
+        if rows != self.rows:
+            # Outra fonte (ex.: outro trabalho selecionado): voltar ao topo
+            self.first = 0
+            self.selected = None
+        self.count = count
+        self.rows = rows
+        self.refresh()
+
+    def refresh(self):
+        """Redesenha só as linhas visíveis."""
+        visible = self.visible_rows
+        self.first = max(0, min(self.first, self.count - visible + 1))
+        values = self.rows(self.first, self.first + visible) if self.rows and visible else []
+        for slot, (rect, texts) in enumerate(self._pool):
+            row = values[slot] if slot < len(values) else None
+            index = self.first + slot
+            fill = self._accent if row is not None and index == self.selected else self._bg
+            self.canvas.itemconfigure(rect, fill=fill)
+            for text, (_, w), value in zip(texts, self._xs, row or [""] * len(texts)):
+                self.canvas.itemconfigure(text, text=_fit(value, w))
+        if self.count > visible - 1 and self.count:
+            self.scrollbar.set(self.first / self.count, min(1.0, (self.first + visible - 1) / self.count))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def scroll(self, amount, unit):
+        step = max(1, self.visible_rows - 2) if unit == "pages" else 3
+        self.first += int(amount) * step
+        self.refresh()
+
+    def _on_scrollbar(self, action, *args):
+        if action == "moveto":
+            self.first = int(float(args[0]) * self.count)
+            self.refresh()
+        elif action == "scroll":
+            self.scroll(args[0], args[1])
+
+    def _on_click(self, event):
+        index = self.first + event.y // ROW_HEIGHT
+        if index < self.count:
+            self.selected = index
+            self.refresh()
+            if self.on_select is not None:
+                self.on_select(index)
+
+
+def _fit(text, width, char_width=7):
+    """Corta o texto para caber na coluna (estimativa pela largura média do caractere)."""
+    limit = max(1, (width - 10) // char_width)
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+class JobQueuePanel(ctk.CTkFrame):
+    """Painel com a lista de trabalhos e as faixas do trabalho selecionado."""
+
+    JOB_COLUMNS = [("#", 36, "w"), ("Playlist", None, "w"), ("Estado", 120, "w"), ("Progresso", 110, "e")]
+    ITEM_COLUMNS = [("#", 52, "w"), ("Título", None, "w"), ("Estado", 100, "w"),
+                    ("Velocidade", 90, "e"), ("Tamanho", 130, "e")]
+
+    def __init__(self, master, queue, **kwargs):
+        super().__init__(master, **kwargs)
+        self.queue = queue
+        self.selected = None
+        self._shown = (None, None, None)
+
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(2, weight=1)
+        self.jobs_table = VirtualTable(self, self.JOB_COLUMNS, height=ROW_HEIGHT * 4,
+                                       on_select=self._select_job)
+        self.jobs_table.grid(row=0, column=0, sticky="ew")
+
+        actions = ctk.CTkFrame(self, fg_color="transparent")
+        actions.grid(row=1, column=0, sticky="ew", pady=4)
+        actions.grid_columnconfigure(0, weight=1)
+        self.detail_label = ctk.CTkLabel(actions, text="Nenhum trabalho na fila", anchor="w")
+        self.detail_label.grid(row=0, column=0, sticky="ew")
+        self.cancel_button = ctk.CTkButton(actions, text="Cancelar", width=90, command=self._cancel_selected)
+        self.cancel_button.grid(row=0, column=1)
+
+        self.items_table = VirtualTable(self, self.ITEM_COLUMNS, height=ROW_HEIGHT * 8)
+        self.items_table.grid(row=2, column=0, sticky="nsew")
+
+    def _job_rows(self, start, stop):
+        with self.queue._lock:
+            jobs = self.queue.jobs[start:stop]
+        return [job.summary_row() for job in jobs]
+
+    def _select_job(self, index):
+        with self.queue._lock:
+            self.selected = self.queue.jobs[index] if index < len(self.queue.jobs) else None
+        self.refresh()
+
+    def select(self, job):
+        with self.queue._lock:
+            self.jobs_table.selected = self.queue.jobs.index(job)
+        self.selected = job
+        self.refresh()
+
+    def _cancel_selected(self):
+        if self.selected is not None and not self.selected.finished:
+            self.queue.cancel(self.selected)
+
+    def refresh(self):
+        """Redesenha o que mudou desde a última chamada (chamado pelo laço da GUI)."""
+        job = self.selected
+        with self.queue._lock:
+            versions = sum(j.version for j in self.queue.jobs)
+        state = (self.queue.version, versions, job and job.version)
+        if state == self._shown:
+            return
+        self._shown = state
+        with self.queue._lock:
+            job_count = len(self.queue.jobs)
+        self.jobs_table.set_source(job_count, self._job_rows)
+        if job is None:
+            self.items_table.set_source(0, None)
+            return
+        self.items_table.set_source(job.item_count, job.rows)
+        text = f"#{job.id} {job.title}: {job.item_count} faixa(s)"
+        if job.error:
+            text += f" — {job.error}"
+        self.detail_label.configure(text=text)
+        self.cancel_button.configure(state="disabled" if job.finished else "normal")
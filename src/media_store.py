@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Acervo deduplicado de mídia do YouTube Downloader.
+No modo lote cada vídeo é baixado uma única vez para o acervo (um arquivo
+por ID e perfil de saída) e as pastas das playlists recebem hardlinks ou
+reflinks para ele, mantendo os nomes '<índice> - <título>'.
+"""
+
+import os
+import shutil
+
+STORE_DIRNAME = ".media_store"
+
+# ioctl FICLONE do Linux (reflink em Btrfs/XFS)
+_FICLONE = 0x40049409
+
+
+def store_folder(root, profile):
+    """Pasta do acervo para um perfil de saída (cada perfil gera arquivos distintos)."""
+    folder = os.path.join(root, f"{profile.codec}-{profile.bitrate}")
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def _reflink(src, dst):
+    import fcntl
+
+    with open(src, "rb") as source, open(dst, "wb") as target:
+        try:
+            fcntl.ioctl(target.fileno(), _FICLONE, source.fileno())
+        except OSError:
+            target.close()
+            os.remove(dst)
+            raise
+
+
+def link_file(src, dst):
+    """Cria `dst` apontando para o conteúdo de `src` sem duplicar bytes, se possível.
+
+    Tenta hardlink, depois reflink (Linux) e, por fim, cópia. Retorna o
+    método usado: 'existing', 'hardlink', 'reflink' ou 'copy'.
+    """
+    if os.path.exists(dst):
+        if os.path.samefile(src, dst):
+            return "existing"
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+        return "hardlink"
+    except OSError:
+        pass
+    if hasattr(os, "uname") and os.uname().sysname == "Linux":
+        try:
+            _reflink(src, dst)
+            return "reflink"
+        except OSError:
+            pass
+    shutil.copy2(src, dst)
+    return "copy"
+
+
+def link_playlist(store_index, store_dir, folder_name, entries, seen):
+    """Cria na pasta da playlist os links para os arquivos do acervo.
+
+    `seen` guarda os IDs já ligados em outras playlists do lote: cada
+    repetição conta como bytes que não precisaram ser baixados de novo.
+    Retorna um dicionário com quantos itens foram ligados por método.
+    """
+    # Importado aqui para a limpeza do acervo (retention) não depender do yt-dlp
+    from download_index import DownloadIndex, expected_filename
+
+    width = len(str(len(entries)))
+    summary = {"linked": 0, "missing": 0, "bytes_saved": 0, "methods": {}}
+    folder_index = DownloadIndex(folder_name)
+    try:
+        for index, entry in enumerate(entries, start=1):
+            row = store_index.get(entry.get("id")) if entry.get("id") else None
+            if row is None:
+                summary["missing"] += 1
+                continue
+            src = os.path.join(store_dir, row["path"])
+            ext = os.path.splitext(row["path"])[1].lstrip(".")
+            title = entry.get("title") or row["title"] or entry["id"]
+            dst = os.path.join(folder_name, expected_filename(str(index).zfill(width), title, ext))
+            method = link_file(src, dst)
+            summary["linked"] += 1
+            summary["methods"][method] = summary["methods"].get(method, 0) + 1
+            if entry["id"] in seen:
+                summary["bytes_saved"] += row["size"]
+            seen.add(entry["id"])
+            folder_index.record(entry["id"], dst, title, codec=row["codec"],
+                                bitrate=row["bitrate"], sha256=row["sha256"])
+    finally:
+        folder_index.close()
+    return summary
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Cache em disco de metadados do YouTube Downloader.
+Guarda as informações de playlists e vídeos extraídas pelo yt-dlp com um
+prazo de validade, evitando repetir as mesmas requisições em novas
+tentativas, execuções e na GUI.
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+
+from app_paths import user_cache_dir
+
+# Playlists mudam pouco; as URLs de mídia dos vídeos expiram em poucas horas
+DEFAULT_TTL = {
+    "playlist": 60 * 60,
+    "video": 20 * 60,
+}
+
+
+class MetadataCache:
+    """Cache chave/valor em JSON, com validade por tipo de informação.
+
+    Com `refresh=True` as leituras são ignoradas (mas o cache é regravado),
+    o que força uma nova extração sem perder o cache para as próximas vezes.
+    """
+
+    def __init__(self, directory=None, ttl=None, refresh=False):
+        self.directory = directory or user_cache_dir("metadata")
+        os.makedirs(self.directory, exist_ok=True)
+        self.ttl = dict(DEFAULT_TTL, **(ttl or {}))
+        self.refresh = refresh
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, kind, key):
+        digest = hashlib.sha1(f"{kind}:{key}".encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{kind}-{digest}.json")
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, kind, key):
+        """Retorna o valor em cache ou None se ausente/expirado."""
+        path = self._path(kind, key)
+        if self.refresh or not os.path.exists(path):
+            self._count(False)
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            self._count(False)
+            return None
+        if time.time() - data.get("stored", 0) > self.ttl.get(kind, 0):
+            self._remove(path)
+            self._count(False)
+            return None
+        self._count(True)
+        return data["value"]
+
+    def put(self, kind, key, value):
+        """Grava um valor no cache de forma atômica."""
+        path = self._path(kind, key)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"stored": time.time(), "value": value}, f)
+            os.replace(tmp, path)
+        except (OSError, TypeError, ValueError):
+            self._remove(tmp)
+
+    def invalidate(self, kind, key):
+        """Remove explicitamente uma entrada do cache."""
+        self._remove(self._path(kind, key))
+
+    def clear(self):
+        """Remove todas as entradas do cache."""
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                self._remove(os.path.join(self.directory, name))
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def summary(self):
+        return f"🧠 Cache de metadados: {self.hits} acerto(s), {self.misses} falha(s)"
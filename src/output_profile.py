@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Perfis de saída de áudio do YouTube Downloader.
+Define codec, bitrate e seletor de formato, e decide por item se o áudio
+pode ser apenas copiado (remux) ou se precisa ser recodificado.
+"""
+
+import os
+
+DEFAULT_CODEC = "mp3"
+DEFAULT_BITRATE = "192"
+
+# codec -> extensão, encoder padrão do ffmpeg, codecs de origem que podem ser
+# copiados e encoders aceitos em ordem de preferência (os nativos do sistema,
+# como AudioToolbox e Media Foundation, são mais rápidos que os de software)
+CODECS = {
+    "mp3": {"ext": "mp3", "encoder": "libmp3lame", "copy_from": ("mp3",),
+            "encoders": ("libmp3lame", "mp3_mf")},
+    "m4a": {"ext": "m4a", "encoder": "aac", "copy_from": ("aac",),
+            "encoders": ("aac_at", "libfdk_aac", "aac_mf", "aac")},
+    "opus": {"ext": "opus", "encoder": "libopus", "copy_from": ("opus",),
+             "encoders": ("libopus",)},
+    "ogg": {"ext": "ogg", "encoder": "libvorbis", "copy_from": ("vorbis", "opus"),
+            "encoders": ("libvorbis",)},
+}
+
+# "best": mantém o codec de origem no contêiner mais natural
+NATIVE_EXT = {"mp3": "mp3", "aac": "m4a", "opus": "opus", "vorbis": "ogg"}
+
+# Seletores que favorecem um formato de origem já no codec desejado
+FORMAT_SELECTORS = {
+    "mp3": "bestaudio[acodec=mp3]/bestaudio/best",
+    "m4a": "bestaudio[acodec^=mp4a]/bestaudio[ext=m4a]/bestaudio/best",
+    "opus": "bestaudio[acodec=opus]/bestaudio/best",
+    "ogg": "bestaudio[acodec=vorbis]/bestaudio[acodec=opus]/bestaudio/best",
+    "best": "bestaudio/best",
+}
+
+PROFILE_CHOICES = tuple(CODECS) + ("best",)
+
+
+def normalize_acodec(acodec):
+    """Normaliza o acodec do yt-dlp ('mp4a.40.2' -> 'aac', 'none' -> None)."""
+    if not acodec or acodec == "none":
+        return None
+    acodec = acodec.lower()
+    if acodec.startswith("mp4a") or acodec == "aac":
+        return "aac"
+    return acodec.split(".")[0]
+
+
+class OutputProfile:
+    """Codec e bitrate de saída, com decisão de cópia vs. recodificação."""
+
+    def __init__(self, codec=DEFAULT_CODEC, bitrate=DEFAULT_BITRATE):
+        if codec not in PROFILE_CHOICES:
+            raise ValueError(f"Perfil inválido: {codec} (opções: {', '.join(PROFILE_CHOICES)})")
+        self.codec = codec
+        self.bitrate = str(bitrate)
+
+    def __repr__(self):
+        return f"OutputProfile({self.codec!r}, {self.bitrate!r})"
+
+    @property
+    def format_selector(self):
+        return FORMAT_SELECTORS[self.codec]
+
+    @property
+    def extension(self):
+        """Extensão de saída; None em 'best', que depende da origem."""
+        return CODECS[self.codec]["ext"] if self.codec in CODECS else None
+
+    def plan(self, acodec, transcode=False):
+        """Retorna ('copy' | 'transcode', extensão) para o codec de origem.
+
+        Com `transcode`, recodifica mesmo quando a cópia seria possível
+        (ex.: normalização de volume).
+        """
+        if transcode:
+            return "transcode", CODECS[self.transcode_codec]["ext"]
+        source = normalize_acodec(acodec)
+        if self.codec == "best":
+            if source in NATIVE_EXT:
+                return "copy", NATIVE_EXT[source]
+            # Codec sem contêiner de áudio próprio (ex.: PCM): recodificar em MP3
+            return "transcode", CODECS[DEFAULT_CODEC]["ext"]
+        spec = CODECS[self.codec]
+        return ("copy" if source in spec["copy_from"] else "transcode"), spec["ext"]
+
+    @property
+    def transcode_codec(self):
+        # Em "best", o que não pode ser copiado vira MP3 (veja plan())
+        return self.codec if self.codec in CODECS else DEFAULT_CODEC
+
+    def choose_encoder(self, capabilities):
+        """Encoder preferido entre os disponíveis no ffmpeg (FFmpegCapabilities).
+
+        Sem informação de encoders, usa o padrão do codec; retorna None se o
+        ffmpeg não tiver nenhum encoder aceito.
+        """
+        spec = CODECS[self.transcode_codec]
+        if capabilities is None or not capabilities.encoders:
+            return spec["encoder"]
+        return capabilities.pick_encoder(spec["encoders"])
+
+    def ffmpeg_args(self, mode, encoder=None, threads=None):
+        """Argumentos de codec do ffmpeg para o modo escolhido."""
+        if mode == "copy":
+            return ["-c:a", "copy"]
+        args = ["-c:a", encoder or CODECS[self.transcode_codec]["encoder"], "-b:a", f"{self.bitrate}k"]
+        if threads:
+            args += ["-threads", str(threads)]
+        return args
+
+    def output_path(self, raw_path, acodec, transcode=False):
+        """Caminho final e modo ('copy' | 'transcode') para um arquivo baixado."""
+        mode, ext = self.plan(acodec, transcode)
+        return os.path.splitext(raw_path)[0] + "." + ext, mode
+
+    def ydl_postprocessor(self):
+        """FFmpegExtractAudio equivalente, para a conversão dentro do yt-dlp.
+
+        O próprio yt-dlp copia o áudio quando o codec de origem já coincide.
+        """
+        return {
+            "key": "FFmpegExtractAudio",
+            "preferredcodec": "vorbis" if self.codec == "ogg" else self.codec,
+            "preferredquality": self.bitrate,
+        }
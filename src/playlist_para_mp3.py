@@ -1,23 +1,36 @@
 import os
 import re
+import asyncio
 import sys
-import shutil
 import argparse
-from yt_dlp import YoutubeDL
+import multiprocessing
+from download_core import format_throughput
+from metadata_cache import MetadataCache
+from progress import ConsoleProgress
+from segmented_download import SegmentedDownloader, parse_size
+from audio_finish import AudioFinish
+from output_profile import OutputProfile, PROFILE_CHOICES, DEFAULT_CODEC, DEFAULT_BITRATE
+from media_store import STORE_DIRNAME
+from service_client import ServiceClient, ServiceError, SERVICE_URL
+from run_metrics import RunMetrics, format_phase_summary
+from ffmpeg_probe import resolve_ffmpeg
 
-def sanitize_filename(name):
-    """Remove caracteres inválidos para nomes de arquivos."""
-    return re.sub(r'[\\/*?:"<>|]', "", name)
+def check_ffmpeg(profile=None):
+    """Verifica se o FFmpeg está instalado, pois é necessário para a conversão.
 
-def check_ffmpeg():
-    """Verifica se o FFmpeg está instalado, pois é necessário para a conversão."""
-    if shutil.which("ffmpeg") is None:
+    Com `profile`, confere também se há um encoder para o codec de saída.
+    """
+    capabilities = resolve_ffmpeg()
+    if capabilities is None:
         print("-" * 50)
         print("⚠️  ERRO: FFmpeg não encontrado!")
         print("O FFmpeg é obrigatório para converter vídeos em MP3.")
         print("Por favor, instale o FFmpeg e adicione-o ao PATH do seu sistema.")
         print("-" * 50)
         return False
+    if profile is not None and profile.choose_encoder(capabilities) is None:
+        print(f"⚠️  ERRO: o FFmpeg em {capabilities.ffmpeg} não tem encoder para '{profile.transcode_codec}'.")
+        return False
     return True
 
 def is_valid_youtube_url(url):
@@ -28,81 +41,249 @@ def is_valid_youtube_url(url):
     ]
     return any(re.search(pattern, url, re.IGNORECASE) for pattern in youtube_patterns)
 
-def download_playlist_as_mp3(playlist_url):
-    """Baixa todos os vídeos de uma playlist e converte para MP3."""
+def download_playlist_as_mp3(playlist_url, jobs=1, transcode_workers=None, queue_size=None,
+                             use_index=True, verify=False, cache=None, segmented=None, profile=None,
+                             adaptive=False, host_rate=None, retry_failed=False, metrics=None,
+                             stream=False, finish=None):
+    """Baixa todos os vídeos de uma playlist e converte para MP3.
+
+    Com `retry_failed`, só os itens com erro no diário da pasta são processados.
+    Com `metrics` (RunMetrics), as fases de cada item são medidas.
+    Com `stream`, o áudio é convertido durante o download (sem arquivo bruto).
+    Com `finish` (AudioFinish), tags, capa e loudnorm saem na mesma conversão.
+    O download em si roda no DownloadEngine; aqui os eventos viram saída no terminal.
+    """
     
     if not is_valid_youtube_url(playlist_url):
         print("❌ URL inválida! Certifique-se de que é um link do YouTube.")
         return
     
-    if not check_ffmpeg():
+    if not check_ffmpeg(profile or OutputProfile()):
         return
 
+    from download_engine import DownloadOptions
+
     print(f"🔍 Analisando playlist: {playlist_url}")
+    options = DownloadOptions(
+        jobs=jobs, transcode_workers=transcode_workers, queue_size=queue_size,
+        use_index=use_index, verify=verify, cache=cache, segmented=segmented, profile=profile,
+        adaptive=adaptive, host_rate=host_rate, retry_failed=retry_failed, metrics=metrics,
+        stream=stream, finish=finish,
+    )
+    try:
+        finished = asyncio.run(_console_download(playlist_url, options))
+    except KeyboardInterrupt:
+        finished = None
+    if finished is None:
+        # Ctrl+C ou fluxo de eventos encerrado antes do fim da playlist
+        print("-" * 50)
+        print("⏹️  Download cancelado.")
+        return None
 
-    # 1. Obter informações da playlist primeiro para criar a pasta
-    ydl_opts_info = {
-        'extract_flat': True,
-        'quiet': True,
-        'nocheckcertificate': True,
-    }
+    print("-" * 50)
+    print(f"🏁 Processo concluído!")
+    if finished.stats:
+        print(format_throughput(finished.stats))
+    if metrics is not None:
+        print(format_phase_summary(metrics.summary()))
+    if cache is not None:
+        print(cache.summary())
+    if finished.folder:
+        print(f"📂 Seus arquivos de áudio estão em: {os.path.abspath(finished.folder)}")
+    return finished.stats
 
-    try:
-        with YoutubeDL(ydl_opts_info) as ydl:
-            info = ydl.extract_info(playlist_url, download=False)
-            if not info:
-                print("❌ Não foi possível obter informações da playlist.")
-                return
-            
-            playlist_title = info.get('title', 'Musicas_Youtube')
-            entries = info.get('entries', [])
-            total_videos = len(entries)
-    except Exception as e:
-        print(f"❌ Erro ao acessar playlist: {e}")
+async def _console_download(playlist_url, options):
+    """Consome os eventos do motor mostrando log e progresso no terminal."""
+    from download_engine import DownloadEngine
+
+    console = ConsoleProgress()
+    finished = None
+    async with DownloadEngine(max_playlists=1) as engine:
+        async for event in engine.download(playlist_url, options):
+            if event.type == 'log':
+                # Com a barra de progresso, a saída de cada item do yt-dlp fica de fora
+                if event.level == 'info':
+                    console.log(event.message)
+                elif event.level != 'debug':
+                    console.log(f"{'WARNING: ' if event.level == 'warning' else ''}{event.message}")
+            elif event.type == 'progress':
+                console.update(event.snapshot)
+            elif event.type == 'started':
+                console.log(f"📂 Pasta de destino: '{event.folder}'")
+                if event.total is not None:
+                    console.log(f"🎵 Total de vídeos encontrados: {event.total}")
+                else:
+                    console.log("🎵 Total de vídeos ainda desconhecido: enumerando enquanto baixa")
+                console.log(f"⚙️  Downloads simultâneos: {max(1, min(options.jobs, event.total or options.jobs))}"
+                            + (" (máximo; ajuste adaptativo)" if options.adaptive else ""))
+                console.log("-" * 50)
+            elif event.type == 'finished':
+                finished = event
+    console.finish()
+    return finished
+
+def read_url_list(source):
+    """Lê URLs de um arquivo (ou da entrada padrão com '-').
+
+    Linhas vazias e comentários iniciados por '#' são ignorados.
+    """
+    if source == '-':
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(source, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+    urls = []
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith('#') and line not in urls:
+            urls.append(line)
+    return urls
+
+def download_batch(urls, jobs=1, transcode_workers=None, queue_size=None, verify=False,
+                   cache=None, segmented=None, profile=None, store_dir=STORE_DIRNAME,
+                   adaptive=False, host_rate=None, retry_failed=False, metrics=None, stream=False,
+                   finish=None):
+    """Baixa várias playlists de uma vez, sem repetir vídeos em comum.
+
+    Todas as playlists são resolvidas antes; cada vídeo único é baixado uma
+    só vez para o acervo (`store_dir`) e as pastas das playlists recebem
+    hardlinks/reflinks para ele (ou cópias, se o sistema de arquivos não
+    permitir). Com `retry_failed`, só os vídeos com erro no diário do
+    acervo são baixados. O lote roda no DownloadEngine (run_batch); aqui os
+    eventos viram saída no terminal. Retorna um resumo com a taxa de
+    deduplicação.
+    """
+    profile = profile or OutputProfile()
+    if not check_ffmpeg(profile):
         return
 
-    # Criar pasta de destino
-    folder_name = sanitize_filename(playlist_title)
-    if not os.path.exists(folder_name):
-        os.makedirs(folder_name)
-    
-    print(f"📂 Pasta de destino: '{folder_name}'")
-    print(f"🎵 Total de vídeos encontrados: {total_videos}")
-    print("-" * 50)
+    valid = []
+    for url in urls:
+        if is_valid_youtube_url(url):
+            valid.append(url)
+        else:
+            print(f"❌ URL inválida, ignorada: {url}")
 
-    # 2. Configurações para download e conversão
-    # Usamos '%(playlist_index)s' para manter a ordem da playlist nos arquivos
-    ydl_opts = {
-        'format': 'bestaudio/best',
-        'outtmpl': f'{folder_name}/%(playlist_index)s - %(title)s.%(ext)s',
-        'postprocessors': [{
-            'key': 'FFmpegExtractAudio',
-            'preferredcodec': 'mp3',
-            'preferredquality': '192', # Qualidade padrão (192kbps)
-        }],
-        'quiet': False, # Mostrar progresso
-        'no_warnings': True,
-        'ignoreerrors': True, # Pular vídeos com erro (privados/deletados)
-        'nocheckcertificate': True,
-    }
+    from download_engine import DownloadOptions
 
+    options = DownloadOptions(
+        jobs=jobs, transcode_workers=transcode_workers, queue_size=queue_size, verify=verify,
+        cache=cache, segmented=segmented, profile=profile, adaptive=adaptive, host_rate=host_rate,
+        stream=stream, finish=finish, metrics=metrics, retry_failed=retry_failed, store_dir=store_dir,
+    )
     try:
-        with YoutubeDL(ydl_opts) as ydl:
-            ydl.download([playlist_url])
-    except Exception as e:
-        print(f"❌ Ocorreu um erro durante o download: {e}")
+        finished = asyncio.run(_console_batch(valid, options))
+    except KeyboardInterrupt:
+        finished = None
+    if finished is None or finished.status == 'cancelled':
+        print("-" * 50)
+        print("⏹️  Download cancelado.")
+        return None
 
+    summary = finished.summary
     print("-" * 50)
     print(f"🏁 Processo concluído!")
-    print(f"📂 Seus arquivos MP3 estão em: {os.path.abspath(folder_name)}")
+    if summary['download']:
+        print(format_throughput(summary['download']))
+    print(format_dedup_summary(summary))
+    if metrics is not None:
+        print(format_phase_summary(metrics.summary()))
+    if cache is not None:
+        print(cache.summary())
+    return summary
+
+async def _console_batch(urls, options):
+    """Consome os eventos de um lote do motor mostrando log e progresso no terminal."""
+    from download_engine import DownloadEngine
+
+    console = ConsoleProgress()
+    finished = None
+    async with DownloadEngine(max_playlists=1) as engine:
+        async for event in engine.download(urls, options):
+            if event.type == 'log':
+                if event.level == 'info':
+                    console.log(event.message)
+                elif event.level != 'debug':
+                    console.log(f"{'WARNING: ' if event.level == 'warning' else ''}{event.message}")
+            elif event.type == 'progress':
+                console.update(event.snapshot)
+            elif event.type == 'finished' and event.status == 'done':
+                result = event.stats
+                console.log(f"📂 '{os.path.basename(event.folder)}': {result['linked']} item(ns)"
+                            + (f", {result['missing']} indisponível(is)" if result['missing'] else ""))
+            elif event.type == 'batch':
+                finished = event
+    console.finish()
+    return finished
+
+def format_dedup_summary(summary):
+    """Formata o resultado da deduplicação do modo lote."""
+    methods = ", ".join(f"{count} {method}" for method, count in sorted(summary['methods'].items()))
+    return (
+        f"🔗 Deduplicação: {summary['references']} item(ns) / {summary['unique']} único(s) "
+        f"= {summary['dedup_ratio']:.2f}x | {summary['bytes_saved'] / (1024 * 1024):.1f} MB economizados"
+        + (f" ({methods})" if methods else "")
+    )
+
+def download_via_service(playlist_url, service_url=SERVICE_URL, jobs=1, profile=None):
+    """Envia a playlist ao serviço de downloads e acompanha o progresso.
+
+    Ctrl+C apenas deixa de acompanhar: o trabalho continua no serviço.
+    """
+    if not is_valid_youtube_url(playlist_url):
+        print("❌ URL inválida! Certifique-se de que é um link do YouTube.")
+        return
+
+    profile = profile or OutputProfile()
+    client = ServiceClient(service_url)
+    try:
+        job_id = client.submit(playlist_url, os.path.abspath(os.getcwd()), jobs=jobs,
+                               codec=profile.codec, bitrate=profile.bitrate)
+    except ServiceError as e:
+        print(f"❌ {e}")
+        return
+    print(f"🛰️  Trabalho {job_id} enviado ao serviço em {service_url}")
+
+    console = ConsoleProgress()
+    final = None
+    try:
+        for event in client.events(job_id):
+            if event['type'] == 'log':
+                console.log(event['message'])
+            elif event['type'] == 'progress':
+                console.update(event['snapshot'])
+            elif event['type'] == 'status':
+                final = event
+    except KeyboardInterrupt:
+        console.finish()
+        print(f"\n⏸️  Acompanhamento interrompido; o trabalho {job_id} continua no serviço.")
+        return
+    except ServiceError as e:
+        console.log(f"❌ {e}")
+    console.finish()
+
+    if final is not None:
+        print("-" * 50)
+        print(f"🏁 Trabalho {job_id}: {final['status']}")
+        if final.get('error'):
+            print(f"❌ {final['error']}")
+        if final.get('folder'):
+            print(f"📂 Seus arquivos de áudio estão em: {final['folder']}")
+        return final.get('stats')
 
 if __name__ == "__main__":
+    # Necessário para o pool de conversão em executáveis (PyInstaller)
+    multiprocessing.freeze_support()
+
     parser = argparse.ArgumentParser(
         description="Baixa playlists do YouTube e converte para MP3.",
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog="""
 Exemplos de uso:
   python playlist_para_mp3.py "https://www.youtube.com/playlist?list=PLxxxxxx"
+  python playlist_para_mp3.py --jobs 4 "https://www.youtube.com/playlist?list=PLxxxxxx"
+  python playlist_para_mp3.py --batch playlists.txt
+  cat playlists.txt | python playlist_para_mp3.py --batch -
   python playlist_para_mp3.py  # Para input interativo
         """
     )
@@ -112,15 +293,196 @@ Exemplos de uso:
         default=None,
         help="URL da playlist do YouTube"
     )
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=1,
+        help="Número de vídeos baixados simultaneamente (padrão: 1)"
+    )
+    parser.add_argument(
+        "--codec",
+        choices=PROFILE_CHOICES,
+        default=DEFAULT_CODEC,
+        help="Formato de saída; 'best' mantém o codec original sem recodificar (padrão: mp3)"
+    )
+    parser.add_argument(
+        "--bitrate",
+        default=DEFAULT_BITRATE,
+        help="Bitrate em kbps quando for preciso recodificar (padrão: 192)"
+    )
+    parser.add_argument(
+        "-t", "--transcode-workers",
+        type=int,
+        default=None,
+        help="Processos de conversão para MP3 (padrão: nº de núcleos; 0 converte dentro do yt-dlp)"
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=None,
+        help="Tamanho máximo da fila entre download e conversão (padrão: 2x processos)"
+    )
+    parser.add_argument(
+        "--no-index",
+        action="store_true",
+        help="Ignora o índice da pasta e baixa todos os itens novamente"
+    )
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="Confere o hash SHA-256 dos arquivos já indexados antes de pulá-los"
+    )
+    parser.add_argument(
+        "--refresh-metadata",
+        action="store_true",
+        help="Ignora o cache de metadados e extrai playlist e vídeos novamente"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Desativa o cache de metadados em disco"
+    )
+    parser.add_argument(
+        "--segments",
+        type=int,
+        default=0,
+        help="Conexões paralelas por arquivo grande (download segmentado; padrão: desativado)"
+    )
+    parser.add_argument(
+        "--segment-size",
+        type=parse_size,
+        default="4M",
+        help="Tamanho de cada segmento, ex.: 4M, 512K (padrão: 4M)"
+    )
+    parser.add_argument(
+        "--segment-threshold",
+        type=parse_size,
+        default="50M",
+        help="Só segmenta arquivos a partir deste tamanho (padrão: 50M)"
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Converte enquanto baixa, enviando o áudio direto ao ffmpeg (sem arquivo bruto intermediário)"
+    )
+    parser.add_argument(
+        "--loudnorm",
+        action="store_true",
+        help="Normaliza o volume (EBU R128, -16 LUFS) na mesma passada da conversão"
+    )
+    parser.add_argument(
+        "--no-tags",
+        action="store_true",
+        help="Não grava título, artista, álbum e faixa nos arquivos"
+    )
+    parser.add_argument(
+        "--no-cover",
+        action="store_true",
+        help="Não embute a miniatura do vídeo como capa (MP3/M4A)"
+    )
+    parser.add_argument(
+        "--adaptive",
+        action="store_true",
+        help="Ajusta os downloads simultâneos pela vazão e por erros 429/403 (--jobs vira o máximo)"
+    )
+    parser.add_argument(
+        "--max-rate",
+        type=float,
+        default=None,
+        help="Máximo de itens iniciados por segundo em cada host (padrão: sem limite)"
+    )
+    parser.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help="Processa só os itens que falharam na última execução (diário da pasta)"
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="ARQUIVO",
+        default=None,
+        help="Grava a duração das fases de cada item em um arquivo JSON Lines"
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="Expõe as métricas no formato Prometheus em http://127.0.0.1:PORTA/metrics durante a execução"
+    )
+    parser.add_argument(
+        "--service",
+        nargs="?",
+        const=SERVICE_URL,
+        default=None,
+        metavar="URL",
+        help=f"Envia o download ao serviço em segundo plano (padrão: {SERVICE_URL})"
+    )
+    parser.add_argument(
+        "--batch",
+        metavar="ARQUIVO",
+        default=None,
+        help="Arquivo com uma URL por linha ('-' lê da entrada padrão); vídeos repetidos são baixados uma vez"
+    )
+    parser.add_argument(
+        "--store",
+        default=STORE_DIRNAME,
+        help=f"Pasta do acervo deduplicado usado no modo lote (padrão: {STORE_DIRNAME})"
+    )
     
     args = parser.parse_args()
-    
+
+    cache = None if args.no_cache else MetadataCache(refresh=args.refresh_metadata)
+    segmented = None
+    if args.segments > 0:
+        segmented = SegmentedDownloader(
+            connections=args.segments, segment_size=args.segment_size,
+            threshold=args.segment_threshold, verify=False,  # como 'nocheckcertificate'
+        )
+    profile = OutputProfile(args.codec, args.bitrate)
+    finish = AudioFinish(tags=not args.no_tags, cover=not args.no_cover, loudnorm=args.loudnorm)
+    finish = finish if finish.enabled else None
+    metrics = None
+    if args.trace or args.metrics_port:
+        metrics = RunMetrics(trace_path=args.trace)
+        if args.metrics_port:
+            port = metrics.serve(args.metrics_port)
+            print(f"📈 Métricas em http://127.0.0.1:{port}/metrics")
+
+    if args.batch:
+        urls = read_url_list(args.batch)
+        if urls:
+            download_batch(
+                urls, jobs=args.jobs,
+                transcode_workers=args.transcode_workers, queue_size=args.queue_size,
+                verify=args.verify, cache=cache, segmented=segmented, profile=profile,
+                store_dir=args.store, adaptive=args.adaptive, host_rate=args.max_rate,
+                retry_failed=args.retry_failed, metrics=metrics, stream=args.stream,
+                finish=finish,
+            )
+        else:
+            print("❌ Nenhuma URL encontrada na lista.")
+        if metrics is not None:
+            metrics.close()
+        sys.exit(0)
+
     if args.url:
         url = args.url.strip()
     else:
         url = input("Insira o link da Playlist do YouTube: ").strip()
     
-    if url:
-        download_playlist_as_mp3(url)
+    if url and args.service:
+        download_via_service(url, args.service, jobs=args.jobs, profile=profile)
+    elif url:
+        download_playlist_as_mp3(
+            url, jobs=args.jobs,
+            transcode_workers=args.transcode_workers, queue_size=args.queue_size,
+            use_index=not args.no_index, verify=args.verify, cache=cache,
+            segmented=segmented, profile=profile,
+            adaptive=args.adaptive, host_rate=args.max_rate,
+            retry_failed=args.retry_failed, metrics=metrics, stream=args.stream,
+            finish=finish,
+        )
     else:
         print("❌ Nenhuma URL fornecida.")
+
+    if metrics is not None:
+        metrics.close()
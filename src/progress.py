@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Progresso agregado do YouTube Downloader.
+Soma bytes, velocidade e ETA de todos os itens (inclusive os baixados em
+paralelo) e notifica a interface em uma taxa limitada.
+"""
+
+import sys
+import time
+import threading
+
+# Atualizações por segundo entregues à interface
+DEFAULT_RATE = 4
+
+
+def format_bytes(size):
+    """Formata um tamanho em bytes de forma legível."""
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}" if unit != "B" else f"{int(size)} B"
+        size /= 1024
+
+
+def format_eta(seconds):
+    """Formata um tempo restante como mm:ss ou hh:mm:ss."""
+    if seconds is None:
+        return "--:--"
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes:02d}:{seconds:02d}"
+
+
+def format_progress(snapshot):
+    """Formata um snapshot de progresso em uma linha de status."""
+    text = f"Item {snapshot['items_done']}/{snapshot['items_total']}"
+    if not snapshot.get("total_known", True):
+        text += "+"  # Playlist ainda sendo enumerada
+    text += f" · {snapshot['fraction']:.0%}"
+    if snapshot["bytes_total"]:
+        text += f" · {format_bytes(snapshot['bytes_done'])}/{format_bytes(snapshot['bytes_total'])}"
+    if snapshot["speed"]:
+        text += f" · {format_bytes(snapshot['speed'])}/s"
+    text += f" · ETA {format_eta(snapshot['eta'])}"
+    return text
+
+
+class ProgressTracker:
+    """Agrega os progress hooks do yt-dlp de vários itens simultâneos.
+
+    `callback(snapshot)` é chamado no máximo `rate` vezes por segundo, além
+    de sempre que um item termina, para não sobrecarregar a interface.
+    Com `total_items=None` (playlist enumerada aos poucos) o total cresce
+    com `add_items()` até `set_total()`. Itens concluídos viram somas, para
+    a memória não crescer com o tamanho da playlist.
+    """
+
+    def __init__(self, total_items, callback=None, rate=DEFAULT_RATE):
+        self.total_known = total_items is not None
+        self.total_items = total_items or 0
+        self.callback = callback
+        self.interval = 1.0 / rate if rate else 0.0
+        self._lock = threading.Lock()
+        self._items = {}
+        self._done = 0
+        # Itens já finalizados: bytes baixados e totais conhecidos
+        self._finished_bytes = 0
+        self._finished_known = 0
+        self._last_emit = 0.0
+        self._fraction = 0.0
+
+    def add_items(self, count):
+        """Acrescenta itens enumerados depois do início."""
+        with self._lock:
+            self.total_items += count
+        self._emit()
+
+    def set_total(self, total_items):
+        """Fixa o total quando a enumeração termina."""
+        with self._lock:
+            self.total_items = total_items
+            self.total_known = True
+        self._emit(force=True)
+
+    def hook(self, d):
+        """Progress hook do yt-dlp."""
+        key = d.get("filename") or (d.get("info_dict") or {}).get("id")
+        with self._lock:
+            item = self._items.setdefault(key, {"done": 0, "total": 0, "speed": 0.0})
+            item["done"] = d.get("downloaded_bytes") or item["done"]
+            item["total"] = d.get("total_bytes") or d.get("total_bytes_estimate") or item["total"]
+            item["speed"] = d.get("speed") or 0.0
+            if d["status"] in ("finished", "error"):
+                if d["status"] == "finished":
+                    item["total"] = item["total"] or item["done"]
+                    item["done"] = item["total"]
+                del self._items[key]
+                self._finished_bytes += item["done"]
+                if item["total"]:
+                    self._finished_known += 1
+        self._emit(force=d["status"] != "downloading")
+
+    def item_done(self):
+        """Marca um item como concluído (com ou sem sucesso)."""
+        with self._lock:
+            self._done += 1
+        self._emit(force=True)
+
+    def snapshot(self):
+        with self._lock:
+            items = [dict(i) for i in self._items.values()]
+            done = self._done
+            finished_bytes, finished_known = self._finished_bytes, self._finished_known
+        bytes_done = finished_bytes + sum(i["done"] for i in items)
+        known = [i["total"] for i in items if i["total"]]
+        speed = sum(i["speed"] for i in items)
+
+        # Itens ainda não iniciados são estimados pela média dos conhecidos
+        known_count = finished_known + len(known)
+        known_bytes = finished_bytes + sum(known)
+        average = known_bytes / known_count if known_count else 0
+        bytes_total = known_bytes + average * max(0, self.total_items - known_count)
+
+        active = sum(min(1.0, i["done"] / i["total"]) for i in items if i["total"])
+        fraction = min(1.0, (done + active) / self.total_items) if self.total_items else 1.0
+        # Itens já baixados mas ainda em conversão não fazem a barra recuar
+        with self._lock:
+            fraction = self._fraction = max(self._fraction, fraction)
+
+        eta = None
+        if speed > 0 and bytes_total:
+            eta = max(0.0, bytes_total - bytes_done) / speed
+        return {
+            "items_done": done,
+            "items_total": self.total_items,
+            "total_known": self.total_known,
+            "bytes_done": bytes_done,
+            "bytes_total": int(bytes_total),
+            "speed": speed,
+            "eta": eta,
+            "fraction": fraction,
+        }
+
+    def _emit(self, force=False):
+        if self.callback is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_emit < self.interval:
+                return
+            self._last_emit = now
+        self.callback(self.snapshot())
+
+
+class ConsoleProgress:
+    """Exibe o progresso agregado em uma única linha do terminal."""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self._width = 0
+        self._lock = threading.Lock()
+
+    def _clear(self):
+        if self._width:
+            self.stream.write("\r" + " " * self._width + "\r")
+            self._width = 0
+
+    def update(self, snapshot):
+        line = format_progress(snapshot)
+        with self._lock:
+            self._clear()
+            self.stream.write(line)
+            self.stream.flush()
+            self._width = len(line)
+
+    def log(self, message):
+        """Imprime uma mensagem sem misturá-la com a linha de progresso."""
+        with self._lock:
+            self._clear()
+            print(message, file=self.stream)
+
+    def finish(self):
+        with self._lock:
+            if self._width:
+                self.stream.write("\n")
+                self._width = 0
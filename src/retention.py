@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""
+Retenção por orçamento de disco do YouTube Downloader.
+Indexa as pastas de playlists baixadas (tamanho, último acesso e última
+sincronização) e remove as menos usadas recentemente até o total caber no
+orçamento, apagando várias pastas em paralelo. Arquivos do acervo do modo
+lote (.media_store) que ficam sem nenhuma playlist também são removidos.
+Com --dry-run só mostra o que seria liberado.
+
+Uso:
+    python src/retention.py --budget 50G --root . --root ~/Downloads --dry-run
+"""
+
+import os
+import sys
+import time
+import shutil
+import sqlite3
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from app_paths import DEFAULT_OUTPUT_DIR
+from download_index import INDEX_FILENAME
+from media_store import STORE_DIRNAME
+from failure_journal import JOURNAL_FILENAME
+from segmented_download import parse_size
+from progress import format_bytes
+
+RETENTION_FILENAME = ".retention.sqlite"
+# Só pastas com o índice ou o diário do downloader são consideradas playlists
+MARKER_FILES = (INDEX_FILENAME, JOURNAL_FILENAME)
+# Pastas em remoção são renomeadas antes, para sumirem de uma vez da biblioteca
+EVICTING_PREFIX = ".evicting-"
+# Pastas usadas há menos tempo que isso não são removidas (sincronização em andamento)
+DEFAULT_MIN_IDLE = 10 * 60
+DEFAULT_WORKERS = 4
+# Raízes sem --root: a pasta atual (CLI) e a pasta de destino padrão da GUI
+DEFAULT_ROOTS = (".", DEFAULT_OUTPUT_DIR)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS folders (
+    name TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    freeable INTEGER NOT NULL,
+    files INTEGER NOT NULL,
+    last_access REAL NOT NULL,
+    last_sync REAL NOT NULL,
+    scanned REAL NOT NULL
+)
+"""
+
+
+class PlaylistFolder:
+    """Uma pasta de playlist e o uso de disco dela."""
+
+    def __init__(self, root, name, size, freeable, files, last_access, last_sync, inodes=None, links=None):
+        self.root = root
+        self.name = name
+        self.size = size
+        # Bytes liberados ao apagar a pasta: arquivos com hardlink no acervo continuam no disco
+        self.freeable = freeable
+        self.files = files
+        self.last_access = last_access
+        self.last_sync = last_sync
+        # (dispositivo, inode) -> tamanho, para não contar hardlinks duas vezes
+        self.inodes = inodes or {}
+        # Mídia da pasta: (dispositivo, inode) -> (nomes nesta pasta, st_nlink);
+        # quando todos os nomes estão em pastas removidas, o arquivo sai do disco
+        self.links = links or {}
+        # Bytes que a remoção desta pasta libera no plano (veja plan_eviction)
+        self.gain = freeable
+
+    def __repr__(self):
+        return f"PlaylistFolder({self.path!r}, {self.size})"
+
+    @property
+    def path(self):
+        return os.path.join(self.root, self.name)
+
+    @property
+    def last_used(self):
+        return max(self.last_access, self.last_sync)
+
+
+def is_playlist_folder(path):
+    return any(os.path.exists(os.path.join(path, marker)) for marker in MARKER_FILES)
+
+
+def scan_folder(root, name):
+    """Mede uma pasta: tamanho, bytes liberáveis, último acesso e última sincronização.
+
+    O último acesso é o maior atime dos arquivos de áudio (players e cópias
+    atualizam o atime; a listagem da pasta, não). A última sincronização é
+    a última gravação no índice ou no diário do downloader.
+    """
+    path = os.path.join(root, name)
+    size = freeable = files = 0
+    last_access = 0.0
+    inodes = {}
+    links = {}
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                stat = os.stat(os.path.join(dirpath, filename))
+            except OSError:
+                continue
+            files += 1
+            size += stat.st_size
+            inode = (stat.st_dev, stat.st_ino)
+            inodes[inode] = stat.st_size
+            if stat.st_nlink <= 1:
+                freeable += stat.st_size
+            # Índice e diário (e os arquivos auxiliares do SQLite) não são mídia
+            if not filename.startswith(MARKER_FILES):
+                links[inode] = (links.get(inode, (0, 0))[0] + 1, stat.st_nlink)
+                last_access = max(last_access, stat.st_atime)
+    markers = [os.path.join(path, marker) for marker in MARKER_FILES]
+    last_sync = max((os.path.getmtime(m) for m in markers if os.path.exists(m)),
+                    default=os.path.getmtime(path))
+    return PlaylistFolder(root, name, size, freeable, files, last_access, last_sync, inodes, links)
+
+
+def scan_store(root):
+    """Arquivos do acervo do modo lote sob `root`: (dispositivo, inode) -> (caminho, tamanho, st_nlink)."""
+    files = {}
+    for dirpath, _, filenames in os.walk(os.path.join(root, STORE_DIRNAME)):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            # O índice do acervo não é mídia: fica mesmo sem playlists
+            if filename not in MARKER_FILES:
+                files[(stat.st_dev, stat.st_ino)] = (path, stat.st_size, stat.st_nlink)
+    return files
+
+
+class RetentionIndex:
+    """Índice SQLite (na raiz da biblioteca) com o uso de cada pasta de playlist."""
+
+    def __init__(self, root):
+        self.root = root
+        self.path = os.path.join(root, RETENTION_FILENAME)
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+    def update(self, folders):
+        """Grava as pastas medidas e esquece as que não existem mais."""
+        now = time.time()
+        previous = {name: last_access for name, last_access in
+                    self._conn.execute("SELECT name, last_access FROM folders")}
+        for folder in folders:
+            # O atime pode regredir (ex.: cópia com preservação de datas); o índice não
+            folder.last_access = max(folder.last_access, previous.get(folder.name, 0.0))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO folders VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (folder.name, folder.size, folder.freeable, folder.files,
+                 folder.last_access, folder.last_sync, now),
+            )
+        current = {folder.name for folder in folders}
+        self._conn.executemany("DELETE FROM folders WHERE name = ?",
+                               [(name,) for name in previous if name not in current])
+        self._conn.commit()
+
+    def forget(self, names):
+        self._conn.executemany("DELETE FROM folders WHERE name = ?", [(name,) for name in names])
+        self._conn.commit()
+
+
+def scan_library(roots, workers=DEFAULT_WORKERS):
+    """Mede em paralelo as pastas de playlist das raízes e atualiza o índice de cada uma."""
+    candidates = []
+    for root in roots:
+        if not os.path.isdir(root):
+            continue
+        for entry in os.scandir(root):
+            if entry.name.startswith(".") or not entry.is_dir(follow_symlinks=False):
+                continue
+            if is_playlist_folder(entry.path):
+                candidates.append((root, entry.name))
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        folders = list(executor.map(lambda item: scan_folder(*item), candidates))
+
+    for root in roots:
+        if not os.path.isdir(root):
+            continue
+        index = RetentionIndex(root)
+        try:
+            index.update([folder for folder in folders if folder.root == root])
+        finally:
+            index.close()
+    return folders
+
+
+def library_usage(folders):
+    """Bytes ocupados pelas pastas, contando uma vez arquivos com vários hardlinks."""
+    sizes = {}
+    for folder in folders:
+        sizes.update(folder.inodes)
+    return sum(sizes.values())
+
+
+def plan_eviction(folders, budget, min_idle=DEFAULT_MIN_IDLE, now=None, store=None):
+    """Escolhe as pastas a remover, das menos usadas para as mais usadas.
+
+    Um arquivo só sai do disco quando todos os seus hardlinks estão em
+    pastas removidas; o que sobra só no acervo (`store`, de scan_store)
+    também é removido. Pastas cuja remoção não libera nada (arquivos
+    ligados a playlists mantidas) ficam fora do plano. Retorna (pastas a
+    remover, uso atual, uso após a remoção, arquivos do acervo a remover).
+    Pastas usadas há menos de `min_idle` segundos nunca entram na lista.
+    """
+    now = now or time.time()
+    store = store or {}
+    # Arquivos do acervo que já não têm nenhuma playlist
+    orphans = {inode: entry for inode, entry in store.items() if entry[2] <= 1}
+    usage = library_usage(folders) + sum(size for _, size, _ in orphans.values())
+    remaining = usage - sum(size for _, size, _ in orphans.values())
+    removed_links = {}
+    freed = set(orphans)
+    evict = []
+    for folder in sorted(folders, key=lambda f: f.last_used):
+        if remaining <= budget:
+            break
+        if now - folder.last_used < min_idle:
+            continue
+        # Índice e diário da pasta saem com ela
+        folder.gain = sum(size for inode, size in folder.inodes.items() if inode not in folder.links)
+        remaining -= folder.gain
+        for inode, (count, nlink) in folder.links.items():
+            removed_links[inode] = removed_links.get(inode, 0) + count
+            left = nlink - removed_links[inode]
+            if inode in freed or left > (1 if inode in store else 0):
+                continue
+            freed.add(inode)
+            size = folder.inodes[inode]
+            if left:
+                # Só o acervo ainda aponta para o arquivo: removido junto
+                orphans[inode] = store[inode]
+            else:
+                folder.gain += size
+            remaining -= size
+        evict.append(folder)
+    # Sem nenhuma mídia liberada, apagar a pasta só perderia a playlist
+    kept = [folder for folder in evict if any(inode in freed for inode in folder.links)]
+    remaining += sum(folder.gain for folder in evict if folder not in kept)
+    evict = kept
+    return evict, usage, remaining, sorted(path for path, _, _ in orphans.values())
+
+
+def _remove_tree(path):
+    """Renomeia e apaga uma pasta; retorna o erro ou None."""
+    root, name = os.path.split(path)
+    doomed = os.path.join(root, EVICTING_PREFIX + name)
+    try:
+        os.replace(path, doomed)
+    except OSError as e:
+        return e
+    try:
+        shutil.rmtree(doomed)
+    except OSError as e:
+        return e
+    return None
+
+
+def evict(folders, store_files=(), workers=DEFAULT_WORKERS, log=print):
+    """Apaga as pastas em paralelo e depois os arquivos do acervo que ficaram sem playlist.
+
+    Retorna (bytes liberados, pastas com erro).
+    """
+    freed = 0
+    failed = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for folder, error in zip(folders, executor.map(lambda f: _remove_tree(f.path), folders)):
+            if error is None:
+                freed += folder.gain
+                log(f"    Removido: {folder.path} ({format_bytes(folder.gain)})")
+            else:
+                failed.append(folder)
+                log(f"    Erro ao remover {folder.path}: {error}")
+    for path in store_files:
+        try:
+            stat = os.stat(path)
+            # Uma pasta que não pôde ser removida ainda aponta para o arquivo
+            if stat.st_nlink > 1:
+                continue
+            os.remove(path)
+        except OSError as e:
+            log(f"    Erro ao remover {path}: {e}")
+            continue
+        freed += stat.st_size
+    removed = [folder for folder in folders if folder not in failed]
+    for root in {folder.root for folder in removed}:
+        index = RetentionIndex(root)
+        try:
+            index.forget([folder.name for folder in removed if folder.root == root])
+        finally:
+            index.close()
+    return freed, failed
+
+
+def finish_interrupted(roots, log=print):
+    """Termina remoções interrompidas (pastas '.evicting-*' de uma execução anterior)."""
+    for root in roots:
+        if not os.path.isdir(root):
+            continue
+        for entry in os.scandir(root):
+            if entry.name.startswith(EVICTING_PREFIX) and entry.is_dir(follow_symlinks=False):
+                log(f"    Concluindo remoção interrompida: {entry.path}")
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def format_age(seconds):
+    """Formata um intervalo como '3d', '5h' ou '12min'."""
+    if seconds >= 86400:
+        return f"{seconds / 86400:.0f}d"
+    if seconds >= 3600:
+        return f"{seconds / 3600:.0f}h"
+    return f"{seconds / 60:.0f}min"
+
+
+def format_report(plan, budget, now=None):
+    """Relatório do que seria (ou foi) removido."""
+    now = now or time.time()
+    evict_list, usage, remaining, store_files = plan
+    lines = [f"💾 Uso atual: {format_bytes(usage)} | orçamento: {format_bytes(budget)}"]
+    if not evict_list and not store_files:
+        lines.append("✅ Dentro do orçamento: nada a remover." if usage <= budget
+                     else "⚠️  Acima do orçamento, mas nenhuma pasta ociosa libera espaço.")
+        return "\n".join(lines)
+    for folder in evict_list:
+        shared = folder.size - folder.gain
+        lines.append(
+            f"    🗑️  {folder.path}: {format_bytes(folder.gain)}"
+            + (f" (+{format_bytes(shared)} em hardlinks)" if shared else "")
+            + f", sem uso há {format_age(now - folder.last_used)}"
+        )
+    if store_files:
+        lines.append(f"    🗑️  Acervo: {len(store_files)} arquivo(s) sem nenhuma playlist")
+    lines.append(f"📉 Libera {format_bytes(usage - remaining)} em {len(evict_list)} pasta(s); "
+                 f"uso final: {format_bytes(remaining)}")
+    if remaining > budget:
+        lines.append("⚠️  O orçamento não é atingido só com as pastas ociosas.")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Remove as playlists menos usadas até o uso de disco caber no orçamento.")
+    parser.add_argument("--budget", type=parse_size, default=0,
+                        help="Orçamento de disco, ex.: 50G, 500M (padrão: 0, remove todas as ociosas)")
+    parser.add_argument("--root", action="append", default=None,
+                        help="Pasta com as playlists (repetível; padrão: pasta atual e ~/Downloads)")
+    parser.add_argument("--min-idle", type=float, default=DEFAULT_MIN_IDLE / 60,
+                        help=f"Minutos sem uso para uma pasta poder ser removida (padrão: {DEFAULT_MIN_IDLE // 60})")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Pastas medidas/apagadas em paralelo (padrão: {DEFAULT_WORKERS})")
+    parser.add_argument("--dry-run", action="store_true", help="Só mostra o que seria removido")
+    args = parser.parse_args(argv)
+
+    roots = [os.path.abspath(os.path.expanduser(root)) for root in (args.root or DEFAULT_ROOTS)]
+    # Sem repetir raízes (ex.: executado de dentro de ~/Downloads) nem listar as inexistentes
+    roots = [root for i, root in enumerate(roots) if root not in roots[:i] and os.path.isdir(root)]
+    print("[*] Indexando pastas de playlists...")
+    if not args.dry_run:
+        finish_interrupted(roots)
+    folders = scan_library(roots, workers=args.workers)
+    print(f"    {len(folders)} pasta(s) em {', '.join(roots)}")
+
+    store = {}
+    for root in roots:
+        store.update(scan_store(root))
+    plan = plan_eviction(folders, args.budget, min_idle=args.min_idle * 60, store=store)
+    print(format_report(plan, args.budget))
+    if args.dry_run or not (plan[0] or plan[3]):
+        if args.dry_run and (plan[0] or plan[3]):
+            print("[!] Simulação (--dry-run): nada foi removido.")
+        return 0
+
+    start = time.perf_counter()
+    freed, failed = evict(plan[0], plan[3], workers=args.workers)
+    print(f"[✓] Limpeza concluída! {format_bytes(freed)} liberados em "
+          f"{len(plan[0]) - len(failed)} pasta(s) ({time.perf_counter() - start:.1f}s)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
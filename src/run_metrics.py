@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Métricas por item e por execução do YouTube Downloader.
+Cada item tem a duração de cada fase (metadados, primeiro byte, download,
+conversão e finalização) gravada em um trace JSON Lines; as durações são
+agregadas em histogramas da execução, exportáveis no formato texto do
+Prometheus (opcionalmente por um endpoint HTTP local), junto com o limite
+de downloads simultâneos e as mudanças feitas pelo controle adaptativo.
+"""
+
+import json
+import time
+import uuid
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+PHASES = ("metadata", "first_byte", "download", "encode", "finalize")
+
+PHASE_LABELS = {
+    "metadata": "metadados",
+    "first_byte": "1º byte",
+    "download": "download",
+    "encode": "conversão",
+    "finalize": "finalização",
+}
+
+# Limites superiores dos buckets dos histogramas, em segundos
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+METRIC_PREFIX = "ytdl"
+
+
+class Histogram:
+    """Histograma cumulativo (estilo Prometheus) que também guarda os valores.
+
+    Os valores brutos permitem percentis exatos no resumo da execução.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.values = []
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.values.append(value)
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    @property
+    def count(self):
+        return len(self.values)
+
+    def quantile(self, q):
+        if not self.values:
+            return None
+        ordered = sorted(self.values)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 4),
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "max": max(self.values) if self.values else None,
+        }
+
+
+class ItemTrace:
+    """Durações das fases de uma tentativa de download de um item."""
+
+    def __init__(self, video_id=None, index=None, title=None, attempt=1):
+        self.video_id = video_id
+        self.index = index
+        self.title = title
+        self.attempt = attempt
+        self.started = time.time()
+        self.phases = {}
+
+    def set(self, phase, seconds):
+        if seconds is not None and seconds >= 0:
+            self.phases[phase] = round(seconds, 4)
+
+
+class RunMetrics:
+    """Coleta os traces dos itens, agrega histogramas e grava o JSONL.
+
+    Seguro para uso por várias threads (workers e pipeline de conversão).
+    """
+
+    def __init__(self, trace_path=None, buckets=DEFAULT_BUCKETS):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.trace_path = trace_path
+        self.started = time.time()
+        self.histograms = {phase: Histogram(buckets) for phase in PHASES}
+        self.items = {}
+        self.bytes = 0
+        self.concurrency = None
+        self.concurrency_changes = {}
+        self._lock = threading.Lock()
+        self._trace = open(trace_path, "a", encoding="utf-8") if trace_path else None
+        self._server = None
+
+    def finish_item(self, trace, status, error=None, nbytes=0):
+        """Registra o resultado de uma tentativa e grava sua linha no trace."""
+        record = {
+            "type": "item",
+            "run": self.run_id,
+            "time": trace.started,
+            "video_id": trace.video_id,
+            "index": trace.index,
+            "title": trace.title,
+            "attempt": trace.attempt,
+            "status": status,
+            "bytes": nbytes,
+            "phases": trace.phases,
+        }
+        if error:
+            record["error"] = error
+        with self._lock:
+            for phase, seconds in trace.phases.items():
+                self.histograms[phase].observe(seconds)
+            self.items[status] = self.items.get(status, 0) + 1
+            self.bytes += nbytes
+            if self._trace is not None:
+                self._trace.write(json.dumps(record, ensure_ascii=False) + "\n")
+                self._trace.flush()
+
+    def record_concurrency(self, limit, reason=None):
+        """Atualiza o limite de downloads simultâneos; `reason` conta uma mudança.
+
+        Compatível com o `on_change` do AdaptiveConcurrency.
+        """
+        with self._lock:
+            self.concurrency = limit
+            if reason is not None:
+                self.concurrency_changes[reason] = self.concurrency_changes.get(reason, 0) + 1
+
+    def summary(self):
+        with self._lock:
+            return {
+                "run": self.run_id,
+                "items": dict(self.items),
+                "bytes": self.bytes,
+                "elapsed": time.time() - self.started,
+                "phases": {phase: h.summary() for phase, h in self.histograms.items() if h.count},
+            }
+
+    def prometheus_text(self):
+        """Exporta contadores e histogramas no formato texto do Prometheus."""
+        name = f"{METRIC_PREFIX}_phase_seconds"
+        lines = [
+            f"# HELP {name} Duração de cada fase por item.",
+            f"# TYPE {name} histogram",
+        ]
+        with self._lock:
+            for phase, h in self.histograms.items():
+                for bound, count in zip(h.buckets, h.counts):
+                    lines.append(f'{name}_bucket{{phase="{phase}",le="{bound}"}} {count}')
+                lines.append(f'{name}_bucket{{phase="{phase}",le="+Inf"}} {h.count}')
+                lines.append(f'{name}_sum{{phase="{phase}"}} {h.sum:.6f}')
+                lines.append(f'{name}_count{{phase="{phase}"}} {h.count}')
+            lines += [
+                f"# HELP {METRIC_PREFIX}_items_total Tentativas de download por desfecho.",
+                f"# TYPE {METRIC_PREFIX}_items_total counter",
+            ]
+            lines += [f'{METRIC_PREFIX}_items_total{{status="{status}"}} {count}'
+                      for status, count in sorted(self.items.items())]
+            lines += [
+                f"# HELP {METRIC_PREFIX}_bytes_total Bytes baixados.",
+                f"# TYPE {METRIC_PREFIX}_bytes_total counter",
+                f"{METRIC_PREFIX}_bytes_total {self.bytes}",
+            ]
+            if self.concurrency is not None:
+                lines += [
+                    f"# HELP {METRIC_PREFIX}_concurrency Limite atual de downloads simultâneos.",
+                    f"# TYPE {METRIC_PREFIX}_concurrency gauge",
+                    f"{METRIC_PREFIX}_concurrency {self.concurrency}",
+                    f"# HELP {METRIC_PREFIX}_concurrency_changes_total Mudanças do limite de concorrência por motivo.",
+                    f"# TYPE {METRIC_PREFIX}_concurrency_changes_total counter",
+                ]
+                lines += [f'{METRIC_PREFIX}_concurrency_changes_total{{reason="{reason}"}} {count}'
+                          for reason, count in sorted(self.concurrency_changes.items())]
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host="127.0.0.1"):
+        """Expõe GET /metrics (formato Prometheus) em uma thread própria."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server.server_address[1]
+
+    def close(self):
+        """Grava o resumo da execução no trace e encerra o endpoint."""
+        summary = self.summary()
+        with self._lock:
+            if self._trace is not None:
+                self._trace.write(json.dumps(dict(summary, type="run"), ensure_ascii=False) + "\n")
+                self._trace.close()
+                self._trace = None
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        return summary
+
+
+def format_phase_summary(summary):
+    """Formata p50/p95/máximo de cada fase em uma linha."""
+    parts = []
+    for phase in PHASES:
+        stats = summary["phases"].get(phase)
+        if stats:
+            parts.append(f"{PHASE_LABELS[phase]} {stats['p50']:.2f}/{stats['p95']:.2f}/{stats['max']:.2f}s")
+    return "⏲️  Fases (p50/p95/máx): " + (" | ".join(parts) if parts else "sem itens medidos")
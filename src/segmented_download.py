@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Download segmentado por faixas de bytes (HTTP Range).
+Divide um arquivo grande em segmentos, baixa-os em um pool de conexões
+persistentes (keep-alive) e grava cada um direto na posição certa de um
+arquivo pré-alocado. Segmentos com falha são refeitos individualmente.
+"""
+
+import os
+import re
+import ssl
+import time
+import queue
+import threading
+import http.client
+from urllib.parse import urlsplit, urljoin
+
+DEFAULT_CONNECTIONS = 8
+DEFAULT_SEGMENT_SIZE = 4 * 1024 * 1024
+DEFAULT_THRESHOLD = 50 * 1024 * 1024
+
+_SIZE_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([kmg]?)i?b?\s*$", re.IGNORECASE)
+
+
+class RangeNotSupported(Exception):
+    """O servidor não informa o tamanho ou não aceita requisições Range."""
+
+
+def parse_size(text):
+    """Converte tamanhos como '4M', '512K' ou '1.5G' em bytes."""
+    match = _SIZE_RE.match(str(text))
+    if not match:
+        raise ValueError(f"Tamanho inválido: {text}")
+    number, unit = float(match[1]), match[2].lower()
+    return int(number * {"": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}[unit])
+
+
+def plan_segments(size, segment_size):
+    """Divide [0, size) em faixas (início, fim) inclusivas."""
+    return [(start, min(start + segment_size, size) - 1) for start in range(0, size, segment_size)]
+
+
+class _Connection:
+    """Conexão HTTP persistente reaproveitada entre segmentos."""
+
+    def __init__(self, url, timeout, verify):
+        self.url = url
+        self.timeout = timeout
+        self.verify = verify
+        self._conn = None
+        self._origin = None
+
+    def _connect(self, parts):
+        origin = (parts.scheme, parts.netloc)
+        if self._conn is not None and origin == self._origin:
+            return self._conn
+        self.close()
+        if parts.scheme == "https":
+            context = ssl.create_default_context()
+            if not self.verify:
+                context.check_hostname = False
+                context.verify_mode = ssl.CERT_NONE
+            self._conn = http.client.HTTPSConnection(parts.netloc, timeout=self.timeout, context=context)
+        else:
+            self._conn = http.client.HTTPConnection(parts.netloc, timeout=self.timeout)
+        self._origin = origin
+        return self._conn
+
+    def request(self, method, headers, max_redirects=5):
+        """Faz a requisição seguindo redirecionamentos; retorna a resposta."""
+        for _ in range(max_redirects + 1):
+            parts = urlsplit(self.url)
+            path = parts.path or "/"
+            if parts.query:
+                path += "?" + parts.query
+            conn = self._connect(parts)
+            try:
+                conn.request(method, path, headers=headers)
+                response = conn.getresponse()
+            except (OSError, http.client.HTTPException):
+                # Conexão keep-alive fechada pelo servidor: reconectar uma vez
+                self.close()
+                conn = self._connect(parts)
+                conn.request(method, path, headers=headers)
+                response = conn.getresponse()
+            if response.status in (301, 302, 303, 307, 308):
+                location = response.getheader("Location")
+                response.read()
+                self.url = urljoin(self.url, location)
+                continue
+            return response
+        raise http.client.HTTPException("Redirecionamentos demais")
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class SegmentedDownloader:
+    """Baixa um arquivo em segmentos paralelos sobre conexões keep-alive.
+
+    `progress(downloaded, total, speed)` é chamado conforme os segmentos
+    avançam. `download()` levanta RangeNotSupported quando o servidor não
+    permite o modo segmentado, para o chamador usar o download normal.
+    """
+
+    def __init__(self, connections=DEFAULT_CONNECTIONS, segment_size=DEFAULT_SEGMENT_SIZE,
+                 threshold=DEFAULT_THRESHOLD, retries=3, timeout=30, verify=True):
+        self.connections = max(1, connections)
+        self.segment_size = max(64 * 1024, segment_size)
+        self.threshold = threshold
+        self.retries = retries
+        self.timeout = timeout
+        self.verify = verify
+
+    def should_segment(self, size):
+        """Só vale a pena segmentar arquivos acima do limite configurado."""
+        return bool(size) and size >= self.threshold
+
+    def probe(self, url, headers=None):
+        """Descobre o tamanho do arquivo e se o servidor aceita Range."""
+        conn = _Connection(url, self.timeout, self.verify)
+        try:
+            response = conn.request("GET", dict(headers or {}, Range="bytes=0-0"))
+            response.read()
+            match = re.match(r"bytes 0-0/(\d+)", response.getheader("Content-Range") or "")
+            if response.status != 206 or not match:
+                raise RangeNotSupported(f"HTTP {response.status} sem Content-Range")
+            return int(match[1])
+        finally:
+            conn.close()
+
+    def download(self, url, dest, size=None, headers=None, progress=None):
+        """Baixa `url` para `dest` e retorna um resumo da execução."""
+        headers = dict(headers or {})
+        size = size or self.probe(url, headers)
+        segments = plan_segments(size, self.segment_size)
+        pending = queue.Queue()
+        for segment in segments:
+            pending.put((segment, 0))
+
+        tmp = dest + ".part"
+        # Pré-alocar o arquivo para que cada segmento grave na sua posição
+        with open(tmp, "wb") as f:
+            f.truncate(size)
+
+        lock = threading.Lock()
+        state = {"downloaded": 0, "retried": 0, "errors": [], "aborted": []}
+        remaining = [len(segments)]
+        start = time.perf_counter()
+
+        def report(amount):
+            with lock:
+                state["downloaded"] += amount
+                done = state["downloaded"]
+            if progress is not None:
+                elapsed = time.perf_counter() - start
+                progress(done, size, done / elapsed if elapsed > 0 else None)
+
+        def fetch(conn, f, first, last):
+            response = conn.request("GET", dict(headers, Range=f"bytes={first}-{last}"))
+            if response.status != 206:
+                response.read()
+                raise http.client.HTTPException(f"HTTP {response.status} no segmento {first}-{last}")
+            f.seek(first)
+            received = 0
+            while True:
+                chunk = response.read(64 * 1024)
+                if not chunk:
+                    break
+                f.write(chunk)
+                received += len(chunk)
+                report(len(chunk))
+            if received != last - first + 1:
+                report(-received)
+                raise http.client.IncompleteRead(b"", last - first + 1 - received)
+
+        def worker():
+            conn = _Connection(url, self.timeout, self.verify)
+            try:
+                with open(tmp, "r+b") as f:
+                    while True:
+                        with lock:
+                            if not remaining[0] or state["errors"] or state["aborted"]:
+                                break
+                        try:
+                            (first, last), attempt = pending.get(timeout=0.1)
+                        except queue.Empty:
+                            continue
+                        try:
+                            fetch(conn, f, first, last)
+                        except (OSError, http.client.HTTPException) as e:
+                            conn.close()
+                            if attempt >= self.retries:
+                                with lock:
+                                    state["errors"].append(f"{first}-{last}: {e}")
+                                break
+                            with lock:
+                                state["retried"] += 1
+                            time.sleep(min(0.5 * 2 ** attempt, 5))
+                            pending.put(((first, last), attempt + 1))
+                            continue
+                        with lock:
+                            remaining[0] -= 1
+            except BaseException as e:
+                # Ex.: DownloadCancelled levantado pelo hook de progresso; é
+                # relançado pela thread principal depois do join
+                with lock:
+                    state["aborted"].append(e)
+            finally:
+                conn.close()
+
+        threads = [threading.Thread(target=worker, daemon=True)
+                   for _ in range(min(self.connections, len(segments)))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if state["aborted"] or state["errors"] or remaining[0]:
+            # Nunca promover um arquivo incompleto
+            os.remove(tmp)
+            if state["aborted"]:
+                raise state["aborted"][0]
+            if state["errors"]:
+                raise OSError(f"Falha no download segmentado: {state['errors'][0]}")
+            raise OSError(f"Falha no download segmentado: {remaining[0]} segmento(s) não baixado(s)")
+        os.replace(tmp, dest)
+        elapsed = time.perf_counter() - start
+        return {
+            "size": size,
+            "segments": len(segments),
+            "connections": len(threads),
+            "retried": state["retried"],
+            "elapsed": elapsed,
+        }
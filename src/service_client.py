@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Cliente da API HTTP local do serviço de downloads.
+Usado pela CLI e pela GUI para enviar trabalhos ao serviço em segundo
+plano e acompanhar o progresso. Só depende da biblioteca padrão, para não
+pesar na inicialização da interface.
+"""
+
+import os
+import json
+import secrets
+import urllib.error
+import urllib.request
+
+from app_paths import user_config_dir
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+SERVICE_URL = f"http://{DEFAULT_HOST}:{DEFAULT_PORT}"
+
+# O serviço envia um "heartbeat" no fluxo de eventos a cada HEARTBEAT_SEC
+HEARTBEAT_SEC = 15
+STREAM_TIMEOUT = 4 * HEARTBEAT_SEC
+
+# Token da instalação (pasta de configuração do usuário), exigido pela API
+TOKEN_FILENAME = "service_token"
+
+# Estados em que um trabalho não muda mais
+FINAL_STATUSES = ("done", "failed", "cancelled")
+
+
+class ServiceError(Exception):
+    """Erro retornado pela API do serviço (ou serviço inacessível)."""
+
+
+def token_path():
+    return os.path.join(user_config_dir("service"), TOKEN_FILENAME)
+
+
+def read_token():
+    """Token da instalação, ou None se o serviço nunca rodou neste usuário."""
+    try:
+        with open(token_path(), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def ensure_token():
+    """Lê o token da instalação, criando-o (legível só pelo usuário) na primeira vez."""
+    token = read_token()
+    if token:
+        return token
+    token = secrets.token_urlsafe(32)
+    fd = os.open(token_path(), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(token)
+    return token
+
+
+class ServiceClient:
+    """Acesso à API JSON do serviço de downloads em `base_url`.
+
+    `token` autentica as requisições; por padrão é o token da instalação.
+    """
+
+    def __init__(self, base_url=SERVICE_URL, timeout=5, token=None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.token = token or read_token()
+
+    def _request(self, method, path, payload=None, stream=False):
+        headers = {}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        if method == "POST":
+            payload = payload if payload is not None else {}
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        if data is not None:
+            headers["Content-Type"] = "application/json"
+        request = urllib.request.Request(self.base_url + path, data=data, method=method, headers=headers)
+        try:
+            return urllib.request.urlopen(request, timeout=STREAM_TIMEOUT if stream else self.timeout)
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read().decode("utf-8")).get("error")
+            except ValueError:
+                message = None
+            raise ServiceError(message or f"HTTP {e.code}")
+        except (urllib.error.URLError, OSError) as e:
+            raise ServiceError(f"Serviço indisponível em {self.base_url}: {e}")
+
+    def _json(self, method, path, payload=None):
+        with self._request(method, path, payload) as response:
+            return json.loads(response.read().decode("utf-8"))
+
+    def available(self):
+        """Retorna True se o serviço estiver respondendo."""
+        try:
+            return bool(self._json("GET", "/health").get("ok"))
+        except ServiceError:
+            return False
+
+    def submit(self, url, output_dir, jobs=1, codec=None, bitrate=None):
+        """Enfileira uma playlist e retorna o ID do trabalho."""
+        payload = {"url": url, "output_dir": output_dir, "jobs": jobs}
+        if codec:
+            payload["codec"] = codec
+        if bitrate:
+            payload["bitrate"] = str(bitrate)
+        return self._json("POST", "/jobs", payload)["id"]
+
+    def jobs(self):
+        return self._json("GET", "/jobs")["jobs"]
+
+    def job(self, job_id):
+        return self._json("GET", f"/jobs/{job_id}")
+
+    def cancel(self, job_id):
+        return self._json("POST", f"/jobs/{job_id}/cancel")
+
+    def events(self, job_id):
+        """Gera os eventos do trabalho (log, progresso e estado) até o fim.
+
+        O último evento é sempre do tipo 'status' com um estado final.
+        """
+        with self._request("GET", f"/jobs/{job_id}/events", stream=True) as response:
+            for line in response:
+                line = line.strip()
+                if not line:
+                    continue
+                event = json.loads(line.decode("utf-8"))
+                if event["type"] != "heartbeat":
+                    yield event
@@ -0,0 +1,546 @@
+#!/usr/bin/env python3
+"""
+Download distribuído de playlists grandes do YouTube Downloader.
+O coordenador publica as entradas da playlist em um manifesto SQLite
+compartilhado (ex.: em um sistema de arquivos de rede montado em todas as
+máquinas); cada worker toma itens emprestados com prazo (lease), baixa e
+converte na pasta de destino compartilhada e registra a conclusão. Leases
+de workers que caíram expiram e os itens voltam para os demais.
+
+Uso:
+    python src/sharded_download.py publish /mnt/arquivo/manifest.sqlite "URL" --output-dir /mnt/arquivo
+    python src/sharded_download.py work /mnt/arquivo/manifest.sqlite --jobs 4   # em cada máquina
+    python src/sharded_download.py status /mnt/arquivo/manifest.sqlite
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import sqlite3
+import argparse
+import threading
+import multiprocessing
+
+from output_profile import OutputProfile, PROFILE_CHOICES, DEFAULT_CODEC, DEFAULT_BITRATE
+from adaptive_concurrency import backoff_delay
+
+# Prazo de um lease; o worker o renova a cada terço enquanto está vivo
+LEASE_SECONDS = 120
+# Espera entre consultas quando não há itens livres (leases ainda válidos)
+POLL_INTERVAL = 5
+# Tentativas por item antes de marcá-lo como falha definitiva
+MAX_ATTEMPTS = 3
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS playlists (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    title TEXT,
+    folder TEXT NOT NULL,
+    width INTEGER NOT NULL,
+    options TEXT NOT NULL,
+    enumerated INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS items (
+    playlist_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    video_id TEXT,
+    title TEXT,
+    url TEXT NOT NULL,
+    state TEXT NOT NULL,
+    worker TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    updated REAL,
+    not_before REAL,
+    PRIMARY KEY (playlist_id, position)
+);
+CREATE INDEX IF NOT EXISTS items_state ON items (state, lease_until);
+"""
+
+
+class ShardManifest:
+    """Manifesto compartilhado (SQLite) com as entradas e os leases dos workers.
+
+    Vários processos, em uma ou mais máquinas, abrem o mesmo arquivo; a
+    tomada de itens é uma transação exclusiva, então dois workers nunca
+    recebem o mesmo item com lease válido. Em sistemas de arquivos de rede
+    o SQLite depende do travamento de arquivos do servidor (NFSv4/SMB).
+    """
+
+    def __init__(self, path, timeout=60):
+        self.path = path
+        self._lock = threading.Lock()
+        # Autocommit: transações explícitas só na tomada de itens
+        self._conn = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(_SCHEMA)
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(items)")}
+        if "not_before" not in columns:
+            # Manifesto criado antes da espera entre tentativas
+            self._conn.execute("ALTER TABLE items ADD COLUMN not_before REAL")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params)
+
+    def add_playlist(self, url, title, folder, width, options):
+        """Registra a playlist (ou reaproveita a já publicada com a mesma URL e pasta)."""
+        row = self._execute("SELECT id FROM playlists WHERE url = ? AND folder = ?", (url, folder)).fetchone()
+        if row is not None:
+            self._execute("UPDATE playlists SET options = ?, enumerated = 0 WHERE id = ?",
+                          (json.dumps(options), row["id"]))
+            return row["id"]
+        cursor = self._execute(
+            "INSERT INTO playlists (url, title, folder, width, options, created) VALUES (?, ?, ?, ?, ?, ?)",
+            (url, title, folder, width, json.dumps(options), time.time()),
+        )
+        return cursor.lastrowid
+
+    def add_items(self, playlist_id, items):
+        """Publica (posição, id, título, url); itens já publicados são mantidos."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO items (playlist_id, position, video_id, title, url, state, updated) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(playlist_id, position, video_id, title, url, PENDING, now)
+                     for position, video_id, title, url in items],
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def mark_enumerated(self, playlist_id):
+        self._execute("UPDATE playlists SET enumerated = 1 WHERE id = ?", (playlist_id,))
+
+    def requeue_failed(self, playlist_id):
+        """Devolve as falhas definitivas à fila (nova publicação da playlist)."""
+        return self._execute(
+            "UPDATE items SET state = ?, attempts = 0, error = NULL, not_before = NULL "
+            "WHERE playlist_id = ? AND state = ?",
+            (PENDING, playlist_id, FAILED),
+        ).rowcount
+
+    def playlist(self, playlist_id):
+        row = self._execute("SELECT * FROM playlists WHERE id = ?", (playlist_id,)).fetchone()
+        if row is None:
+            return None
+        playlist = dict(row)
+        playlist["options"] = json.loads(playlist["options"])
+        return playlist
+
+    def next_playlist(self):
+        """ID da primeira playlist com itens disponíveis agora (ou None)."""
+        now = time.time()
+        row = self._execute(
+            "SELECT playlist_id FROM items WHERE (state = ? AND (not_before IS NULL OR not_before <= ?)) "
+            "OR (state = ? AND lease_until < ?) ORDER BY playlist_id, position LIMIT 1",
+            (PENDING, now, LEASED, now),
+        ).fetchone()
+        return row["playlist_id"] if row is not None else None
+
+    def lease(self, worker, count, lease_seconds=LEASE_SECONDS, playlist_id=None):
+        """Toma até `count` itens livres ou com lease vencido para `worker`.
+
+        Itens devolvidos por erro temporário só voltam depois da espera
+        gravada em `not_before`; `playlist_id` restringe a uma playlist.
+        Retorna os itens como dicionários; `previous_worker` indica um
+        item retomado de um worker cujo lease expirou.
+        """
+        now = time.time()
+        where = ("((state = ? AND (not_before IS NULL OR not_before <= ?)) OR (state = ? AND lease_until < ?))"
+                 + (" AND playlist_id = ?" if playlist_id is not None else ""))
+        params = (PENDING, now, LEASED, now) + ((playlist_id,) if playlist_id is not None else ())
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    f"SELECT * FROM items WHERE {where} ORDER BY playlist_id, position LIMIT ?",
+                    params + (count,),
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE items SET state = ?, worker = ?, lease_until = ?, updated = ? "
+                    "WHERE playlist_id = ? AND position = ?",
+                    [(LEASED, worker, now + lease_seconds, now, row["playlist_id"], row["position"])
+                     for row in rows],
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        items = []
+        for row in rows:
+            item = dict(row)
+            item["previous_worker"] = row["worker"] if row["state"] == LEASED else None
+            items.append(item)
+        return items
+
+    def renew(self, worker, lease_seconds=LEASE_SECONDS):
+        """Prorroga os leases ainda mantidos por `worker` (heartbeat)."""
+        return self._execute(
+            "UPDATE items SET lease_until = ? WHERE worker = ? AND state = ?",
+            (time.time() + lease_seconds, worker, LEASED),
+        ).rowcount
+
+    def complete(self, playlist_id, position, worker):
+        """Marca o item como concluído se `worker` ainda detém o lease.
+
+        Retorna False quando o lease foi perdido (venceu e o item foi
+        retomado por outro worker): quem o detém agora registra o desfecho.
+        """
+        return self._execute(
+            "UPDATE items SET state = ?, lease_until = NULL, error = NULL, updated = ? "
+            "WHERE playlist_id = ? AND position = ? AND state = ? AND worker = ?",
+            (DONE, time.time(), playlist_id, position, LEASED, worker),
+        ).rowcount > 0
+
+    def fail(self, playlist_id, position, worker, error, retry=False):
+        """Registra uma falha se `worker` ainda detém o lease (retorna False se não).
+
+        Com `retry`, o item volta à fila até MAX_ATTEMPTS tentativas, com
+        espera exponencial (`not_before`) antes de poder ser tomado de novo.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT attempts FROM items WHERE playlist_id = ? AND position = ? AND state = ? AND worker = ?",
+                (playlist_id, position, LEASED, worker),
+            ).fetchone()
+            if row is None:
+                return False
+            attempts = row["attempts"] + 1
+            now = time.time()
+            if retry and attempts < MAX_ATTEMPTS:
+                state, not_before = PENDING, now + backoff_delay(attempts)
+            else:
+                state, not_before = FAILED, None
+            return self._conn.execute(
+                "UPDATE items SET state = ?, attempts = ?, lease_until = NULL, not_before = ?, error = ?, "
+                "updated = ? WHERE playlist_id = ? AND position = ? AND state = ? AND worker = ?",
+                (state, attempts, not_before, error, now, playlist_id, position, LEASED, worker),
+            ).rowcount > 0
+
+    def release(self, playlist_id, position, worker):
+        """Devolve um item não processado (ex.: worker encerrado) sem contar tentativa."""
+        self._execute(
+            "UPDATE items SET state = ?, worker = NULL, lease_until = NULL "
+            "WHERE playlist_id = ? AND position = ? AND state = ? AND worker = ?",
+            (PENDING, playlist_id, position, LEASED, worker),
+        )
+
+    def counts(self):
+        """Quantidade de itens por estado, somando todas as playlists."""
+        rows = self._execute("SELECT state, COUNT(*) AS n FROM items GROUP BY state").fetchall()
+        counts = {state: 0 for state in (PENDING, LEASED, DONE, FAILED)}
+        counts.update({row["state"]: row["n"] for row in rows})
+        return counts
+
+    def workers(self):
+        """Itens com lease válido por worker."""
+        rows = self._execute(
+            "SELECT worker, COUNT(*) AS n FROM items WHERE state = ? AND lease_until >= ? GROUP BY worker",
+            (LEASED, time.time()),
+        ).fetchall()
+        return {row["worker"]: row["n"] for row in rows}
+
+    def failures(self, limit=20):
+        rows = self._execute(
+            "SELECT position, title, error FROM items WHERE state = ? ORDER BY playlist_id, position LIMIT ?",
+            (FAILED, limit),
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def finished(self):
+        """Tudo publicado e nenhum item pendente ou emprestado."""
+        enumerating = self._execute("SELECT COUNT(*) FROM playlists WHERE enumerated = 0").fetchone()[0]
+        counts = self.counts()
+        return not enumerating and not counts[PENDING] and not counts[LEASED]
+
+
+def format_counts(counts, workers=None):
+    """Formata o andamento do manifesto."""
+    total = sum(counts.values())
+    text = (f"📋 {counts[DONE]}/{total} concluído(s) | {counts[PENDING]} pendente(s) | "
+            f"{counts[LEASED]} em andamento | {counts[FAILED]} falha(s)")
+    if workers:
+        text += " | workers: " + ", ".join(f"{name} ({n})" for name, n in sorted(workers.items()))
+    return text
+
+
+def publish(manifest_path, url, output_dir=".", profile=None, finish=None, cache=None, log=print):
+    """Publica as entradas da playlist no manifesto, página a página.
+
+    Os workers podem começar assim que a primeira página é gravada.
+    Publicar de novo a mesma playlist acrescenta as entradas novas e
+    devolve à fila as que falharam. Retorna o ID da playlist no manifesto.
+    """
+    # Importado aqui para `status` não depender do yt-dlp
+    from download_core import iter_playlist, sanitize_filename, entry_url, _pages, LAZY_WIDTH
+
+    profile = profile or OutputProfile()
+    title, total, entries = iter_playlist(url, cache=cache)
+    if title is None:
+        raise RuntimeError("Não foi possível obter informações da playlist.")
+    folder = os.path.abspath(os.path.join(output_dir, sanitize_filename(title)))
+    os.makedirs(folder, exist_ok=True)
+    # Os workers gravam em paralelo: sem o total, a largura não pode ser ajustada depois
+    width = len(str(total)) if total else LAZY_WIDTH
+    options = {
+        "codec": profile.codec, "bitrate": profile.bitrate,
+        "tags": bool(finish and finish.tags), "cover": bool(finish and finish.cover),
+        "loudnorm": bool(finish and finish.loudnorm),
+    }
+
+    manifest = ShardManifest(manifest_path)
+    try:
+        playlist_id = manifest.add_playlist(url, title, folder, width, options)
+        requeued = manifest.requeue_failed(playlist_id)
+        if requeued:
+            log(f"🔁 {requeued} item(ns) com falha voltaram para a fila")
+        log(f"📂 '{title}' -> {folder}")
+        published = 0
+        for page in _pages(enumerate(entries, start=1)):
+            manifest.add_items(playlist_id, [(position, entry.get('id'), entry.get('title'), entry_url(entry))
+                                             for position, entry in page])
+            published += len(page)
+            log(f"📤 {published}{'/' + str(total) if total else ''} entrada(s) publicada(s)")
+        manifest.mark_enumerated(playlist_id)
+        log(f"🎵 Publicação concluída: {published} entrada(s) em {manifest_path}")
+    finally:
+        manifest.close()
+    return playlist_id
+
+
+class Heartbeat:
+    """Renova os leases do worker periodicamente enquanto ele trabalha."""
+
+    def __init__(self, manifest, worker, lease_seconds=LEASE_SECONDS):
+        self.manifest = manifest
+        self.worker = worker
+        self.lease_seconds = lease_seconds
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.lease_seconds / 3):
+            self.manifest.renew(self.worker, self.lease_seconds)
+
+
+def run_worker(manifest_path, jobs=2, worker=None, lease_seconds=LEASE_SECONDS, output_dir=None,
+               poll=POLL_INTERVAL, transcode_workers=None, cache=None, log=print):
+    """Toma itens do manifesto e os baixa até a playlist terminar.
+
+    Cada playlist é baixada por uma única execução de download_entries
+    (índice, diário, pipeline de conversão e tags como em uma execução
+    local), alimentada com novos leases conforme os downloads liberam
+    vaga. A pasta é a publicada pelo coordenador ou, com `output_dir`, a
+    de mesmo nome sob ele (quando o compartilhamento é montado em outro
+    caminho nesta máquina). Retorna quantos itens o worker concluiu e
+    quantos falharam.
+    """
+    from download_core import (EntryDownload, DownloadSettings, ITEM_DONE, ITEM_INDEXED, ITEM_FAILED,
+                               ITEM_SKIPPED, ITEM_CANCELLED)
+    from audio_finish import AudioFinish
+    from failure_journal import classify_outcome, TRANSIENT_ERROR
+
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    manifest = ShardManifest(manifest_path)
+    heartbeat = Heartbeat(manifest, worker, lease_seconds).start()
+    totals = {'done': 0, 'failed': 0, 'lost': 0}
+    log(f"👷 Worker {worker} | {jobs} download(s) simultâneo(s) | lease de {lease_seconds:.0f}s")
+
+    def run_playlist(playlist):
+        options = playlist["options"]
+        folder = playlist["folder"]
+        if output_dir:
+            folder = os.path.join(output_dir, os.path.basename(folder))
+        os.makedirs(folder, exist_ok=True)
+        finish = AudioFinish(tags=options["tags"], cover=options["cover"], loudnorm=options["loudnorm"])
+        playlist_id = playlist["id"]
+        # Posições com lease deste worker ainda sem desfecho registrado
+        outstanding = set()
+        outstanding_lock = threading.Lock()
+
+        def leases():
+            """Lotes de itens tomados do manifesto, um por vez, enquanto houver itens livres."""
+            while True:
+                items = manifest.lease(worker, jobs, lease_seconds, playlist_id=playlist_id)
+                if not items:
+                    return
+                reassigned = [item for item in items if item['previous_worker']]
+                if reassigned:
+                    owners = ", ".join(sorted({item['previous_worker'] for item in reassigned}))
+                    log(f"♻️  {len(reassigned)} item(ns) retomado(s) de lease expirado ({owners})")
+                with outstanding_lock:
+                    outstanding.update(item['position'] for item in items)
+                yield [(item['position'], {'id': item['video_id'], 'title': item['title'], 'url': item['url']})
+                       for item in items]
+
+        def on_item(index, entry, state, error=None, **_):
+            if state in (ITEM_DONE, ITEM_INDEXED):
+                recorded = manifest.complete(playlist_id, index, worker)
+                outcome = 'done'
+            elif state in (ITEM_FAILED, ITEM_SKIPPED):
+                retry = state == ITEM_FAILED and classify_outcome(error) == TRANSIENT_ERROR
+                recorded = manifest.fail(playlist_id, index, worker, error, retry=retry)
+                outcome = 'failed'
+            elif state == ITEM_CANCELLED:
+                manifest.release(playlist_id, index, worker)
+                recorded, outcome = True, None
+            else:
+                return
+            if not recorded:
+                # Lease vencido e retomado por outro worker: o desfecho fica com ele
+                log(f"⚠️  Lease perdido: {index} - {entry.get('title')} ({outcome})")
+                outcome = 'lost'
+            with outstanding_lock:
+                outstanding.discard(index)
+                if outcome:
+                    totals[outcome] += 1
+
+        settings = DownloadSettings(
+            jobs=jobs, transcode_workers=transcode_workers, cache=cache,
+            profile=OutputProfile(options["codec"], options["bitrate"]),
+            # As novas tentativas ficam a cargo do manifesto (qualquer worker, após a espera)
+            retry_rounds=0, finish=finish if finish.enabled else None, album=playlist["title"],
+        )
+        try:
+            EntryDownload(folder, settings, log=log, on_item=on_item).run_batches(leases(), playlist["width"])
+        finally:
+            for position in sorted(outstanding):
+                manifest.release(playlist_id, position, worker)
+
+    try:
+        while True:
+            playlist_id = manifest.next_playlist()
+            if playlist_id is None:
+                if manifest.finished():
+                    break
+                # Itens com outros workers ou aguardando nova tentativa
+                time.sleep(poll)
+                continue
+            run_playlist(manifest.playlist(playlist_id))
+            log(format_counts(manifest.counts()))
+    finally:
+        heartbeat.stop()
+        manifest.close()
+    log(f"🏁 Worker {worker}: {totals['done']} concluído(s), {totals['failed']} falha(s)"
+        + (f", {totals['lost']} lease(s) perdido(s)" if totals['lost'] else ""))
+    return totals
+
+
+def follow(manifest_path, interval=POLL_INTERVAL, log=print):
+    """Mostra o andamento até todos os itens terminarem."""
+    manifest = ShardManifest(manifest_path)
+    try:
+        while True:
+            log(format_counts(manifest.counts(), manifest.workers()))
+            if manifest.finished():
+                break
+            time.sleep(interval)
+        return manifest.counts()
+    finally:
+        manifest.close()
+
+
+def show_status(manifest_path):
+    manifest = ShardManifest(manifest_path)
+    try:
+        print(format_counts(manifest.counts(), manifest.workers()))
+        for failure in manifest.failures():
+            print(f"   ⚠️  {failure['position']} - {failure['title']}: {failure['error']}")
+    finally:
+        manifest.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Divide o download de uma playlist entre vários processos ou máquinas.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    publish_parser = commands.add_parser("publish", help="Publica as entradas da playlist no manifesto")
+    publish_parser.add_argument("manifest", help="Arquivo SQLite do manifesto (em um caminho compartilhado)")
+    publish_parser.add_argument("url", help="URL da playlist ou canal")
+    publish_parser.add_argument("--output-dir", default=".", help="Destino compartilhado das pastas (padrão: .)")
+    publish_parser.add_argument("--codec", choices=PROFILE_CHOICES, default=DEFAULT_CODEC,
+                                help=f"Formato de saída (padrão: {DEFAULT_CODEC})")
+    publish_parser.add_argument("--bitrate", default=DEFAULT_BITRATE,
+                                help=f"Bitrate em kbps (padrão: {DEFAULT_BITRATE})")
+    publish_parser.add_argument("--loudnorm", action="store_true", help="Normaliza o volume (EBU R128)")
+    publish_parser.add_argument("--no-tags", action="store_true", help="Não grava título/artista/álbum/faixa")
+    publish_parser.add_argument("--no-cover", action="store_true", help="Não embute a miniatura como capa")
+    publish_parser.add_argument("--wait", action="store_true", help="Acompanha o andamento até o fim")
+
+    work_parser = commands.add_parser("work", help="Baixa itens do manifesto até a playlist terminar")
+    work_parser.add_argument("manifest", help="Arquivo SQLite do manifesto")
+    work_parser.add_argument("--jobs", "-j", type=int, default=2, help="Downloads simultâneos neste worker (padrão: 2)")
+    work_parser.add_argument("--lease", type=float, default=LEASE_SECONDS,
+                             help=f"Prazo do lease em segundos (padrão: {LEASE_SECONDS})")
+    work_parser.add_argument("--poll", type=float, default=POLL_INTERVAL,
+                             help=f"Espera entre consultas sem itens livres (padrão: {POLL_INTERVAL}s)")
+    work_parser.add_argument("--output-dir", default=None,
+                             help="Ponto de montagem local do destino, se diferente do publicado")
+    work_parser.add_argument("--transcode-workers", type=int, default=None,
+                             help="Processos de conversão neste worker (padrão: um por núcleo)")
+    work_parser.add_argument("--worker-id", default=None, help="Nome do worker (padrão: host:pid)")
+
+    status_parser = commands.add_parser("status", help="Mostra o andamento do manifesto")
+    status_parser.add_argument("manifest", help="Arquivo SQLite do manifesto")
+    args = parser.parse_args(argv)
+
+    if args.command == "status":
+        show_status(args.manifest)
+        return 0
+
+    from playlist_para_mp3 import check_ffmpeg, is_valid_youtube_url
+    from audio_finish import AudioFinish
+    from metadata_cache import MetadataCache
+
+    if args.command == "publish":
+        if not is_valid_youtube_url(args.url):
+            print("❌ URL inválida! Certifique-se de que é um link do YouTube.")
+            return 1
+        finish = AudioFinish(tags=not args.no_tags, cover=not args.no_cover, loudnorm=args.loudnorm)
+        publish(args.manifest, args.url, args.output_dir, profile=OutputProfile(args.codec, args.bitrate),
+                finish=finish, cache=MetadataCache())
+        if args.wait:
+            counts = follow(args.manifest)
+            return 1 if counts[FAILED] else 0
+        return 0
+
+    if not check_ffmpeg():
+        return 1
+    totals = run_worker(args.manifest, jobs=max(1, args.jobs), worker=args.worker_id,
+                        lease_seconds=args.lease, output_dir=args.output_dir, poll=args.poll,
+                        transcode_workers=args.transcode_workers, cache=MetadataCache())
+    return 1 if totals['failed'] else 0
+
+
+if __name__ == "__main__":
+    # Necessário para o pool de conversão em executáveis (PyInstaller)
+    multiprocessing.freeze_support()
+    sys.exit(main())
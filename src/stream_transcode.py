@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Conversão em streaming para o YouTube Downloader.
+Os bytes do áudio são enviados ao stdin do ffmpeg conforme chegam da rede,
+e o arquivo final fica pronto junto com o fim do download, sem gravar e
+reler um arquivo intermediário. Formatos que o ffmpeg só lê com seek (ex.:
+MP4/M4A com o índice 'moov' no fim) levantam StreamUnsupported, para o
+chamador usar o download normal.
+"""
+
+import os
+import re
+import time
+import struct
+import tempfile
+import subprocess
+import urllib.request
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+CHUNK_SIZE = 64 * 1024
+# Bytes lidos antes de abrir o ffmpeg, para checar se o formato aceita pipe
+PEEK_SIZE = 64 * 1024
+# Contêineres ISO BMFF: só podem vir por pipe com o 'moov' antes do 'mdat'
+MP4_EXTS = ("m4a", "mp4", "mov", "3gp")
+# Content-Range de uma resposta 206; o total pode ser '*' (desconhecido)
+_CONTENT_RANGE_RE = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+
+
+class StreamUnsupported(Exception):
+    """O formato (ou o servidor) não permite converter durante o download."""
+
+
+def _mp4_needs_seeking(head):
+    """True se o 'mdat' vem antes do 'moov' (ou se não for possível saber)."""
+    offset = 0
+    while offset + 8 <= len(head):
+        size, kind = struct.unpack(">I4s", head[offset:offset + 8])
+        if kind == b"moov":
+            return False
+        if kind == b"mdat":
+            return True
+        if size == 1 and offset + 16 <= len(head):
+            size = struct.unpack(">Q", head[offset + 8:offset + 16])[0]
+        if size < 8:
+            return True
+        offset += size
+    return True
+
+
+def _urlopen(url, headers):
+    return urllib.request.urlopen(urllib.request.Request(url, headers=headers or {}), timeout=30)
+
+
+class StreamTranscoder:
+    """Baixa por HTTP direto para o stdin de um ffmpeg.
+
+    `urlopen(url, headers)` abre a requisição (padrão: urllib); o chamador
+    pode usar a sessão do yt-dlp para manter cookies e proxy. Com
+    `chunk_size`, o arquivo é pedido em faixas Range sequenciais, como o
+    yt-dlp faz com o YouTube para evitar limitação de velocidade.
+    `progress(downloaded, total, speed)` é chamado a cada bloco.
+    `ffmpeg` é o executável resolvido por resolve_ffmpeg (padrão: o do PATH).
+    """
+
+    def __init__(self, urlopen=None, timeout=30, ffmpeg=None):
+        self.urlopen = urlopen or _urlopen
+        self.timeout = timeout
+        self.ffmpeg = ffmpeg or 'ffmpeg'
+
+    def _responses(self, url, headers, chunk_size, total):
+        """Gera as respostas HTTP que, em sequência, cobrem o arquivo todo."""
+        if not chunk_size:
+            yield self.urlopen(url, headers)
+            return
+        start = 0
+        while total is None or start < total:
+            try:
+                response = self.urlopen(url, dict(headers, Range=f"bytes={start}-{start + chunk_size - 1}"))
+            except Exception as e:
+                # Tamanho desconhecido e múltiplo de chunk_size: a faixa já passou do fim
+                if total is None and start and getattr(e, "status", None) == 416:
+                    return
+                raise
+            if response.status != 206:
+                if start:
+                    # O arquivo inteiro de novo no meio do fluxo: o ffmpeg já recebeu o começo
+                    response.close()
+                    raise OSError(f"HTTP {response.status} em vez de 206 na faixa a partir de {start}")
+                # Sem suporte a Range: a resposta já é o arquivo inteiro
+                yield response
+                return
+            match = _CONTENT_RANGE_RE.match(response.headers.get("Content-Range") or "")
+            if total is None and match and match[3] != "*":
+                total = int(match[3])
+            last = False
+            if total is None:
+                # Total desconhecido ("bytes 0-N/*"): segue até uma faixa mais curta que o pedido
+                length = int(match[2]) - int(match[1]) + 1 if match else response.headers.get("Content-Length")
+                if length is None:
+                    response.close()
+                    raise StreamUnsupported("faixa sem tamanho conhecido")
+                last = int(length) < chunk_size
+            yield response
+            start += chunk_size
+            if last:
+                return
+
+    def transcode(self, url, dst, codec_args, ext=None, headers=None, chunk_size=None,
+                  total=None, progress=None, input_args=None):
+        """Baixa `url` e grava `dst` pelo ffmpeg, sem arquivo intermediário.
+
+        Retorna um dicionário com os bytes recebidos, o tempo de parede e de
+        CPU do ffmpeg e quanto do ffmpeg passou depois do último byte
+        ('encode_tail'). Levanta StreamUnsupported antes de gravar qualquer
+        coisa se o formato exigir seek. `input_args` acrescenta entradas
+        depois do pipe (ex.: a capa), como em encode_audio.
+        """
+        headers = dict(headers or {})
+        responses = self._responses(url, headers, chunk_size, total)
+        response = next(responses)
+        head = response.read(PEEK_SIZE)
+        if not head:
+            raise StreamUnsupported("resposta vazia")
+        if (ext or "").lower() in MP4_EXTS and _mp4_needs_seeking(head):
+            response.close()
+            raise StreamUnsupported("MP4 com índice no fim do arquivo (requer seek)")
+        if total is None:
+            length = response.headers.get("Content-Length")
+            total = int(length) if length and response.status == 200 else total
+
+        root, out_ext = os.path.splitext(dst)
+        tmp = f"{root}.part{out_ext}"
+        cmd = [self.ffmpeg, '-y', '-hide_banner', '-loglevel', 'error',
+               '-i', 'pipe:0', *(input_args or ['-vn']), *codec_args, tmp]
+        stderr = tempfile.TemporaryFile()
+        start = time.perf_counter()
+        process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=stderr)
+        received = 0
+        ok = False
+        try:
+            chunk = head
+            while True:
+                while chunk:
+                    try:
+                        process.stdin.write(chunk)
+                    except BrokenPipeError:
+                        raise RuntimeError(self._error(process, stderr)) from None
+                    received += len(chunk)
+                    if progress is not None:
+                        elapsed = time.perf_counter() - start
+                        progress(received, total, received / elapsed if elapsed > 0 else None)
+                    chunk = response.read(CHUNK_SIZE)
+                response.close()
+                response = next(responses, None)
+                if response is None:
+                    break
+                chunk = response.read(CHUNK_SIZE)
+            if total is not None and received < total:
+                raise OSError(f"download incompleto: {received}/{total} bytes")
+
+            last_byte = time.perf_counter()
+            process.stdin.close()
+            cpu = self._wait(process)
+            if process.returncode != 0:
+                raise RuntimeError(self._error(process, stderr))
+            os.replace(tmp, dst)
+            ok = True
+            end = time.perf_counter()
+            return {'bytes': received, 'wall': end - start, 'cpu': cpu if cpu is not None else end - start,
+                    'encode_tail': end - last_byte}
+        finally:
+            if response is not None:
+                response.close()
+            if not ok:
+                if process.poll() is None:
+                    process.kill()
+                process.wait()
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+            stderr.close()
+
+    @staticmethod
+    def _wait(process):
+        """Espera o ffmpeg e retorna o tempo de CPU dele (None se indisponível)."""
+        if resource is None or not hasattr(os, "wait4"):
+            process.wait()
+            return None
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        return usage.ru_utime + usage.ru_stime
+
+    @staticmethod
+    def _error(process, stderr):
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+        stderr.seek(0)
+        message = stderr.read().decode("utf-8", "replace").strip()
+        return message or f"ffmpeg retornou {process.returncode}"
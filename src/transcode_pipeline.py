@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Pipeline de conversão para o YouTube Downloader.
+Os downloads entregam o áudio bruto em uma fila limitada e um pool de
+processos (um por núcleo) converte (ou apenas copia) o áudio em paralelo
+com a rede.
+"""
+
+import os
+import time
+import queue
+import threading
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_SENTINEL = object()
+
+DEFAULT_CODEC_ARGS = ['-c:a', 'libmp3lame', '-b:a', '192k']
+
+
+def _children_cpu():
+    """Tempo de CPU acumulado dos processos filhos (ffmpeg), quando disponível."""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def encode_audio(src, dst, codec_args=None, input_args=None, ffmpeg=None):
+    """Converte (ou copia) um arquivo de áudio com o ffmpeg e remove o original.
+
+    Executado dentro do pool de processos; retorna (tempo de parede, tempo
+    de CPU do ffmpeg) em segundos. Sem medição de CPU, usa o de parede.
+    `input_args` acrescenta entradas (ex.: a capa); nesse caso os
+    `codec_args` trazem os '-map' no lugar de '-vn' (veja AudioFinish).
+    `ffmpeg` é o executável resolvido por resolve_ffmpeg (padrão: o do PATH).
+    """
+    start = time.perf_counter()
+    cpu_before = _children_cpu()
+    root, ext = os.path.splitext(dst)
+    tmp = f"{root}.part{ext}"
+    cmd = [
+        ffmpeg or 'ffmpeg', '-y', '-hide_banner', '-loglevel', 'error',
+        '-i', src, *(input_args or ['-vn']),
+        *(codec_args or DEFAULT_CODEC_ARGS),
+        tmp,
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise RuntimeError(result.stderr.strip() or f"ffmpeg retornou {result.returncode}")
+    os.replace(tmp, dst)
+    if os.path.abspath(src) != os.path.abspath(dst):
+        os.remove(src)
+    wall = time.perf_counter() - start
+    cpu_after = _children_cpu()
+    return wall, (cpu_after - cpu_before) if cpu_before is not None else wall
+
+
+class TranscodePipeline:
+    """Estágio de conversão alimentado por uma fila limitada.
+
+    `submit()` bloqueia quando a fila está cheia, aplicando contrapressão
+    aos downloads. `close()` espera as conversões pendentes e retorna as
+    métricas de profundidade da fila e utilização de cada estágio.
+    """
+
+    def __init__(self, workers=None, queue_size=None, log=print, ffmpeg=None):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.ffmpeg = ffmpeg
+        self.queue = queue.Queue(maxsize=queue_size or self.workers * 2)
+        self.log = log
+        self._executor = None
+        self._dispatcher = None
+        self._slots = threading.Semaphore(self.workers)
+        self._lock = threading.Lock()
+        self._start = None
+        self.stats = {
+            'encoded': 0,
+            'encode_failed': 0,
+            'encode_busy': 0.0,
+            'copied': 0,
+            'transcoded': 0,
+            'copy_cpu': 0.0,
+            'transcode_cpu': 0.0,
+            'copied_audio_sec': 0.0,
+            'transcoded_audio_sec': 0.0,
+            'producer_wait': 0.0,
+            'queue_max': 0,
+            'queue_samples': 0,
+            'queue_total': 0,
+        }
+
+    def start(self):
+        self._start = time.perf_counter()
+        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        self._dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        self._dispatcher.start()
+        return self
+
+    def submit(self, src, dst=None, callback=None, codec_args=None, mode='transcode', duration=None,
+               on_error=None, timings=None, input_args=None):
+        """Enfileira um arquivo bruto para conversão.
+
+        `codec_args` são os argumentos de codec do ffmpeg (padrão: MP3
+        192 kbps) e `mode` indica se é cópia ou recodificação, para as
+        métricas; `input_args` são entradas extras do ffmpeg (ex.: capa).
+        `callback(dst)` é chamado quando a conversão termina e
+        `on_error(dst, erro)` quando ela falha. Se `timings` (dict) for
+        informado, recebe 'encode' (tempo no ffmpeg) e 'encode_wait' (tempo
+        na fila) antes dos callbacks.
+        """
+        dst = dst or os.path.splitext(src)[0] + '.mp3'
+        job = {'src': src, 'dst': dst, 'callback': callback, 'codec_args': codec_args,
+               'mode': mode, 'duration': duration or 0.0, 'on_error': on_error,
+               'timings': timings, 'input_args': input_args, 'submitted': time.perf_counter()}
+        waited = time.perf_counter()
+        self.queue.put(job)
+        waited = time.perf_counter() - waited
+        with self._lock:
+            self.stats['producer_wait'] += waited
+        self._sample_depth()
+
+    def _sample_depth(self):
+        depth = self.queue.qsize()
+        with self._lock:
+            self.stats['queue_samples'] += 1
+            self.stats['queue_total'] += depth
+            self.stats['queue_max'] = max(self.stats['queue_max'], depth)
+
+    def _dispatch(self):
+        while True:
+            # Só retirar da fila quando houver um processo livre
+            self._slots.acquire()
+            item = self.queue.get()
+            self._sample_depth()
+            if item is _SENTINEL:
+                self._slots.release()
+                break
+            if item['timings'] is not None:
+                item['timings']['encode_wait'] = time.perf_counter() - item['submitted']
+            future = self._executor.submit(encode_audio, item['src'], item['dst'], item['codec_args'],
+                                           item['input_args'], self.ffmpeg)
+            future.add_done_callback(lambda f, job=item: self._on_done(f, job))
+
+    def _on_done(self, future, job):
+        self._slots.release()
+        dst = job['dst']
+        try:
+            busy, cpu = future.result()
+        except Exception as e:
+            with self._lock:
+                self.stats['encode_failed'] += 1
+            self.log(f"❌ Erro ao converter '{os.path.basename(dst)}': {e}")
+            if job['on_error'] is not None:
+                job['on_error'](dst, e)
+            return
+        self.record(job['mode'], cpu, job['duration'], busy)
+        if job['timings'] is not None:
+            job['timings']['encode'] = busy
+        if job['callback'] is not None:
+            try:
+                job['callback'](dst)
+            except Exception as e:
+                self.log(f"⚠️  Erro ao finalizar '{os.path.basename(dst)}': {e}")
+
+    def record(self, mode, cpu, duration, busy=0.0):
+        """Contabiliza um item copiado ou recodificado (também fora da fila)."""
+        kind = 'copied' if mode == 'copy' else 'transcoded'
+        with self._lock:
+            self.stats['encoded'] += 1
+            self.stats['encode_busy'] += busy
+            self.stats[kind] += 1
+            self.stats['copy_cpu' if mode == 'copy' else 'transcode_cpu'] += cpu
+            self.stats[f'{kind}_audio_sec'] += duration
+
+    def close(self):
+        """Aguarda a fila esvaziar e finaliza o pool de processos."""
+        self.queue.put(_SENTINEL)
+        self._dispatcher.join()
+        self._executor.shutdown(wait=True)
+        elapsed = time.perf_counter() - self._start
+        stats = dict(self.stats)
+        stats['workers'] = self.workers
+        stats['queue_size'] = self.queue.maxsize
+        stats['elapsed'] = elapsed
+        stats['queue_avg'] = stats['queue_total'] / stats['queue_samples'] if stats['queue_samples'] else 0.0
+        stats['encode_utilization'] = stats['encode_busy'] / (self.workers * elapsed) if elapsed > 0 else 0.0
+        stats['cpu_saved'] = estimate_cpu_saved(stats)
+        return stats
+
+
+# CPU por segundo de áudio ao recodificar, quando a execução não mediu nenhum
+# (estimativa conservadora: decodificar + libmp3lame a ~70x o tempo real)
+REFERENCE_TRANSCODE_CPU_PER_SEC = 0.015
+
+
+def estimate_cpu_saved(stats):
+    """Estima os segundos de CPU economizados pelos itens apenas copiados."""
+    if not stats['copied_audio_sec']:
+        return 0.0
+    if stats['transcoded_audio_sec']:
+        per_sec = stats['transcode_cpu'] / stats['transcoded_audio_sec']
+    else:
+        per_sec = REFERENCE_TRANSCODE_CPU_PER_SEC
+    copy_per_sec = stats['copy_cpu'] / stats['copied_audio_sec']
+    return max(0.0, (per_sec - copy_per_sec) * stats['copied_audio_sec'])
+
+
+def format_pipeline_stats(stats):
+    """Formata as métricas da fila e dos estágios para ajuste fino."""
+    lines = [
+        f"📥 Download: {stats.get('download_utilization', 0.0):.0%} de utilização "
+        f"({stats.get('download_workers', 0)} worker(s), "
+        f"{stats['producer_wait']:.1f}s bloqueado aguardando a fila)",
+        f"🎛️  Conversão: {stats['encode_utilization']:.0%} de utilização "
+        f"({stats['workers']} processo(s), {stats['encoded']} convertido(s)"
+        + (f", {stats['encode_failed']} falha(s)" if stats['encode_failed'] else "") + ")",
+        f"📊 Fila: média {stats['queue_avg']:.1f}, máximo {stats['queue_max']}/{stats['queue_size']}",
+        f"🔁 {stats['copied']} copiado(s) sem recodificar, {stats['transcoded']} recodificado(s)"
+        + (f" (~{stats['cpu_saved']:.1f}s de CPU economizados)" if stats['cpu_saved'] else ""),
+    ]
+    return "\n".join(lines)
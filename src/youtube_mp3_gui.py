@@ -1,12 +1,48 @@
+import time
+_STARTUP_T0 = time.perf_counter()
+
 import os
-import re
-import shutil
+import sys
+import hashlib
+import argparse
 import threading
+import multiprocessing
+from collections import deque
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import customtkinter as ctk
-from yt_dlp import YoutubeDL
 from PIL import Image
+from metadata_cache import MetadataCache
+from app_paths import user_cache_dir, DEFAULT_OUTPUT_DIR
+from progress import format_progress
+from output_profile import OutputProfile, PROFILE_CHOICES, DEFAULT_CODEC
+from service_client import ServiceClient
+from ffmpeg_probe import resolve_ffmpeg
+from gui_queue import GuiJobQueue, JobQueuePanel, JOB_DONE, JOB_FAILED
+
+# O yt-dlp (via download_engine) é importado sob demanda: veja warm_up_downloader()
+
+class StartupProfile:
+    """Mede o tempo até o primeiro quadro da janela, por fase."""
+
+    def __init__(self, t0):
+        self.t0 = t0
+        self.last = t0
+        self.phases = []
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def report(self):
+        print("Perfil de inicialização:")
+        for phase, elapsed in self.phases:
+            print(f"  {phase:<20} {elapsed * 1000:8.1f} ms")
+        print(f"  {'total':<20} {(self.last - self.t0) * 1000:8.1f} ms")
+
+startup_profile = StartupProfile(_STARTUP_T0)
+startup_profile.mark("imports")
 
 # Configurações de aparência do CustomTkinter
 ctk.set_appearance_mode("System")
@@ -14,32 +50,120 @@ ctk.set_default_color_theme("blue")
 
 def get_resource_path(filename):
     """Obtém o caminho correto para recursos (funciona em dev e executável)."""
-    if getattr(tk, '_MEIPASS', False):
+    if getattr(sys, '_MEIPASS', False):
         # Executável PyInstaller
-        return os.path.join(tk._MEIPASS, 'assets', filename)
+        return os.path.join(sys._MEIPASS, 'assets', filename)
     else:
         # Desenvolvimento - imagens na raiz do projeto
         project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         return os.path.join(project_root, 'assets', filename)
 
+def get_asset_cache_dir():
+    """Pasta para as imagens pré-redimensionadas (ao lado dos assets em dev)."""
+    if not getattr(sys, '_MEIPASS', False):
+        cache_dir = os.path.join(os.path.dirname(get_resource_path("")), '.cache')
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            return cache_dir
+        except OSError:
+            pass
+    # No executável os assets são extraídos em uma pasta temporária a cada execução
+    return user_cache_dir("assets")
+
+def load_scaled_image(filename, size, thumbnail=False):
+    """Carrega uma imagem dos assets já redimensionada, usando cache em disco.
+
+    O cache é indexado pelo conteúdo do arquivo original, então continua
+    válido mesmo quando o executável extrai os assets novamente.
+    """
+    source = get_resource_path(filename)
+    if not os.path.exists(source):
+        return None
+
+    with open(source, 'rb') as f:
+        digest = hashlib.md5(f.read()).hexdigest()[:12]
+    stem = os.path.splitext(filename)[0]
+    cached = os.path.join(get_asset_cache_dir(), f"{stem}_{size[0]}x{size[1]}_{digest}.png")
+    if os.path.exists(cached):
+        return Image.open(cached)
+
+    img = Image.open(source)
+    if thumbnail:
+        img.thumbnail(size, Image.Resampling.LANCZOS)
+    else:
+        img = img.resize(size, Image.Resampling.LANCZOS)
+    try:
+        img.save(cached)
+    except OSError as e:
+        print(f"Aviso: Não foi possível gravar o cache de '{filename}': {e}")
+    return img
+
+def warm_up_downloader():
+    """Importa o yt-dlp em segundo plano para o primeiro download não esperar."""
+    import download_engine  # noqa: F401
+
 def check_ffmpeg():
-    """Verifica se o FFmpeg está instalado."""
-    if shutil.which("ffmpeg") is not None:
-        return True
-    
-    # Tentar pasta local (para build com FFmpeg incluído)
-    local_ffmpeg = os.path.join(os.path.dirname(__file__), 'ffmpeg', 'bin', 'ffmpeg.exe')
-    if os.path.exists(local_ffmpeg):
-        return True
-    
-    return False
+    """Verifica se o FFmpeg está instalado (no PATH ou na pasta local do build).
+
+    O PATH não é alterado: o caminho resolvido é repassado ao yt-dlp
+    (`ffmpeg_location`) e à conversão.
+    """
+    return resolve_ffmpeg() is not None
+
+# Log da interface: lotes a ~10 quadros/s e apenas as últimas linhas no widget
+LOG_FLUSH_MS = 100
+LOG_MAX_LINES = 500
+
+class LogBuffer:
+    """Buffer circular thread-safe para as mensagens de log da GUI.
+
+    Qualquer thread pode chamar `write()`; a thread da interface chama
+    `drain()` periodicamente. O log completo é gravado em arquivo.
+    """
+
+    def __init__(self, maxlen=LOG_MAX_LINES, log_path=None):
+        self._lines = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+        self.dropped = 0
+        self.log_path = log_path
+        self._file = None
+        if log_path:
+            try:
+                self._file = open(log_path, "a", encoding="utf-8", buffering=1)
+            except OSError as e:
+                print(f"Aviso: Não foi possível abrir o arquivo de log: {e}")
+
+    def write(self, message):
+        with self._lock:
+            if len(self._lines) == self._lines.maxlen:
+                self.dropped += 1
+            self._lines.append(message)
+            if self._file:
+                self._file.write(f"{time.strftime('%H:%M:%S')} {message}\n")
+
+    def drain(self):
+        with self._lock:
+            lines = list(self._lines)
+            self._lines.clear()
+            dropped, self.dropped = self.dropped, 0
+        return lines, dropped
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
 
 class YoutubeDownloaderApp(ctk.CTk):
     def __init__(self):
         super().__init__()
+        startup_profile.mark("janela")
 
         self.title("YouTube MP3 Downloader")
-        self.geometry("700x650")
+        self.geometry("700x900")
+
+        # Cache de metadados compartilhado entre downloads da mesma sessão
+        self.metadata_cache = MetadataCache()
 
         # Verificar FFmpeg no início
         if not check_ffmpeg():
@@ -50,10 +174,14 @@ class YoutubeDownloaderApp(ctk.CTk):
                 "https://ffmpeg.org/download.html\n\n"
                 "Após instalar, adicione o FFmpeg ao PATH do sistema."
             )
+        startup_profile.mark("verificar ffmpeg")
+
+        # Fila de trabalhos: várias playlists sob um limite comum de downloads
+        self.queue = GuiJobQueue(on_event=self.on_job_event, on_finished=self.on_job_finished)
 
         # Layout Principal
         self.grid_columnconfigure(0, weight=1)
-        self.grid_rowconfigure(6, weight=1)
+        self.grid_rowconfigure(5, weight=1)
 
         # Banner no topo
         banner_frame = ctk.CTkFrame(self, fg_color="transparent")
@@ -61,17 +189,16 @@ class YoutubeDownloaderApp(ctk.CTk):
         banner_frame.grid_columnconfigure(0, weight=1)
 
         try:
-            banner_path = get_resource_path("banner.png")
-            if os.path.exists(banner_path):
-                banner_img = Image.open(banner_path)
-                # Redimensionar para caber na largura da janela
-                banner_img = banner_img.resize((700, 150), Image.Resampling.LANCZOS)
+            # Redimensionada para caber na largura da janela
+            banner_img = load_scaled_image("banner.png", (700, 150))
+            if banner_img is not None:
                 banner_photo = ctk.CTkImage(light_image=banner_img, dark_image=banner_img, size=(700, 150))
                 banner_label = ctk.CTkLabel(banner_frame, image=banner_photo, text="")
                 banner_label.image = banner_photo
                 banner_label.grid(row=0, column=0, sticky="ew")
         except Exception as e:
             print(f"Aviso: Não foi possível carregar o banner: {e}")
+        startup_profile.mark("banner")
 
         # Logo e Título
         logo_frame = ctk.CTkFrame(self, fg_color="transparent")
@@ -79,16 +206,15 @@ class YoutubeDownloaderApp(ctk.CTk):
         logo_frame.grid_columnconfigure(1, weight=1)
 
         try:
-            logo_path = get_resource_path("logo.png")
-            if os.path.exists(logo_path):
-                logo_img = Image.open(logo_path)
-                logo_img.thumbnail((50, 50), Image.Resampling.LANCZOS)
+            logo_img = load_scaled_image("logo.png", (50, 50), thumbnail=True)
+            if logo_img is not None:
                 logo_photo = ctk.CTkImage(light_image=logo_img, dark_image=logo_img, size=(50, 50))
                 logo_label = ctk.CTkLabel(logo_frame, image=logo_photo, text="")
                 logo_label.image = logo_photo
                 logo_label.grid(row=0, column=0, padx=(0, 12))
         except Exception as e:
             print(f"Aviso: Não foi possível carregar a logo: {e}")
+        startup_profile.mark("logo")
 
         self.label_title = ctk.CTkLabel(logo_frame, text="YouTube Playlist para MP3", font=ctk.CTkFont(size=16, weight="bold"))
         self.label_title.grid(row=0, column=1, sticky="w")
@@ -102,104 +228,236 @@ class YoutubeDownloaderApp(ctk.CTk):
         self.folder_frame.grid(row=3, column=0, padx=20, pady=10, sticky="ew")
         self.folder_frame.grid_columnconfigure(0, weight=1)
 
-        self.folder_path = tk.StringVar(value=os.path.expanduser("~/Downloads"))
+        self.folder_path = tk.StringVar(value=DEFAULT_OUTPUT_DIR)
         self.folder_entry = ctk.CTkEntry(self.folder_frame, textvariable=self.folder_path, state="readonly")
         self.folder_entry.grid(row=0, column=0, padx=(0, 10), sticky="ew")
 
         self.folder_button = ctk.CTkButton(self.folder_frame, text="Escolher Pasta", command=self.browse_folder, width=120)
         self.folder_button.grid(row=0, column=1)
 
-        # Botão de Download
-        self.download_button = ctk.CTkButton(self, text="Iniciar Download", command=self.start_download_thread, font=ctk.CTkFont(weight="bold"))
-        self.download_button.grid(row=4, column=0, padx=20, pady=20)
+        # Downloads simultâneos
+        self.jobs_label = ctk.CTkLabel(self.folder_frame, text="Simultâneos:")
+        self.jobs_label.grid(row=0, column=2, padx=(15, 5))
+
+        self.jobs_var = tk.StringVar(value="1")
+        self.jobs_menu = ctk.CTkOptionMenu(self.folder_frame, variable=self.jobs_var, values=["1", "2", "4", "8"], width=70)
+        self.jobs_menu.grid(row=0, column=3)
+
+        # Formato de saída ("best" mantém o codec original, sem recodificar)
+        self.codec_var = tk.StringVar(value=DEFAULT_CODEC)
+        self.codec_menu = ctk.CTkOptionMenu(self.folder_frame, variable=self.codec_var, values=list(PROFILE_CHOICES), width=80)
+        self.codec_menu.grid(row=0, column=4, padx=(10, 0))
+
+        # Botão de Download (enfileira; vários trabalhos podem rodar juntos)
+        self.download_button = ctk.CTkButton(self, text="Adicionar à Fila", command=self.enqueue_download, font=ctk.CTkFont(weight="bold"))
+        self.download_button.grid(row=4, column=0, padx=20, pady=(10, 10))
+
+        # Trabalhos e faixas do trabalho selecionado
+        self.queue_panel = JobQueuePanel(self, self.queue, fg_color="transparent")
+        self.queue_panel.grid(row=5, column=0, padx=20, pady=0, sticky="nsew")
 
         # Área de Log/Status
-        self.status_text = ctk.CTkTextbox(self, height=120)
-        self.status_text.grid(row=5, column=0, padx=20, pady=(10, 0), sticky="nsew")
+        self.status_text = ctk.CTkTextbox(self, height=100)
+        self.status_text.grid(row=6, column=0, padx=20, pady=(10, 0), sticky="ew")
         self.status_text.insert("0.0", "Pronto para começar...\n")
         self.status_text.configure(state="disabled")
 
+        log_path = os.path.join(user_cache_dir("logs"), time.strftime("gui-%Y%m%d-%H%M%S.log"))
+        self.log_buffer = LogBuffer(log_path=log_path)
+        self.after(LOG_FLUSH_MS, self.refresh_ui)
+
         # Barra de Progresso
-        self.progress_bar = ctk.CTkProgressBar(self)
-        self.progress_bar.grid(row=6, column=0, padx=20, pady=(10, 20), sticky="ew")
+        self.progress_frame = ctk.CTkFrame(self, fg_color="transparent")
+        self.progress_frame.grid(row=7, column=0, padx=20, pady=(10, 20), sticky="ew")
+        self.progress_frame.grid_columnconfigure(0, weight=1)
+
+        self.progress_bar = ctk.CTkProgressBar(self.progress_frame, mode="determinate")
+        self.progress_bar.grid(row=0, column=0, sticky="ew")
         self.progress_bar.set(0)
 
+        self.progress_label = ctk.CTkLabel(self.progress_frame, text="", anchor="w")
+        self.progress_label.grid(row=1, column=0, sticky="ew")
+
+        # Último snapshot de progresso exibido (do trabalho selecionado)
+        self._shown_snapshot = None
+        startup_profile.mark("widgets")
+
     def browse_folder(self):
         folder = filedialog.askdirectory()
         if folder:
             self.folder_path.set(folder)
 
     def log(self, message):
-        self.status_text.configure(state="normal")
-        self.status_text.insert("end", f"> {message}\n")
-        self.status_text.see("end")
-        self.status_text.configure(state="disabled")
+        """Enfileira uma mensagem de log (seguro a partir de qualquer thread)."""
+        self.log_buffer.write(message)
 
-    def sanitize_filename(self, name):
-        return re.sub(r'[\\/*?:"<>|]', "", name)
+    def refresh_ui(self):
+        """Loop periódico que aplica log, fila e progresso pendentes na interface.
 
-    def start_download_thread(self):
+        Os eventos dos downloads só alteram o estado dos trabalhos; a tela é
+        redesenhada aqui, no máximo uma vez por intervalo.
+        """
+        self.flush_log()
+        self.queue_panel.refresh()
+        job = self.queue_panel.selected
+        snapshot = job.snapshot if job is not None else None
+        if snapshot is not None and snapshot is not self._shown_snapshot:
+            self._shown_snapshot = snapshot
+            self.progress_bar.set(snapshot['fraction'])
+            self.progress_label.configure(text=f"#{job.id} · {format_progress(snapshot)}")
+        self.after(LOG_FLUSH_MS, self.refresh_ui)
+
+    def flush_log(self):
+        """Descarrega o buffer de log no widget em um único lote."""
+        lines, dropped = self.log_buffer.drain()
+        if lines:
+            text = "".join(f"> {line}\n" for line in lines)
+            if dropped:
+                text = f"> ... {dropped} linha(s) omitida(s), veja {self.log_buffer.log_path}\n" + text
+            self.status_text.configure(state="normal")
+            self.status_text.insert("end", text)
+            # Manter apenas as últimas LOG_MAX_LINES linhas no widget
+            line_count = int(self.status_text.index("end-1c").split(".")[0])
+            if line_count > LOG_MAX_LINES:
+                self.status_text.delete("1.0", f"{line_count - LOG_MAX_LINES + 1}.0")
+            self.status_text.see("end")
+            self.status_text.configure(state="disabled")
+
+    def enqueue_download(self):
         url = self.url_entry.get().strip()
         if not url:
             messagebox.showwarning("Aviso", "Por favor, insira uma URL válida.")
             return
 
-        self.download_button.configure(state="disabled")
-        self.progress_bar.configure(mode="indeterminate")
-        self.progress_bar.start()
-        
-        # Rodar em uma thread separada para não travar a interface
-        thread = threading.Thread(target=self.download_process, args=(url,))
+        self.url_entry.delete(0, "end")
+        jobs = int(self.jobs_var.get())
+        profile = OutputProfile(self.codec_var.get())
+        output_dir = self.folder_path.get()
+
+        # Consultar o serviço e importar o motor fora da thread da interface
+        thread = threading.Thread(target=self.dispatch_job, args=(url, output_dir, jobs, profile))
         thread.daemon = True
         thread.start()
 
-    def download_process(self, url):
-        output_dir = self.folder_path.get()
-        
-        # Logger customizado para o yt-dlp
-        class MyLogger:
-            def __init__(self, app):
-                self.app = app
-            def debug(self, msg):
-                if msg.startswith('[download]'):
-                    pass # Evitar poluir muito o log com progresso de bytes
-                else:
-                    self.app.after(0, lambda: self.app.log(msg))
-            def warning(self, msg):
-                self.app.after(0, lambda: self.app.log(f"AVISO: {msg}"))
-            def error(self, msg):
-                self.app.after(0, lambda: self.app.log(f"ERRO: {msg}"))
-
-        ydl_opts = {
-            'format': 'bestaudio/best',
-            'outtmpl': f'{output_dir}/%(playlist_title)s/%(playlist_index)s - %(title)s.%(ext)s',
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '192',
-            }],
-            'logger': MyLogger(self),
-            'nocheckcertificate': True,
-            'ignoreerrors': True,
-        }
+    def dispatch_job(self, url, output_dir, jobs=1, profile=None):
+        """Envia a playlist ao serviço de downloads, se estiver rodando, ou à fila local."""
+        # Com o serviço de downloads rodando, a GUI é só um cliente:
+        # o trabalho continua mesmo se a janela for fechada
+        client = ServiceClient()
+        if client.available():
+            job = self.queue.new_job(url)
+            self.after(0, lambda: self.show_job(job))
+            try:
+                self.follow_service_job(client, job, output_dir, jobs, profile)
+                job.set_status(JOB_DONE)
+            except Exception as e:
+                self.log(f"[#{job.id}] ERRO FATAL: {str(e)}")
+                job.set_status(JOB_FAILED, str(e))
+            self.on_job_finished(job)
+            return
 
-        try:
-            with YoutubeDL(ydl_opts) as ydl:
-                self.after(0, lambda: self.log("Iniciando análise e download..."))
-                ydl.download([url])
-            self.after(0, lambda: self.log("🏁 Processo concluído com sucesso!"))
-            self.after(0, lambda: messagebox.showinfo("Sucesso", "Download concluído!"))
-        except Exception as e:
-            self.after(0, lambda: self.log(f"ERRO FATAL: {str(e)}"))
-            self.after(0, lambda: messagebox.showerror("Erro", f"Ocorreu um erro: {e}"))
-        finally:
-            self.after(0, self.reset_ui)
-
-    def reset_ui(self):
-        self.download_button.configure(state="normal")
-        self.progress_bar.stop()
-        self.progress_bar.set(0)
+        # Normalmente já importado por warm_up_downloader()
+        from download_engine import DownloadOptions
+        from audio_finish import AudioFinish
+        from run_metrics import RunMetrics
+
+        trace_path = os.path.join(user_cache_dir("traces"), time.strftime("%Y%m%d-%H%M%S") + ".jsonl")
+        options = DownloadOptions(output_dir=output_dir, jobs=jobs, profile=profile,
+                                  cache=self.metadata_cache, metrics=RunMetrics(trace_path=trace_path),
+                                  finish=AudioFinish())
+        job = self.queue.submit(url, options)
+        self.log(f"[#{job.id}] Na fila: {url}")
+        self.after(0, lambda: self.show_job(job))
+
+    def show_job(self, job):
+        """Seleciona o trabalho novo, a menos que outro ainda em andamento esteja selecionado."""
+        current = self.queue_panel.selected
+        if current is None or current.finished:
+            self.queue_panel.select(job)
+
+    def on_job_event(self, job, event):
+        """Repassa ao log os eventos de um trabalho (thread do motor)."""
+        from download_core import format_throughput
+
+        prefix = f"[#{job.id}]"
+        if event.type == "log":
+            if event.level == "warning":
+                self.log(f"{prefix} AVISO: {event.message}")
+            elif event.level == "error":
+                self.log(f"{prefix} ERRO: {event.message}")
+            elif not event.message.startswith("[download]"):
+                # Progresso em bytes do yt-dlp poluiria o log
+                self.log(f"{prefix} {event.message}")
+        elif event.type == "started":
+            total = event.total if event.total is not None else "?"
+            self.log(f"{prefix} {total} item(ns) em '{event.title}' ({job.options.jobs} simultâneo(s))")
+        elif event.type == "finished" and event.stats:
+            self.log(f"{prefix} {format_throughput(event.stats)}")
+
+    def on_job_finished(self, job):
+        """Fecha as métricas do trabalho e avisa quando a fila esvazia."""
+        metrics = job.options.metrics if job.options is not None else None
+        if metrics is not None:
+            from run_metrics import format_phase_summary
+            self.log(f"[#{job.id}] {format_phase_summary(metrics.close())}")
+            self.log(f"[#{job.id}] Trace das fases: {metrics.trace_path}")
+        if job.status == JOB_DONE:
+            self.log(f"[#{job.id}] 🏁 Processo concluído com sucesso!")
+        else:
+            self.log(f"[#{job.id}] 🏁 {job.status}: {job.error or job.title}")
+        if self.queue.active:
+            return
+        self.log(self.metadata_cache.summary())
+        jobs = self.queue.jobs
+        failed = [j for j in jobs if j.status == JOB_FAILED]
+        if failed:
+            self.after(0, lambda: messagebox.showerror(
+                "Erro", f"{len(failed)} trabalho(s) com erro. Veja o log para os detalhes."))
+        else:
+            self.after(0, lambda: messagebox.showinfo("Sucesso", "Downloads concluídos!"))
+
+    def follow_service_job(self, client, job, output_dir, jobs=1, profile=None):
+        """Envia a playlist ao serviço e repassa log e progresso ao trabalho da fila."""
+        profile = profile or OutputProfile()
+        job_id = client.submit(job.url, os.path.abspath(output_dir), jobs=jobs,
+                               codec=profile.codec, bitrate=profile.bitrate)
+        self.log(f"[#{job.id}] 🛰️  Trabalho {job_id} enviado ao serviço de downloads")
+        final = None
+        for event in client.events(job_id):
+            if event['type'] == 'log':
+                self.log(f"[#{job.id}] {event['message']}")
+            elif event['type'] == 'progress':
+                job.set_progress(event['snapshot'])
+            elif event['type'] == 'status':
+                final = event
+        if final is None or final['status'] != 'done':
+            status = final['status'] if final else 'interrompido'
+            raise RuntimeError((final or {}).get('error') or f"Trabalho {job_id}: {status}")
+
+def on_first_frame(app, show_profile=False):
+    """Executado quando a janela já foi desenhada pela primeira vez."""
+    app.update_idletasks()
+    startup_profile.mark("primeiro quadro")
+    if show_profile:
+        startup_profile.report()
+    threading.Thread(target=warm_up_downloader, daemon=True).start()
 
 if __name__ == "__main__":
+    # Necessário para o pool de conversão em executáveis (PyInstaller)
+    multiprocessing.freeze_support()
+
+    parser = argparse.ArgumentParser(description="YouTube MP3 Downloader (interface gráfica)")
+    parser.add_argument(
+        "--startup-profile",
+        action="store_true",
+        help="Exibe o tempo até o primeiro quadro, separado por fase"
+    )
+    args, _ = parser.parse_known_args()
+
     app = YoutubeDownloaderApp()
-    app.mainloop()
+    app.after(0, lambda: on_first_frame(app, show_profile=args.startup_profile))
+    try:
+        app.mainloop()
+    finally:
+        app.queue.shutdown()
+        app.log_buffer.close()
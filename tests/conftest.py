@@ -0,0 +1,97 @@
+"""
+Configuração comum dos testes: módulos de src/ no sys.path e um servidor
+HTTP local com suporte a Range e falhas sob demanda.
+"""
+
+import os
+import re
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+_RANGE_RE = re.compile(r"bytes=(\d+)-(\d*)")
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """Serve `server.payload` em qualquer caminho, respeitando Range.
+
+    `server.fail_from` faz as faixas que começam nessa posição responderem
+    500; `server.cut_after` encerra a primeira resposta depois de tantos
+    bytes (conexão caída); com `server.unknown_total` o Content-Range
+    traz '*' no lugar do tamanho. Com `server.etag`, o ETag é enviado e um
+    If-Range diferente dele faz o Range ser ignorado. Os cabeçalhos Range
+    recebidos ficam em `server.ranges` e os If-Range em `server.if_ranges`.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        payload = server.payload
+        header = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        with server.lock:
+            server.ranges.append(header)
+            server.if_ranges.append(if_range)
+        match = _RANGE_RE.match(header or "")
+        if if_range is not None and if_range != server.etag:
+            match = None
+        if match is None:
+            first, last = 0, len(payload) - 1
+        else:
+            first = int(match[1])
+            last = min(int(match[2]), len(payload) - 1) if match[2] else len(payload) - 1
+        if first in server.fail_from:
+            self.send_response(500)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if first >= len(payload):
+            self.send_response(416)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = payload[first:last + 1]
+        self.send_response(206 if match else 200)
+        if match:
+            size = "*" if server.unknown_total else len(payload)
+            self.send_header("Content-Range", f"bytes {first}-{last}/{size}")
+        if server.etag:
+            self.send_header("ETag", server.etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        with server.lock:
+            cut, server.cut_after = server.cut_after, None
+        if cut is not None:
+            self.wfile.write(body[:cut])
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def range_server():
+    """Servidor local; ajuste `payload`, `fail_from`, `cut_after`, `unknown_total` e `etag` no teste."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+    server.daemon_threads = True
+    server.payload = b""
+    server.fail_from = set()
+    server.cut_after = None
+    server.unknown_total = False
+    server.etag = None
+    server.ranges = []
+    server.if_ranges = []
+    server.lock = threading.Lock()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/file.bin"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
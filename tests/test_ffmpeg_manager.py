@@ -0,0 +1,155 @@
+import io
+import os
+import hashlib
+import tarfile
+import zipfile
+
+import pytest
+
+import ffmpeg_manager
+from ffmpeg_manager import ChecksumMismatch, download_file, download_ffmpeg, extract_binaries
+
+PAYLOAD = os.urandom(3 * 1024 * 1024 + 123)
+SHA256 = hashlib.sha256(PAYLOAD).hexdigest()
+
+
+@pytest.fixture(autouse=True)
+def no_retry_delay(monkeypatch):
+    monkeypatch.setattr(ffmpeg_manager.time, "sleep", lambda seconds: None)
+
+
+def test_resumes_from_part_file(range_server, tmp_path):
+    range_server.payload = PAYLOAD
+    dest = str(tmp_path / "ffmpeg.tar.xz")
+    with open(dest + ".part", "wb") as f:
+        f.write(PAYLOAD[:1000])
+
+    download_file(range_server.url, dest, sha256=SHA256)
+
+    assert range_server.ranges == ["bytes=1000-"]
+    with open(dest, "rb") as f:
+        assert f.read() == PAYLOAD
+    assert not os.path.exists(dest + ".part")
+
+
+def test_resumes_after_dropped_connection(range_server, tmp_path):
+    range_server.payload = PAYLOAD
+    range_server.cut_after = 1024 * 1024
+    dest = str(tmp_path / "ffmpeg.tar.xz")
+
+    download_file(range_server.url, dest, sha256=SHA256)
+
+    assert range_server.ranges[0] is None
+    assert range_server.ranges[-1].startswith("bytes=") and range_server.ranges[-1] != "bytes=0-"
+    with open(dest, "rb") as f:
+        assert f.read() == PAYLOAD
+
+
+def test_checksum_mismatch_discards_download(range_server, tmp_path):
+    range_server.payload = PAYLOAD
+    dest = str(tmp_path / "ffmpeg.tar.xz")
+
+    with pytest.raises(ChecksumMismatch):
+        download_file(range_server.url, dest, sha256="0" * 64)
+
+    assert not os.path.exists(dest)
+    assert not os.path.exists(dest + ".part")
+
+
+def test_resume_sends_saved_etag_in_if_range(range_server, tmp_path):
+    range_server.payload = PAYLOAD
+    range_server.etag = '"v1"'
+    dest = str(tmp_path / "ffmpeg.tar.xz")
+    with open(dest + ".part", "wb") as f:
+        f.write(PAYLOAD[:1000])
+    with open(dest + ".part.etag", "w") as f:
+        f.write('"v1"')
+
+    download_file(range_server.url, dest)
+
+    assert range_server.ranges == ["bytes=1000-"]
+    assert range_server.if_ranges == ['"v1"']
+    with open(dest, "rb") as f:
+        assert f.read() == PAYLOAD
+    assert not os.path.exists(dest + ".part.etag")
+
+
+def test_changed_file_is_downloaded_again(range_server, tmp_path):
+    range_server.payload = PAYLOAD
+    range_server.etag = '"v2"'
+    dest = str(tmp_path / "ffmpeg.tar.xz")
+    with open(dest + ".part", "wb") as f:
+        f.write(b"x" * 1000)
+    with open(dest + ".part.etag", "w") as f:
+        f.write('"v1"')
+
+    download_file(range_server.url, dest)
+
+    with open(dest, "rb") as f:
+        assert f.read() == PAYLOAD
+
+
+def test_part_without_etag_or_checksum_is_discarded(range_server, tmp_path):
+    range_server.payload = PAYLOAD
+    dest = str(tmp_path / "ffmpeg.tar.xz")
+    with open(dest + ".part", "wb") as f:
+        f.write(b"x" * 1000)
+
+    download_file(range_server.url, dest)
+
+    assert range_server.ranges == [None]
+    with open(dest, "rb") as f:
+        assert f.read() == PAYLOAD
+
+
+BUILD_DIR = "ffmpeg-master-latest-gpl/"
+BUILD_FILES = {
+    "bin/ffmpeg": b"ffmpeg binary",
+    "bin/ffprobe": b"ffprobe binary",
+    "bin/ffplay": b"ffplay binary",
+    "doc/README.txt": b"docs",
+}
+
+
+def make_zip():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        for name, data in BUILD_FILES.items():
+            zf.writestr(BUILD_DIR + name + (".exe" if name.startswith("bin/") else ""), data)
+    return buffer.getvalue()
+
+
+def make_tar_xz():
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:xz") as tf:
+        for name, data in BUILD_FILES.items():
+            info = tarfile.TarInfo(BUILD_DIR + name)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("filename, build, suffix", [
+    ("ffmpeg-test.zip", make_zip, ".exe"),
+    ("ffmpeg-test.tar.xz", make_tar_xz, ""),
+])
+def test_download_ffmpeg_installs_only_the_executables(range_server, tmp_path, filename, build, suffix):
+    range_server.payload = build()
+    url = range_server.url.rsplit("/", 1)[0] + "/" + filename
+
+    assert download_ffmpeg(url=url, sha256=hashlib.sha256(range_server.payload).hexdigest(),
+                           checksums_url=None, dest_dir=str(tmp_path))
+
+    bin_dir = tmp_path / "bin"
+    assert sorted(os.listdir(bin_dir)) == ["ffmpeg" + suffix, "ffprobe" + suffix]
+    assert (bin_dir / ("ffmpeg" + suffix)).read_bytes() == BUILD_FILES["bin/ffmpeg"]
+    assert (bin_dir / ("ffprobe" + suffix)).read_bytes() == BUILD_FILES["bin/ffprobe"]
+    assert sorted(os.listdir(tmp_path)) == ["bin"]
+
+
+def test_extract_binaries_reports_missing_executables(tmp_path):
+    archive = tmp_path / "ffmpeg.tar.xz"
+    archive.write_bytes(make_tar_xz())
+
+    with pytest.raises(FileNotFoundError, match="ffserver"):
+        extract_binaries(str(archive), str(tmp_path / "bin"), ("ffmpeg", "ffserver"))
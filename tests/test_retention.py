@@ -0,0 +1,87 @@
+import os
+import time
+
+from retention import scan_library, scan_store, plan_eviction, evict
+from download_index import INDEX_FILENAME
+from media_store import STORE_DIRNAME
+
+MB = 1000 * 1000
+OLD = time.time() - 86400
+
+
+def make_playlist(root, name, files=(), links=()):
+    """Cria uma pasta de playlist com arquivos próprios e hardlinks para `links`."""
+    folder = os.path.join(root, name)
+    os.makedirs(folder)
+    open(os.path.join(folder, INDEX_FILENAME), "wb").close()
+    for filename, size in files:
+        with open(os.path.join(folder, filename), "wb") as f:
+            f.write(b"\0" * size)
+    for target in links:
+        os.link(target, os.path.join(folder, os.path.basename(target)))
+    return folder
+
+
+def make_store_file(root, name, size):
+    store = os.path.join(root, STORE_DIRNAME, "mp3-192")
+    os.makedirs(store, exist_ok=True)
+    path = os.path.join(store, name)
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    return path
+
+
+def scan(root):
+    folders = scan_library([root])
+    for folder in folders:
+        folder.last_access = folder.last_sync = OLD
+    return folders, scan_store(root)
+
+
+def test_store_shared_folders_free_the_store_file(tmp_path):
+    root = str(tmp_path)
+    track = make_store_file(root, "abc.mp3", MB)
+    make_playlist(root, "A", links=[track])
+    make_playlist(root, "B", links=[track])
+    folders, store = scan(root)
+
+    to_evict, usage, remaining, store_files = plan_eviction(folders, 500000, store=store)
+
+    assert usage == MB
+    assert sorted(folder.name for folder in to_evict) == ["A", "B"]
+    assert store_files == [track]
+    assert remaining == 0
+
+    freed, failed = evict(to_evict, store_files, log=lambda message: None)
+    assert (freed, failed) == (MB, [])
+    assert not os.path.exists(track)
+
+
+def test_folder_linked_to_a_kept_playlist_is_not_evicted(tmp_path):
+    root = str(tmp_path)
+    track = make_store_file(root, "abc.mp3", MB)
+    make_playlist(root, "A", links=[track])
+    make_playlist(root, "B", links=[track])
+    folders, store = scan(root)
+    # B foi usada agora há pouco: o arquivo continua ligado a ela
+    next(folder for folder in folders if folder.name == "B").last_access = time.time()
+
+    to_evict, usage, remaining, store_files = plan_eviction(folders, 500000, store=store)
+
+    assert to_evict == []
+    assert store_files == []
+    assert remaining == usage == MB
+
+
+def test_own_files_are_freed_and_orphans_dropped(tmp_path):
+    root = str(tmp_path)
+    orphan = make_store_file(root, "old.mp3", MB)
+    make_playlist(root, "A", files=[("01 - a.mp3", 2 * MB)])
+    folders, store = scan(root)
+
+    to_evict, usage, remaining, store_files = plan_eviction(folders, 0, store=store)
+
+    assert usage == 3 * MB
+    assert [folder.name for folder in to_evict] == ["A"]
+    assert store_files == [orphan]
+    assert remaining == 0
@@ -0,0 +1,24 @@
+from adaptive_concurrency import AdaptiveConcurrency
+from run_metrics import RunMetrics
+
+
+def test_prometheus_exports_concurrency_changes_by_reason():
+    metrics = RunMetrics()
+    controller = AdaptiveConcurrency(initial=4, maximum=8, log=lambda message: None,
+                                     on_change=metrics.record_concurrency)
+    assert "ytdl_concurrency 4\n" in metrics.prometheus_text()
+
+    controller.record(error="throttled")
+    controller.record(error="timeout")  # dentro do intervalo mínimo: sem nova redução
+
+    text = metrics.prometheus_text()
+    assert "# TYPE ytdl_concurrency gauge" in text
+    assert "ytdl_concurrency 2\n" in text
+    assert "# TYPE ytdl_concurrency_changes_total counter" in text
+    assert 'ytdl_concurrency_changes_total{reason="throttled"} 1' in text
+    assert 'reason="timeout"' not in text
+    assert controller.history[0]["kind"] == "throttled"
+
+
+def test_concurrency_metrics_absent_without_a_limit():
+    assert "ytdl_concurrency" not in RunMetrics().prometheus_text()
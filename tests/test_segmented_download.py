@@ -0,0 +1,54 @@
+import os
+
+import pytest
+
+from segmented_download import SegmentedDownloader
+
+SEGMENT = 64 * 1024
+PAYLOAD = bytes(range(256)) * (SEGMENT * 4 // 256)
+
+
+def downloader():
+    return SegmentedDownloader(connections=3, segment_size=SEGMENT, threshold=0, retries=1, timeout=5)
+
+
+def test_downloads_all_segments(range_server, tmp_path):
+    range_server.payload = PAYLOAD
+    dest = str(tmp_path / "out.bin")
+
+    result = downloader().download(range_server.url, dest)
+
+    assert result["segments"] == 4
+    with open(dest, "rb") as f:
+        assert f.read() == PAYLOAD
+    assert not os.path.exists(dest + ".part")
+
+
+def test_failed_segment_leaves_no_file(range_server, tmp_path):
+    range_server.payload = PAYLOAD
+    range_server.fail_from = {2 * SEGMENT}
+    dest = str(tmp_path / "out.bin")
+
+    with pytest.raises(OSError, match="segmentado"):
+        downloader().download(range_server.url, dest)
+
+    assert not os.path.exists(dest)
+    assert not os.path.exists(dest + ".part")
+
+
+class Cancelled(BaseException):
+    pass
+
+
+def test_cancelled_from_progress_leaves_no_file(range_server, tmp_path):
+    range_server.payload = PAYLOAD
+    dest = str(tmp_path / "out.bin")
+
+    def progress(done, total, speed):
+        raise Cancelled()
+
+    with pytest.raises(Cancelled):
+        downloader().download(range_server.url, dest, progress=progress)
+
+    assert not os.path.exists(dest)
+    assert not os.path.exists(dest + ".part")
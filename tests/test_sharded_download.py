@@ -0,0 +1,139 @@
+import os
+import time
+import multiprocessing
+
+import pytest
+
+import sharded_download
+from sharded_download import ShardManifest, Heartbeat, PENDING, LEASED, DONE, FAILED, MAX_ATTEMPTS
+
+
+@pytest.fixture
+def manifest():
+    manifest = ShardManifest(":memory:")
+    playlist_id = manifest.add_playlist("https://example.com/list", "Lista", "/tmp/lista", 1, {})
+    manifest.add_items(playlist_id, [(1, "a", "A", "https://example.com/a"),
+                                     (2, "b", "B", "https://example.com/b")])
+    manifest.playlist_id = playlist_id
+    yield manifest
+    manifest.close()
+
+
+def item(manifest, position):
+    return dict(manifest._execute("SELECT * FROM items WHERE playlist_id = ? AND position = ?",
+                                  (manifest.playlist_id, position)).fetchone())
+
+
+def expire_and_retake(manifest):
+    """w1 toma o item 1, o lease vence e w2 o retoma."""
+    manifest.lease("w1", 1, lease_seconds=-1)
+    retaken = manifest.lease("w2", 1)
+    assert [(i["position"], i["previous_worker"]) for i in retaken] == [(1, "w1")]
+
+
+def test_stale_complete_is_ignored(manifest):
+    expire_and_retake(manifest)
+
+    assert manifest.complete(manifest.playlist_id, 1, "w1") is False
+    assert (item(manifest, 1)["state"], item(manifest, 1)["worker"]) == (LEASED, "w2")
+    assert manifest.complete(manifest.playlist_id, 1, "w2") is True
+    assert item(manifest, 1)["state"] == DONE
+
+
+def test_stale_fail_is_ignored(manifest):
+    expire_and_retake(manifest)
+
+    assert manifest.fail(manifest.playlist_id, 1, "w1", "erro", retry=False) is False
+    row = item(manifest, 1)
+    assert (row["state"], row["worker"], row["attempts"]) == (LEASED, "w2", 0)
+
+
+def test_completed_item_cannot_be_failed(manifest):
+    manifest.lease("w1", 1)
+    assert manifest.complete(manifest.playlist_id, 1, "w1")
+
+    assert manifest.fail(manifest.playlist_id, 1, "w1", "erro") is False
+    assert item(manifest, 1)["state"] == DONE
+
+
+def test_retry_waits_for_backoff(manifest):
+    manifest.lease("w1", 1)
+
+    assert manifest.fail(manifest.playlist_id, 1, "w1", "timeout", retry=True)
+
+    row = item(manifest, 1)
+    assert (row["state"], row["attempts"]) == (PENDING, 1)
+    assert row["not_before"] is not None
+    assert [i["position"] for i in manifest.lease("w2", 5)] == [2]
+    assert manifest.next_playlist() is None
+
+
+def test_retries_until_max_attempts(manifest, monkeypatch):
+    monkeypatch.setattr(sharded_download, "backoff_delay", lambda attempt: 0.0)
+
+    for _ in range(MAX_ATTEMPTS):
+        assert [i["position"] for i in manifest.lease("w1", 1)] == [1]
+        assert manifest.fail(manifest.playlist_id, 1, "w1", "timeout", retry=True)
+
+    row = item(manifest, 1)
+    assert (row["state"], row["attempts"]) == (FAILED, MAX_ATTEMPTS)
+
+
+LEASE = 1.0
+ITEMS = 20
+
+
+def stub_worker(path, worker, log_dir, hang=False):
+    """Worker com um 'download' falso; com `hang`, trava segurando o primeiro lease."""
+    manifest = ShardManifest(path)
+    heartbeat = Heartbeat(manifest, worker, LEASE).start()
+    with open(os.path.join(log_dir, worker + ".log"), "a") as log:
+        while not manifest.finished():
+            items = manifest.lease(worker, 2, LEASE)
+            if not items:
+                time.sleep(0.05)
+                continue
+            for leased in items:
+                if hang:
+                    with open(os.path.join(log_dir, "hung"), "w") as f:
+                        f.write(str(leased["position"]))
+                    time.sleep(60)
+                time.sleep(0.01)
+                if manifest.complete(leased["playlist_id"], leased["position"], worker):
+                    log.write(f"{leased['position']}\n")
+                    log.flush()
+    heartbeat.stop()
+    manifest.close()
+
+
+def test_workers_finish_every_item_once_after_a_crash(tmp_path):
+    path = str(tmp_path / "manifest.sqlite")
+    manifest = ShardManifest(path)
+    playlist_id = manifest.add_playlist("https://example.com/list", "Lista", str(tmp_path), 2, {})
+    manifest.add_items(playlist_id, [(n, str(n), f"Faixa {n}", f"https://example.com/{n}")
+                                     for n in range(1, ITEMS + 1)])
+    manifest.mark_enumerated(playlist_id)
+    context = multiprocessing.get_context("spawn")
+
+    hung = context.Process(target=stub_worker, args=(path, "hung", str(tmp_path), True))
+    hung.start()
+    deadline = time.time() + 30
+    while not os.path.exists(tmp_path / "hung") and time.time() < deadline:
+        time.sleep(0.05)
+    assert os.path.exists(tmp_path / "hung"), "o worker travado não tomou nenhum item"
+    workers = [context.Process(target=stub_worker, args=(path, f"w{n}", str(tmp_path))) for n in (1, 2)]
+    for process in workers:
+        process.start()
+    hung.kill()
+    hung.join()
+    for process in workers:
+        process.join(30)
+        assert process.exitcode == 0
+
+    completed = []
+    for name in ("w1", "w2"):
+        completed += [int(line) for line in (tmp_path / f"{name}.log").read_text().split()]
+    assert sorted(completed) == list(range(1, ITEMS + 1))
+    assert int((tmp_path / "hung").read_text()) in completed
+    assert manifest.counts()[DONE] == ITEMS
+    manifest.close()
@@ -0,0 +1,49 @@
+import os
+import sys
+
+import pytest
+
+from stream_transcode import StreamTranscoder
+
+CHUNK = 1000
+
+
+def fake_ffmpeg(tmp_path):
+    """Um 'ffmpeg' que copia o stdin para o arquivo de saída (último argumento)."""
+    script = tmp_path / "ffmpeg"
+    script.write_text(f"#!{sys.executable}\n"
+                      "import shutil, sys\n"
+                      "with open(sys.argv[-1], 'wb') as f:\n"
+                      "    shutil.copyfileobj(sys.stdin.buffer, f)\n")
+    script.chmod(0o755)
+    return str(script)
+
+
+def read_all(transcoder, url):
+    data = b""
+    for response in transcoder._responses(url, {}, CHUNK, None):
+        with response:
+            data += response.read()
+    return data
+
+
+@pytest.mark.parametrize("size", [2500, 3000])
+def test_unknown_total_keeps_requesting_ranges(range_server, size):
+    range_server.payload = bytes(range(256)) * (size // 256) + b"x" * (size % 256)
+    range_server.unknown_total = True
+
+    assert read_all(StreamTranscoder(), range_server.url) == range_server.payload
+    assert range_server.ranges[:3] == ["bytes=0-999", "bytes=1000-1999", "bytes=2000-2999"]
+
+
+@pytest.mark.skipif(os.name == "nt", reason="ffmpeg falso é um script com shebang")
+def test_transcode_with_unknown_total_writes_whole_file(range_server, tmp_path):
+    range_server.payload = os.urandom(150 * 1024)
+    range_server.unknown_total = True
+    dst = tmp_path / "out.mp3"
+
+    result = StreamTranscoder(ffmpeg=fake_ffmpeg(tmp_path)).transcode(
+        range_server.url, str(dst), [], ext="mp3", chunk_size=64 * 1024)
+
+    assert result["bytes"] == len(range_server.payload)
+    assert dst.read_bytes() == range_server.payload